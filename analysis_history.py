@@ -0,0 +1,231 @@
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import click
+
+# =========================
+# Config
+# =========================
+HISTORY_PATH = Path("analysis_history.sqlite3")
+SOURCES = ("text", "image", "url", "batch", "crawl")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    source TEXT NOT NULL,
+    source_ref TEXT,
+    overall TEXT NOT NULL,
+    high INTEGER, medium INTEGER, low INTEGER, unknown INTEGER,
+    created_at REAL NOT NULL,
+    findings TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_fingerprint ON analyses (fingerprint, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_source ON analyses (source, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_overall ON analyses (overall, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at, overall);
+
+CREATE TABLE IF NOT EXISTS analysis_ingredients (
+    analysis_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    ingredient TEXT NOT NULL,
+    risk TEXT NOT NULL,
+    tier TEXT,              -- how it was resolved: store / fuzzy / llm (NULL in rows from before tiers)
+    PRIMARY KEY (analysis_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_membership_ingredient ON analysis_ingredients (ingredient, analysis_id);
+"""
+# Run after MIGRATIONS, since they index columns older files lack.
+SCHEMA_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_membership_tier ON analysis_ingredients (tier, ingredient);
+DROP INDEX IF EXISTS idx_membership_risk;
+"""
+# Columns added after the first release: (table, column, definition).
+MIGRATIONS = [("analysis_ingredients", "tier", "TEXT")]
+
+# Every query the store runs, for the --check-plans index check.
+QUERIES = {
+    "by_ingredient": (
+        "SELECT a.id, a.fingerprint, a.source, a.source_ref, a.overall, a.created_at "
+        "FROM analysis_ingredients m JOIN analyses a ON a.id = m.analysis_id "
+        "WHERE m.ingredient = ? ORDER BY a.created_at DESC LIMIT ?"
+    ),
+    "by_fingerprint": (
+        "SELECT id, source, source_ref, overall, created_at FROM analyses "
+        "WHERE fingerprint = ? ORDER BY created_at DESC LIMIT ?"
+    ),
+    "by_overall": (
+        "SELECT id, fingerprint, source, source_ref, overall, created_at FROM analyses "
+        "WHERE overall = ? ORDER BY created_at DESC LIMIT ?"
+    ),
+    "score_distribution": (
+        "SELECT CAST((created_at - ?) / ? AS INTEGER) AS bucket, overall, COUNT(*) FROM analyses "
+        "WHERE created_at >= ? AND created_at < ? GROUP BY bucket, overall ORDER BY bucket"
+    ),
+    "score_distribution_by_source": (
+        "SELECT CAST((created_at - ?) / ? AS INTEGER) AS bucket, overall, COUNT(*) FROM analyses "
+        "WHERE source = ? AND created_at >= ? AND created_at < ? GROUP BY bucket, overall ORDER BY bucket"
+    ),
+    # Ingredients that were missing from the DB (classified by the LLM), by how many analyses contain them.
+    "top_unknowns": (
+        "SELECT ingredient, COUNT(*) AS n FROM analysis_ingredients "
+        "WHERE ingredient IN (SELECT ingredient FROM analysis_ingredients WHERE tier = 'llm') "
+        "GROUP BY ingredient ORDER BY n DESC LIMIT ?"
+    ),
+    "recent": (
+        "SELECT id, fingerprint, source, source_ref, overall, created_at FROM analyses "
+        "WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?"
+    ),
+}
+
+# =========================
+# History store
+# =========================
+class AnalysisHistory:
+    """Every analysis result, with an ingredient membership table for per-ingredient queries."""
+
+    def __init__(self, path: Path = HISTORY_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        for table, column, definition in MIGRATIONS:
+            if column not in {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        self._conn.executescript(SCHEMA_INDEXES)
+        self._conn.commit()
+
+    def record_many(self, items: Iterable[Tuple[str, Dict, str, Optional[str]]]):
+        """Stores (fingerprint, findings, source, source_ref) results in one transaction."""
+        now = time.time()
+        with self._lock:
+            for product_fp, findings, source, source_ref in items:
+                details = findings.get("details", [])
+                counts = {level: 0 for level in ("High", "Medium", "Low", "Unknown")}
+                for d in details:
+                    counts[d["risk_level"]] = counts.get(d["risk_level"], 0) + 1
+                cur = self._conn.execute(
+                    "INSERT INTO analyses (fingerprint, source, source_ref, overall, high, medium, low, unknown, "
+                    "created_at, findings) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (product_fp, source, source_ref, findings.get("overall_score", ""),
+                     counts["High"], counts["Medium"], counts["Low"], counts["Unknown"],
+                     now, json.dumps(findings, ensure_ascii=False)),
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO analysis_ingredients (analysis_id, position, ingredient, risk, tier) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(cur.lastrowid, pos, d["ingredient"], d["risk_level"], d.get("tier"))
+                     for pos, d in enumerate(details)],
+                )
+            self._conn.commit()
+
+    def record(self, product_fp: str, findings: Dict, source: str = "text", source_ref: Optional[str] = None):
+        self.record_many([(product_fp, findings, source, source_ref)])
+
+    def _query(self, name: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(QUERIES[name], params).fetchall()
+
+    def products_with(self, ingredient: str, limit: int = 100) -> List[Dict]:
+        """Most recent analyses whose ingredient list contains `ingredient`."""
+        rows = self._query("by_ingredient", (ingredient.lower().strip(), limit))
+        keys = ("id", "fingerprint", "source", "source_ref", "overall", "created_at")
+        return [dict(zip(keys, r)) for r in rows]
+
+    def history_of(self, product_fp: str, limit: int = 20) -> List[Dict]:
+        rows = self._query("by_fingerprint", (product_fp, limit))
+        return [dict(zip(("id", "source", "source_ref", "overall", "created_at"), r)) for r in rows]
+
+    def products_scored(self, overall: str, limit: int = 100) -> List[Dict]:
+        """Most recent analyses with this overall score (Excellent/Poor/Bad)."""
+        rows = self._query("by_overall", (overall.capitalize(), limit))
+        return [dict(zip(("id", "fingerprint", "source", "source_ref", "overall", "created_at"), r)) for r in rows]
+
+    def score_distribution(self, since: float, until: Optional[float] = None, bucket_seconds: float = 86400,
+                           source: Optional[str] = None) -> List[Dict]:
+        """Counts of Excellent/Poor/Bad per time bucket (default: per day)."""
+        until = until or time.time()
+        if source:
+            rows = self._query("score_distribution_by_source", (since, bucket_seconds, source, since, until))
+        else:
+            rows = self._query("score_distribution", (since, bucket_seconds, since, until))
+        buckets: Dict[int, Dict] = {}
+        for bucket, overall, n in rows:
+            entry = buckets.setdefault(bucket, {"start": since + bucket * bucket_seconds})
+            entry[overall] = n
+        return [buckets[b] for b in sorted(buckets)]
+
+    def top_unknowns(self, limit: int = 20) -> List[Tuple[str, int]]:
+        """
+        Ingredients that were not in the database when analyzed (LLM-classified),
+        most frequent first - candidates for curated entries.
+        """
+        return self._query("top_unknowns", (limit,))
+
+    def recent(self, since: float, limit: int = 50) -> List[Dict]:
+        rows = self._query("recent", (since, limit))
+        return [dict(zip(("id", "fingerprint", "source", "source_ref", "overall", "created_at"), r)) for r in rows]
+
+    def query_plans(self) -> Dict[str, List[str]]:
+        """EXPLAIN QUERY PLAN for every query, to check they run on indexes."""
+        sample = {
+            "by_ingredient": ("water", 10), "by_fingerprint": ("x", 10), "by_overall": ("Bad", 10),
+            "score_distribution": (0, 86400, 0, 1), "score_distribution_by_source": (0, 86400, "text", 0, 1),
+            "top_unknowns": (10,), "recent": (0, 10),
+        }
+        with self._lock:
+            return {name: [row[-1] for row in self._conn.execute(f"EXPLAIN QUERY PLAN {sql}", sample[name])]
+                    for name, sql in QUERIES.items()}
+
+HISTORY = AnalysisHistory()
+
+# =========================
+# CLI
+# =========================
+@click.group()
+def main():
+    """Query the analysis history."""
+
+@main.command()
+@click.argument('ingredient')
+@click.option('--limit', default=20)
+def contains(ingredient, limit):
+    """Analyzed products that contain INGREDIENT."""
+    for row in HISTORY.products_with(ingredient, limit):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["created_at"]))
+        click.echo(f"{when}  {row['overall']:<9}  {row['source']:<5}  {row['source_ref'] or row['fingerprint'][:12]}")
+
+@main.command()
+@click.option('--days', default=30, help='How far back to look (default: 30)')
+@click.option('--source', type=click.Choice(SOURCES))
+def scores(days, source):
+    """Daily Excellent/Poor/Bad counts."""
+    for bucket in HISTORY.score_distribution(time.time() - days * 86400, source=source):
+        day = time.strftime("%Y-%m-%d", time.localtime(bucket["start"]))
+        click.echo(f"{day}  Excellent {bucket.get('Excellent', 0):>5}  Poor {bucket.get('Poor', 0):>5}  Bad {bucket.get('Bad', 0):>5}")
+
+@main.command()
+@click.option('--limit', default=20)
+def unknowns(limit):
+    """LLM-classified ingredients seen most often."""
+    for ingredient, n in HISTORY.top_unknowns(limit):
+        click.echo(f"{n:>6}  {ingredient}")
+
+@main.command('check-plans')
+def check_plans():
+    """Fail if any history query needs a full table scan."""
+    failed = False
+    for name, plan in HISTORY.query_plans().items():
+        scans = [step for step in plan if step.startswith("SCAN") and "USING" not in step]
+        failed |= bool(scans)
+        click.echo(f"{'❌' if scans else '✅'} {name}: {' | '.join(plan)}")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,90 @@
 import os
 import re
+import io
 import json
-import random
-from typing import List, Dict
+import difflib
+import itertools
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 from dotenv import load_dotenv
 import chromadb
 from llama_index.core import Document, VectorStoreIndex, StorageContext, Settings
 from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.llms.ollama import Ollama
-from llama_index.embeddings.ollama import OllamaEmbedding
 from PIL import Image
 import pytesseract
 import cv2
 import numpy as np
 import gradio as gr
-import requests
-from bs4 import BeautifulSoup
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from pydantic import BaseModel
 from urllib.parse import urlparse
 
-# Selenium imports
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-
 from riskdata import RISK_DB
+from scraper import scrape_ingredients_from_url
+from ingredient_parser import (
+    PARSER_CONFIDENCE_THRESHOLD,
+    Token,
+    fingerprint,
+    parse_ingredient_block,
+    set_dictionary_provider,
+    tokenize_ingredients,
+    trim_context,
+)
+from llm_cache import COMPLETION_CACHE, llm_call_site
+from llm_scheduler import (
+    BACKGROUND_ENRICH,
+    LLM_MAX_IN_FLIGHT,
+    LLMOverloaded,
+    SCHEDULER,
+    ScheduledOllamaEmbedding,
+    llm_priority,
+)
+from metrics import INGREDIENT_LOOKUPS, REGISTRY, STAGE_SECONDS, merge_families, render_families, timed
+from model_routing import llm_for
+from analysis_history import HISTORY
+from product_index import PRODUCT_INDEX
+from result_cache import RESULT_CACHE
+from risk_snapshot import RiskSnapshot, SnapshotHolder, frozen_db
+from warmup import EMBED_MODEL, WARMER
+from prompts import (
+    EXPLANATION_PROMPT,
+    EXTRACTION_PROMPT,
+    FALLBACK_LOOKUP_PROMPT,
+    RAG_LOOKUP_QUERY,
+    RISK_LOOKUP_PROMPT,
+)
 
 # =========================
 # Config & Setup
 # =========================
-llm = Ollama(model="gemma3:4b", request_timeout=120.0) # use your local LLM here if you want to download a different local LLM
-Settings.llm = llm
-embed_model = OllamaEmbedding(model_name="nomic-embed-text")
+# Models per task (extract, classify, explain, rag_synthesis) are set in model_routing.py / model_routes.json
+Settings.llm = llm_for("rag_synthesis")
+embed_model = ScheduledOllamaEmbedding(model_name=EMBED_MODEL)
 Settings.embed_model = embed_model
 CHROMA_PATH = "./chroma_db"
+CHROMA_COLLECTION = "ingredients_local"
+# standalone: one process does everything. serve.py runs a "coordinator" that owns
+# riskdata.py and chroma_db, and "worker" processes that map its snapshots.
+APP_ROLE = os.getenv("APP_ROLE", "standalone")
+if APP_ROLE != "worker":   # under serve.py the coordinator warms the models for every worker
+    WARMER.start()  # load the chat and embedding models in the background while the index builds
 
 # =========================
 # OCR Functionality
 # =========================
-def ocr_from_image(image_path: str) -> str:
+@timed("ocr")
+def ocr_from_image(image_path: Union[str, bytes]) -> str:
     """
-    Performs OCR on an image file to extract text.
+    Performs OCR on an image file (path or raw bytes) to extract text.
     Handles potential preprocessing for better OCR results.
     """
     try:
-        image = Image.open(image_path)
+        image = Image.open(io.BytesIO(image_path) if isinstance(image_path, bytes) else image_path)
         np_image = np.array(image)
         if len(np_image.shape) > 2:
             gray = cv2.cvtColor(np_image, cv2.COLOR_BGR2GRAY)
@@ -62,133 +97,23 @@ def ocr_from_image(image_path: str) -> str:
         print(f"Error during OCR: {e}")
         return ""
 
-# =========================
-# Web Scraping Functionality (New)
-# =========================
-# List of common user agents to rotate through
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.82 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:89.0) Gecko/20100101 Firefox/89.0",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
-]
-
-def scrape_ingredients_from_url(url: str) -> str:
-    """
-    Fetches the content of a URL using a headless Selenium browser and attempts
-    to extract cosmetic ingredients. This method handles JavaScript-rendered pages.
-    """
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    
-    random_user_agent = random.choice(USER_AGENTS)
-    options.add_argument(f"user-agent={random_user_agent}")
-
-    driver = None
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        wait_time = 20
-        driver.set_page_load_timeout(wait_time)
-
-        print(f"Loading {url} with Selenium...")
-        driver.get(url)
-
-        WebDriverWait(driver, wait_time).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        html_content = driver.page_source
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        potential_ingredients_sections = soup.find_all(
-            lambda tag: tag.name in ['div', 'p', 'span', 'li', 'ul'] and 
-            any(keyword in tag.get_text(strip=True).lower() for keyword in ['ingredients', 'composition', 'what\'s in it', 'full list'])
-        )
-        
-        ingredient_text = ""
-        for section in potential_ingredients_sections:
-            text = section.get_text(separator=' ', strip=True)
-            if len(text.split(',')) > 5 and "ingredients" in text.lower():
-                ingredient_text = text
-                break
-        
-        if not ingredient_text:
-            json_ld_scripts = soup.find_all('script', type='application/ld+json')
-            for script in json_ld_scripts:
-                try:
-                    data = json.loads(script.string)
-                    if 'description' in data and 'ingredients' in data['description'].lower():
-                        ingredient_text = data['description']
-                        break
-                    elif 'ingredients' in data:
-                        ingredient_text = data['ingredients']
-                        break
-                    elif 'product' in data and 'description' in data['product'] and 'ingredients' in data['product']['description'].lower():
-                        ingredient_text = data['product']['description']
-                        break
-                except json.JSONDecodeError:
-                    continue
-
-        if not ingredient_text:
-            print(f"Could not find a clear ingredient list on {url}. Trying a more generic search.")
-            body_text = soup.body.get_text(separator=' ', strip=True)
-            match = re.search(r'(ingredients|composition|what\'s in it):?\s*([A-Z][a-zA-Z\s,.-]+(?:\s*(?:,\s*[A-Z][a-zA-Z\s,.-]+)+)?)', body_text, re.IGNORECASE)
-            if match:
-                ingredient_text = match.group(2)
-            else:
-                return "No ingredient list found on this page using common patterns. Please provide the text manually."
-        
-        return ingredient_text
-
-    except TimeoutException:
-        print(f"Timeout: Page took longer than {wait_time} seconds to load.")
-        return f"Error: Timeout. Page took longer than {wait_time} seconds to load. Try again or provide text manually."
-    except WebDriverException as e:
-        print(f"WebDriver error: {e}")
-        return f"Error: WebDriver failed to run. Ensure Chrome is installed and updated. ({e})"
-    except Exception as e:
-        print(f"An unexpected error occurred during scraping: {e}")
-        return f"An unexpected error occurred during scraping: {e}"
-    finally:
-        if driver:
-            driver.quit()
-
 # =========================
 # LLM-based Ingredient Extraction
 # =========================
 def extract_ingredients_with_llm(text: str) -> str:
     """
     Uses the local LLM to extract only the cosmetic ingredients from a block of text.
+    Long text is first trimmed to the windows around ingredient anchors.
     """
-    prompt = f"""
-    You are a highly specialized information extraction bot. Your task is to extract a list of only the cosmetic or skincare ingredients from the provided text.
-    The ingredients are typically listed after keywords like 'INGREDIENTS:', 'Ingredients:', 'Composition:', or similar.
-    
-    Rules:
-    - Return a single, comma-separated string of the ingredients.
-    - Do NOT include any other text, numbers, or non-ingredient words.
-    - The output must be a clean list of ingredients, e.g., "Water, Glycerin, Butylene Glycol, Niacinamide, Sodium Hyaluronate"
-    - If no ingredients are found, return an empty string.
-
-    Text to analyze:
-    ---
-    {text}
-    ---
-    
-    Extracted ingredients list:
-    """
+    text, tokens_before, tokens_after = trim_context(text, dictionary=SNAPSHOTS.current().db)
+    if tokens_after < tokens_before:
+        print(f"✂️ Trimmed extraction context: ~{tokens_before} -> ~{tokens_after} tokens "
+              f"(saved ~{tokens_before - tokens_after})")
+    prompt = EXTRACTION_PROMPT.format(text=text)
     
     try:
-        response = llm.complete(prompt)
+        with llm_call_site("extract"):
+            response = llm_for("extract").complete(prompt)
         extracted_text = str(response).strip()
         extracted_text = re.sub(r'^(?:\s*["\']?|\s*list\s*of\s*ingredients\s*:\s*|\s*extracted\s*ingredients\s*:\s*)', '', extracted_text, flags=re.IGNORECASE)
         extracted_text = re.sub(r'["\']?\s*$', '', extracted_text).strip()
@@ -197,6 +122,29 @@ def extract_ingredients_with_llm(text: str) -> str:
         print(f"Error during LLM ingredient extraction: {e}")
         return ""
 
+# Running counts of which extractor answered, so we can see how often the LLM is skipped.
+EXTRACTION_STATS = {"parser": 0, "llm": 0}
+
+@timed("extract")
+def extract_ingredients(text: str) -> str:
+    """
+    Extracts the ingredient list from OCR / scraped text. The rule-based parser
+    answers when it is confident; only low-confidence text goes to the LLM.
+    """
+    parsed, confidence = parse_ingredient_block(text, SNAPSHOTS.current().db)
+    if confidence >= PARSER_CONFIDENCE_THRESHOLD:
+        EXTRACTION_STATS["parser"] += 1
+        source = f"parser (confidence {confidence:.2f})"
+        result = parsed
+    else:
+        EXTRACTION_STATS["llm"] += 1
+        source = f"LLM (parser confidence {confidence:.2f})"
+        result = extract_ingredients_with_llm(text)
+    total = EXTRACTION_STATS["parser"] + EXTRACTION_STATS["llm"]
+    print(f"🧾 Ingredients extracted by {source} - LLM skipped {EXTRACTION_STATS['parser']}/{total} "
+          f"({EXTRACTION_STATS['parser'] / total:.0%})")
+    return result
+
 # =========================
 # Build LlamaIndex from JSON dataset
 # =========================
@@ -218,35 +166,52 @@ def json_to_documents(risk_db: Dict[str, Dict]) -> List[Document]:
 
 def build_index(documents: List[Document]) -> VectorStoreIndex:
     client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection_name = "ingredients_local"
-    collection = client.get_or_create_collection(collection_name)
+    collection = client.get_or_create_collection(CHROMA_COLLECTION)
     vector_store = ChromaVectorStore(chroma_collection=collection)
     storage_context = StorageContext.from_defaults(vector_store=vector_store)
     index = VectorStoreIndex.from_documents(documents, storage_context=storage_context)
     return index
 
-DOCS = json_to_documents(RISK_DB)
-INDEX = build_index(DOCS)
-QUERY_ENGINE = INDEX.as_query_engine(similarity_top_k=5)
+def snapshot_for(version: int, db) -> RiskSnapshot:
+    """
+    A fresh index object over the shared vector store for each version, so
+    readers of an older snapshot never see INDEX being mutated under them.
+    """
+    index = VectorStoreIndex.from_vector_store(INDEX.vector_store)
+    return RiskSnapshot(
+        version=version,
+        db=db,
+        query_engine=index.as_query_engine(similarity_top_k=5, llm=llm_for("rag_synthesis")),
+        explain_engine=index.as_query_engine(similarity_top_k=5, llm=llm_for("explain")),
+        retriever=index.as_retriever(similarity_top_k=5),
+    )
+
+# Writer-side handle: only update_riskdata inserts into it. Workers map the
+# coordinator's snapshot instead of opening chroma_db themselves.
+INDEX = build_index(json_to_documents(RISK_DB)) if APP_ROLE != "worker" else None
 
 # =========================
 # Analysis functions
 # =========================
 RISK_ORDER = ["High", "Medium", "Low", "Unknown"]
+FUZZY_CUTOFF = 0.92       # difflib ratio needed to accept a near-miss database name
+BATCH_CHUNK_SIZE = 500    # products tokenized and resolved together in analyze_products
 
 def tokenize_ingredient_list(raw_text: str) -> List[str]:
-    raw_text = re.sub(r"\(.*?\)", "", raw_text)
-    parts = re.split(r"[,;\n]", raw_text)
-    return [p.strip() for p in parts if p.strip()]
+    return [token.name for token in tokenize_ingredients(raw_text)]
+
+def resolve_db_key(token: Token, db) -> str:
+    """First of the token's candidate names found in db, else its normalized name."""
+    return next((key for key in token.candidates() if key in db), token.name)
 
 def lookup_risk(ingredient: str):
+    snapshot = SNAPSHOTS.current()
     ing_lc = ingredient.lower().strip()
-    if ing_lc in RISK_DB:
-        info = RISK_DB[ing_lc]
+    if ing_lc in snapshot.db:
+        info = snapshot.db[ing_lc]
         return ing_lc, info["risk"], info["impact"]
-    retrieved = QUERY_ENGINE.query(
-        f"Find safety info for cosmetic ingredient: {ingredient}. Return name, risk, impact."
-    )
+    with llm_call_site("lookup_risk"):
+        retrieved = snapshot.query_engine.query(RAG_LOOKUP_QUERY.format(ingredient=ingredient))
     text = str(retrieved)
     m_ing = re.search(r"Ingredient:\s*(.+)", text)
     m_risk = re.search(r"Risk:\s*(High|Medium|Low)", text, re.IGNORECASE)
@@ -276,71 +241,104 @@ def overall_score(buckets: Dict[str, List[Dict]]) -> str:
         return "Poor"
     return "Excellent"
 
-EXPLANATION_PROMPT = """You are a cosmetic safety expert.
-Given:
-- Analyzed ingredient findings (JSON)
-Task:
-- Only write cautionary notes for high or medium risk ingredients.
-- Write a concise, user-friendly explanation.
-- For High risk: include likely long-term impacts in 1 short sentence each.
-- If it shows Medium risk please include brief caution,otherwise no need to mention.
-
-- End with two or three sentences overall rationale that matches the score.
-Keep it to ~5 bulleted lines total.
-JSON:
-{json_payload}
-"""
+EXPLANATION_BUSY = "The explanation model is busy right now - the findings above are complete; please retry for a written summary."
+ANALYSIS_BUSY = "The analyzer is busy right now (too many requests waiting for the model). Please retry in a minute."
 
+@timed("explain")
 def llm_explain(findings: Dict) -> str:
     payload = json.dumps(findings, ensure_ascii=False, indent=2)
-    resp = QUERY_ENGINE.query(EXPLANATION_PROMPT.format(json_payload=payload))
+    try:
+        with llm_call_site("explain"):
+            resp = SNAPSHOTS.current().explain_engine.query(EXPLANATION_PROMPT.format(json_payload=payload))
+    except LLMOverloaded:
+        return EXPLANATION_BUSY
     return str(resp)
 
-def analyze_product(raw_text: str) -> Dict:
-    global RISK_DB
-    items = tokenize_ingredient_list(raw_text)
+def fuzzy_db_key(name: str, db) -> Optional[str]:
+    """
+    Closest db name for a near miss ("hyaluronic acld"), or None. Numbers
+    must agree so "polysorbate 20" never matches "polysorbate 80".
+    """
+    matches = difflib.get_close_matches(name, db.keys(), n=1, cutoff=FUZZY_CUTOFF)
+    if matches and re.findall(r"\d+", matches[0]) == re.findall(r"\d+", name):
+        return matches[0]
+    return None
+
+@timed("resolve")
+def resolve_ingredients(tokens: Iterable[Token], resolved: Dict[str, Dict],
+                        lookup_workers: int = 1) -> Dict[str, Dict]:
+    """
+    Resolves each distinct token not already in `resolved` exactly once, through
+    the tiers store (exact RISK_DB name) -> fuzzy -> LLM, filling `resolved`
+    {token name: {"key", "risk", "impact", "tier"}}. Returns the new entries the
+    LLM produced, for saving to the database. All tiers read one snapshot.
+    """
+    db = SNAPSHOTS.current().db
+    pending = {}
+    for token in tokens:
+        if token.name in resolved or token.name in pending:
+            continue
+        key = resolve_db_key(token, db)
+        if key in db:
+            info, tier = db[key], "store"
+            print(f"✅ Found existing ingredient: {key}")
+        else:
+            fuzzy = fuzzy_db_key(token.name, db)
+            if fuzzy is None:
+                pending[token.name] = token
+                continue
+            key, info, tier = fuzzy, db[fuzzy], "fuzzy"
+            print(f"✅ Found existing ingredient: {key} (close match for {token.name})")
+        resolved[token.name] = {"key": key, "risk": info["risk"], "impact": info["impact"], "tier": tier}
+        INGREDIENT_LOOKUPS.inc(tier)
+
+    new_entries = {}
+    if pending:
+        for name in pending:
+            print(f"🔍 Looking up new ingredient: {name}")
+        with ThreadPoolExecutor(max_workers=max(1, lookup_workers)) as executor:
+            # The contextvars copy keeps the caller's scheduler priority in the worker threads.
+            futures = {name: executor.submit(contextvars.copy_context().run, llm_lookup_unknown, name)
+                       for name in pending}
+            for name, future in futures.items():
+                info = future.result()
+                new_entries[name] = info
+                resolved[name] = {"key": name, "risk": info["risk"], "impact": info["impact"], "tier": "llm"}
+                INGREDIENT_LOOKUPS.inc("llm")
+    return new_entries
+
+def save_new_entries(new_entries: Dict[str, Dict]):
+    if new_entries:
+        print(f"📝 Updating database with {len(new_entries)} new ingredients...")
+        with STAGE_SECONDS.time("index_update"):
+            snapshot = SNAPSHOTS.update(new_entries)
+        print(f"✅ Database and index updated successfully! (version {snapshot.version})")
+    else:
+        print("✅ All ingredients already in database - no updates needed")
+
+def index_record(product_id: str, tokens: List[Token], resolved: Dict[str, Dict]) -> Tuple:
+    """(product_id, DB names in list order, {name: risk}) for PRODUCT_INDEX.record_many."""
+    keys = [resolved[t.name]["key"] for t in tokens]
+    return product_id, keys, {resolved[t.name]["key"]: resolved[t.name]["risk"] for t in tokens}
+
+def build_findings(raw_text: str, tokens: List[Token], resolved: Dict[str, Dict]) -> Dict:
     per_ing = []
     buckets = {"High": [], "Medium": [], "Low": [], "Unknown": []}
-    new_entries = {}
-    for ing in items:
-        ing_lc = ing.lower().strip()
-        db_entry = RISK_DB.get(ing_lc)
-        if db_entry:
-            risk, impact = db_entry["risk"], db_entry["impact"]
-            print(f"✅ Found existing ingredient: {ing_lc}")
-        else:
-            print(f"🔍 Looking up new ingredient: {ing_lc}")
-            ai_info = llm_lookup_unknown(ing)
-            new_entries[ing_lc] = ai_info
-            risk, impact = ai_info["risk"], ai_info["impact"]
-        level = bucketize(risk)
+    for token in tokens:
+        info = resolved[token.name]
+        ing_lc, impact = info["key"], info["impact"]
+        level = bucketize(info["risk"])
         entry = {
-            "input": ing,
+            "input": raw_text[token.start:token.end],
             "ingredient": ing_lc,
             "risk_level": level,
             "impact": impact,
+            "tier": info["tier"],
         }
         per_ing.append(entry)
         buckets[level].append({"ingredient": ing_lc, "impact": impact})
-    if new_entries:
-        print(f"📝 Updating database with {len(new_entries)} new ingredients...")
-        update_riskdata(new_entries)
-        RISK_DB.update(new_entries)
-        new_docs = []
-        for ingredient, info in new_entries.items():
-            text = (
-                f"Ingredient: {ingredient}\n"
-                f"Risk: {info['risk']}\n"
-                f"Impact: {info['impact']}"
-            )
-            new_docs.append(Document(text=text))
-        INDEX.insert_nodes(new_docs)
-        QUERY_ENGINE = INDEX.as_query_engine(similarity_top_k=5)
-        print(f"✅ Database and index updated successfully!")
-    else:
-        print("✅ All ingredients already in database - no updates needed")
     score = overall_score(buckets)
-    findings = {
+    return {
         "overall_score": score,
         "high_risk": buckets["High"],
         "medium_risk": buckets["Medium"],
@@ -348,30 +346,95 @@ def analyze_product(raw_text: str) -> Dict:
         "unknown": buckets["Unknown"],
         "details": per_ing,
     }
+
+@timed("analyze")
+def analyze_product(raw_text: str, source: str = "text", source_ref: Optional[str] = None) -> Dict:
+    """Scores one ingredient list; `source` (text/image/url/crawl) and `source_ref` go to the history."""
+    with STAGE_SECONDS.time("tokenize"):
+        tokens = tokenize_ingredients(raw_text)
+    product_fp = fingerprint(tokens)
+    cached = RESULT_CACHE.get(product_fp)
+    if cached is not None:
+        print(f"⚡ Same ingredient list analyzed before - served from result cache ({product_fp[:12]})")
+        HISTORY.record(product_fp, cached, source, source_ref)
+        return cached
+    resolved = {}
+    new_entries = resolve_ingredients(tokens, resolved, lookup_workers=LLM_MAX_IN_FLIGHT)
+    save_new_entries(new_entries)
+    findings = build_findings(raw_text, tokens, resolved)
+    PRODUCT_INDEX.record_many([index_record(product_fp, tokens, resolved)])
     findings["explanation"] = llm_explain(findings)
+    print(f"🗃️ LLM cache: {COMPLETION_CACHE.summary()}")
+    if findings["explanation"] != EXPLANATION_BUSY:
+        # Depends on the entries used and on every candidate name a token could
+        # resolve to, so a new exact entry for a fuzzy-matched name or a more
+        # specific "name (qualifier)" entry also invalidates the result.
+        deps = {info["key"] for info in resolved.values()} | {c for t in tokens for c in t.candidates()}
+        RESULT_CACHE.put(product_fp, findings, deps)
+    HISTORY.record(product_fp, findings, source, source_ref)
     return findings
 
+def analyze_products(products: Iterable[Union[str, Tuple[str, str]]], chunk_size: int = BATCH_CHUNK_SIZE,
+                     explain: bool = False, lookup_workers: int = LLM_MAX_IN_FLIGHT) -> Iterator[Dict]:
+    """
+    Batch analysis for catalogs. Products are raw ingredient texts or
+    (product_id, text) pairs, streamed in chunks; texts without an id get their
+    ingredient-list fingerprint as product_id. Every distinct ingredient is
+    resolved once for the whole run, so lookup cost grows with the number of
+    distinct ingredients rather than the total count. Findings are yielded per
+    product, in input order, as each chunk is scored; `explain` adds the LLM
+    explanation (slow; off by default).
+    """
+    resolved: Dict[str, Dict] = {}
+    stats = {"products": 0, "ingredients": 0, "store": 0, "fuzzy": 0, "llm": 0}
+    products = iter(products)
+    while True:
+        chunk = list(itertools.islice(products, chunk_size))
+        if not chunk:
+            break
+        parsed = []
+        for item in chunk:
+            product_id, raw_text = item if isinstance(item, tuple) else (None, item)
+            tokens = tokenize_ingredients(raw_text)
+            # Lists without an id are keyed by content, so ids are stable across runs and
+            # never collide with another batch's products in PRODUCT_INDEX or HISTORY.
+            parsed.append((product_id if product_id is not None else fingerprint(tokens), raw_text, tokens))
+
+        before = len(resolved)
+        results = []
+        with llm_priority(BACKGROUND_ENRICH):
+            new_entries = resolve_ingredients(
+                (token for _, _, tokens in parsed for token in tokens), resolved, lookup_workers
+            )
+            save_new_entries(new_entries)
+            for product_id, raw_text, tokens in parsed:
+                findings = build_findings(raw_text, tokens, resolved)
+                findings["product_id"] = product_id
+                if explain:
+                    findings["explanation"] = llm_explain(findings)
+                results.append(findings)
+                stats["ingredients"] += len(tokens)
+            PRODUCT_INDEX.record_many(index_record(str(product_id), tokens, resolved)
+                                      for product_id, _, tokens in parsed)
+            HISTORY.record_many((fingerprint(tokens), findings, "batch", str(product_id))
+                                for (product_id, _, tokens), findings in zip(parsed, results))
+        for info in list(resolved.values())[before:]:
+            stats[info["tier"]] += 1
+        stats["products"] += len(results)
+        print(f"📦 Batch: {stats['products']} products, {stats['ingredients']} ingredients, "
+              f"{len(resolved)} distinct (store {stats['store']}, fuzzy {stats['fuzzy']}, LLM {stats['llm']})")
+        # Yielded outside llm_priority so the caller's own LLM calls keep their priority.
+        yield from results
+
+@timed("lookup_unknown")
 def llm_lookup_unknown(ingredient: str) -> Dict:
-    prompt = f"""You are a cosmetic safety expert with extensive knowledge of cosmetic ingredients.
-Ingredient: {ingredient}
-Please provide:
-1. Risk level: Classify as exactly one of: High, Medium, Low
-2. Impact: A detailed, factual description of this specific ingredient's properties, benefits, and potential concerns in less than 20 words. 
-Requirements:
-- Be specific to THIS ingredient - research its actual chemical properties and cosmetic uses
-- Include what the ingredient does in cosmetics (moisturizer, preservative, emulsifier, etc.)
-- Mention any known benefits or concerns specific to this ingredient
-- Use real cosmetic science knowledge, not generic statements
-- Minimum 10 words for impact description
-- Never use "Unknown", "Not available", or generic fallback phrases
-Examples of good responses:
-- "phenoxyethanol:Preservative; can cause skin irritation, allergic reactions, toxic at high doses"
-- "Silicone-based emollient that creates smooth application and water resistance; may cause buildup on hair but considered safe for skin use."
-Format as JSON with keys 'risk' and 'impact' only."""
+    prompt = RISK_LOOKUP_PROMPT.format(ingredient=ingredient)
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            resp = llm.complete(prompt)
+            # Retries skip the cache so a bad cached answer isn't served again.
+            with llm_call_site("lookup_unknown", use_cache=attempt == 0):
+                resp = llm_for("classify").complete(prompt)
             data = json.loads(str(resp).strip())
             risk = data.get("risk", "").strip().capitalize()
             impact = data.get("impact", "").strip()
@@ -386,16 +449,22 @@ Format as JSON with keys 'risk' and 'impact' only."""
                 return {"risk": risk, "impact": impact}
             if attempt < max_retries - 1:
                 prompt += f"\n\nPrevious attempt was too generic. Please provide specific information about {ingredient}'s actual cosmetic function and properties."
+        except LLMOverloaded:
+            # Shed by the scheduler: the caller must retry later, never persist a guess.
+            raise
         except (json.JSONDecodeError, Exception) as e:
             if attempt < max_retries - 1:
                 continue
-    fallback_prompt = f"""Research the cosmetic ingredient '{ingredient}' and provide its primary function and safety profile in less than 20 words. Focus on what this ingredient specifically does in cosmetics."""
+    fallback_prompt = FALLBACK_LOOKUP_PROMPT.format(ingredient=ingredient)
     try:
-        fallback_resp = llm.complete(fallback_prompt)
+        with llm_call_site("lookup_unknown_fallback"):
+            fallback_resp = llm_for("classify").complete(fallback_prompt)
         fallback_text = str(fallback_resp).strip()
         if len(fallback_text) >= 20:
             return {"risk": "Low", "impact": fallback_text}
-    except:
+    except LLMOverloaded:
+        raise
+    except Exception:
         pass
     ingredient_lower = ingredient.lower()
     if any(term in ingredient_lower for term in ["acid", "aha", "bha"]):
@@ -422,35 +491,40 @@ Format as JSON with keys 'risk' and 'impact' only."""
 # Riskdata updater
 # =========================
 RISKDATA_FILE = Path("riskdata.py")
-def update_riskdata(new_entries: dict):
-    global QUERY_ENGINE, INDEX
-    if not new_entries:
-        print("⚠️ No new entries to update")
-        return
+def update_riskdata(snapshot: RiskSnapshot, new_entries: Dict[str, Dict]) -> RiskSnapshot:
+    """
+    SNAPSHOTS builder, run by one writer at a time with every entry queued so
+    far: writes riskdata.py, invalidates dependent results, indexes the new
+    documents and returns the next snapshot for SNAPSHOTS to publish.
+    """
     print(f"📝 Writing {len(new_entries)} new ingredients to riskdata.py...")
-    try:
-        current_content = RISKDATA_FILE.read_text()
-        exec(current_content, {"RISK_DB": {}})
-        current_db = locals().get("RISK_DB", RISK_DB)
-    except:
-        current_db = RISK_DB
-    updated_db = {**current_db, **new_entries}
-    content = "RISK_DB = " + json.dumps(updated_db, indent=4) + "\n"
+    changed = [name for name, info in new_entries.items() if snapshot.db.get(name) != info]
+    updated_db = frozen_db(snapshot.db, new_entries)
+    content = "RISK_DB = " + json.dumps({name: dict(info) for name, info in updated_db.items()}, indent=4) + "\n"
     RISKDATA_FILE.write_text(content)
     print(f"✅ Successfully wrote {len(new_entries)} new ingredients to riskdata.py")
-    new_docs = []
-    for ingredient, info in new_entries.items():
-        text = (
-            f"Ingredient: {ingredient}\n"
-            f"Risk_Level: {info['risk']}\n"
-            f"Impact: {info['impact']}"
-        )
-        new_docs.append(Document(text=text))
-    if new_docs:
-        INDEX.insert_nodes(new_docs)
-        QUERY_ENGINE = INDEX.as_query_engine(similarity_top_k=5)
-        print(f"✅ Added {len(new_docs)} new documents to search index")
+    dropped = RESULT_CACHE.bump(changed)
+    if dropped:
+        print(f"🧹 Dropped {dropped} cached results that used the updated entries")
+    # Corrected risk levels re-score only the stored products that contain them.
+    flips = PRODUCT_INDEX.apply_risk_changes({name: info["risk"] for name, info in new_entries.items()})
+    for flip in flips[:20]:  # the full list is in the change feed
+        print(f"🔁 {flip['product_id']}: {flip['old_overall']} -> {flip['new_overall']} ({', '.join(flip['causes'])})")
+    new_docs = json_to_documents(new_entries)
+    INDEX.insert_nodes(new_docs)
+    print(f"✅ Added {len(new_docs)} new documents to search index")
     print(f"🎉 Database update complete! Total ingredients now: {len(updated_db)}")
+    return snapshot_for(snapshot.version + 1, updated_db)
+
+# Readers take SNAPSHOTS.current() once per request; save_new_entries publishes.
+if APP_ROLE == "worker":
+    from worker_mode import connect_worker
+    # Entries the coordinator bumped invalidate this process's cached results too.
+    SNAPSHOTS = connect_worker(on_remap=lambda version: RESULT_CACHE.reload_versions())
+else:
+    SNAPSHOTS = SnapshotHolder(snapshot_for(0, frozen_db(RISK_DB)), update_riskdata)
+# Scraper extractors and parsers called without a dictionary score against the live version.
+set_dictionary_provider(lambda: SNAPSHOTS.current().db)
 
 # =========================
 # Gradio UI
@@ -527,26 +601,39 @@ with gr.Blocks(title="Cosmetic Ingredient Safety – Local RAG") as demo:
     # Change from JSON to Markdown
     details_out = gr.Markdown(label="Ingredient Breakdown")
 
+    def busy_on_overload(handler):
+        """UI handlers answer ANALYSIS_BUSY instead of raising when the scheduler sheds the request."""
+        @functools.wraps(handler)
+        def wrapper(*args):
+            try:
+                return handler(*args)
+            except LLMOverloaded:
+                return "", ANALYSIS_BUSY, ""
+        return wrapper
+
+    @busy_on_overload
     def run_pipeline_text(user_text):
         if not user_text:
             return "", "Please enter an ingredient list.", ""
-        result = analyze_product(user_text)
+        result = analyze_product(user_text, source="text")
         formatted_details = format_findings_for_display(result)
         return result.get("overall_score", ""), result.get("explanation", ""), formatted_details
 
+    @busy_on_overload
     def run_pipeline_image(image_path):
         if not image_path:
             return "", "Please upload an image.", ""
         raw_text = ocr_from_image(image_path)
         if not raw_text:
             return "", "Could not extract text from the image. Please try a clearer image.", ""
-        ingredients_list_text = extract_ingredients_with_llm(raw_text)
+        ingredients_list_text = extract_ingredients(raw_text)
         if not ingredients_list_text:
             return "", "Could not extract a valid list of ingredients from the text. Please ensure the ingredients are clearly visible.", ""
-        result = analyze_product(ingredients_list_text)
+        result = analyze_product(ingredients_list_text, source="image")
         formatted_details = format_findings_for_display(result)
         return result.get("overall_score", ""), result.get("explanation", ""), formatted_details
 
+    @busy_on_overload
     def run_pipeline_url(url):
         if not url:
             return "", "Please enter a URL.", ""
@@ -559,10 +646,10 @@ with gr.Blocks(title="Cosmetic Ingredient Safety – Local RAG") as demo:
         scraped_text = scrape_ingredients_from_url(url)
         if "Error:" in scraped_text or "No ingredient list found" in scraped_text:
             return "", scraped_text, ""
-        ingredients_list_text = extract_ingredients_with_llm(scraped_text)
+        ingredients_list_text = extract_ingredients(scraped_text)
         if not ingredients_list_text:
             return "", "Could not extract a valid list of ingredients from the scraped page. The page structure might be complex or the ingredient list is not clearly identifiable.", ""
-        result = analyze_product(ingredients_list_text)
+        result = analyze_product(ingredients_list_text, source="url", source_ref=url)
         formatted_details = format_findings_for_display(result)
         return result.get("overall_score", ""), result.get("explanation", ""), formatted_details
 
@@ -584,5 +671,143 @@ with gr.Blocks(title="Cosmetic Ingredient Safety – Local RAG") as demo:
         outputs=[score_out, explanation_out, details_out],
     )
 
+# =========================
+# JSON API
+# =========================
+API_WORKERS = int(os.getenv("API_WORKERS", "8"))   # threads for OCR, scraping and analysis
+API_MAX_BATCH = 1000                               # products per /api/analyze/batch request
+API_EXECUTOR = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+
+api = FastAPI(title="Cosmetic Ingredient Risk Analyzer", default_response_class=ORJSONResponse)
+
+class TextRequest(BaseModel):
+    text: str
+
+class UrlRequest(BaseModel):
+    url: str
+
+class BatchItem(BaseModel):
+    id: str
+    text: str
+
+class BatchRequest(BaseModel):
+    products: List[Union[BatchItem, str]]
+    explain: bool = False
+
+async def run_blocking(fn, *args, **kwargs):
+    """Runs a blocking pipeline stage on API_EXECUTOR so the event loop keeps serving."""
+    return await asyncio.get_running_loop().run_in_executor(API_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+async def analyze_extracted(raw_text: str, source: str, source_ref: Optional[str] = None) -> Dict:
+    """Ingredient extraction then analysis, as the image and URL tabs do it."""
+    ingredients_list_text = await run_blocking(extract_ingredients, raw_text)
+    if not ingredients_list_text:
+        raise HTTPException(422, "Could not extract a valid list of ingredients.")
+    return await run_blocking(analyze_product, ingredients_list_text, source=source, source_ref=source_ref)
+
+@api.exception_handler(LLMOverloaded)
+async def llm_overloaded(request: Request, exc: LLMOverloaded):
+    return ORJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "30"})
+
+@api.post("/api/analyze/text")
+async def api_analyze_text(body: TextRequest):
+    """Findings for a pasted ingredient list."""
+    if not body.text.strip():
+        raise HTTPException(400, "Please enter an ingredient list.")
+    return await run_blocking(analyze_product, body.text, source="text")
+
+@api.post("/api/analyze/image")
+async def api_analyze_image(request: Request):
+    """Findings for a label photo sent as the raw request body."""
+    data = await request.body()
+    if not data:
+        raise HTTPException(400, "Please upload an image.")
+    raw_text = await run_blocking(ocr_from_image, data)
+    if not raw_text:
+        raise HTTPException(422, "Could not extract text from the image.")
+    return await analyze_extracted(raw_text, source="image")
+
+@api.post("/api/analyze/url")
+async def api_analyze_url(body: UrlRequest):
+    """Findings for a product page."""
+    parsed = urlparse(body.url)
+    if not all([parsed.scheme, parsed.netloc]):
+        raise HTTPException(400, "Invalid URL format. Please enter a complete URL.")
+    scraped_text = await run_blocking(scrape_ingredients_from_url, body.url)
+    if "Error:" in scraped_text or "No ingredient list found" in scraped_text:
+        raise HTTPException(502, scraped_text)
+    return await analyze_extracted(scraped_text, source="url", source_ref=body.url)
+
+@api.post("/api/analyze/batch")
+async def api_analyze_batch(body: BatchRequest):
+    """Findings for many ingredient lists (strings or {id, text}), via analyze_products."""
+    if len(body.products) > API_MAX_BATCH:
+        raise HTTPException(413, f"At most {API_MAX_BATCH} products per request.")
+    items = [(p.id, p.text) if isinstance(p, BatchItem) else p for p in body.products]
+    results = await run_blocking(lambda: list(analyze_products(items, explain=body.explain)))
+    return {"count": len(results), "results": results}
+
+
+# =========================
+# Metrics
+# =========================
+# Existing counters are read at scrape time rather than duplicated on the hot path.
+def _cache_hit_ratios():
+    llm = COMPLETION_CACHE.site_stats().values()
+    llm_hits, llm_total = sum(c["hits"] for c in llm), sum(c["hits"] + c["misses"] for c in llm)
+    result_total = RESULT_CACHE.hits + RESULT_CACHE.misses
+    return [({"cache": "llm"}, llm_hits / llm_total if llm_total else 0.0),
+            ({"cache": "result"}, RESULT_CACHE.hits / result_total if result_total else 0.0)]
+
+def _scheduler_classes(field: str):
+    return [({"priority": name}, c[field]) for name, c in SCHEDULER.metrics()["classes"].items()]
+
+REGISTRY.callback("ira_llm_cache_requests", "LLM completion cache lookups per call site.", "counter",
+                  lambda: [({"call_site": site, "result": result}, c[column])
+                           for site, c in COMPLETION_CACHE.site_stats().items()
+                           for result, column in (("hit", "hits"), ("miss", "misses"))])
+REGISTRY.callback("ira_result_cache_requests", "Full-result cache lookups.", "counter",
+                  lambda: [({"result": "hit"}, RESULT_CACHE.hits), ({"result": "miss"}, RESULT_CACHE.misses)])
+REGISTRY.callback("ira_cache_hit_ratio", "Hit ratio since start, per cache.", "gauge", _cache_hit_ratios)
+REGISTRY.callback("ira_extractions", "Ingredient extractions by extractor (parser or LLM).", "counter",
+                  lambda: [({"extractor": name}, n) for name, n in EXTRACTION_STATS.items()])
+REGISTRY.callback("ira_llm_queue_depth", "LLM requests waiting for a scheduler slot.", "gauge",
+                  lambda: _scheduler_classes("queue_depth"))
+REGISTRY.callback("ira_llm_admitted", "LLM requests admitted by the scheduler.", "counter",
+                  lambda: _scheduler_classes("admitted"))
+REGISTRY.callback("ira_llm_shed", "LLM requests shed for missing their deadline budget.", "counter",
+                  lambda: _scheduler_classes("shed"))
+REGISTRY.callback("ira_llm_in_flight", "LLM requests running in Ollama.", "gauge",
+                  lambda: [({}, SCHEDULER.metrics()["in_flight"])])
+REGISTRY.callback("ira_risk_snapshot_version", "Published risk database version.", "gauge",
+                  lambda: [({}, SNAPSHOTS.current().version)])
+
+# Under serve.py the coordinator's /metrics covers every process (serve.py replaces
+# METRICS_RENDER); a worker's own /metrics covers only itself, so its series carry a worker label.
+if APP_ROLE == "worker":
+    METRICS_RENDER = lambda: render_families(merge_families({str(os.getpid()): REGISTRY.collect()}))
+else:
+    METRICS_RENDER = REGISTRY.render
+
+@api.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of the metrics (see METRICS_RENDER)."""
+    return PlainTextResponse(METRICS_RENDER(), media_type="text/plain; version=0.0.4")
+
+# =========================
+# HTTP server: health endpoint + Gradio UI
+# =========================
+@api.get("/health")
+def health():
+    """Model warm-up state; 503 until every model is loaded so traffic waits for a warm server."""
+    if APP_ROLE == "worker":
+        WARMER.refresh()   # the coordinator warms; a worker just reads what Ollama has loaded
+    report = WARMER.health()
+    return JSONResponse(report, status_code=200 if report["status"] == "ok" else 503)
+
+# Workers serve only the JSON API; the UI runs in the coordinator (or standalone process).
+server = gr.mount_gradio_app(api, demo, path="/") if APP_ROLE != "worker" else api
+
 if __name__ == "__main__":
-    demo.launch(server_name="0.0.0.0", server_port=7860)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(server, host="0.0.0.0", port=7860)
\ No newline at end of file
@@ -0,0 +1,184 @@
+import re
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+
+from pagecache import normalize_url
+
+# =========================
+# HAR archive
+# =========================
+class HarArchive:
+    """
+    Fetched product pages stored as a HAR 1.2 file. Each entry carries a custom
+    "_stage" field ("http" for static HTML, "browser" for the rendered DOM) so a
+    replay can follow the same path as the live scraper. Rewriting the file
+    costs O(entries), so records are saved in batches: after `autosave_every`
+    new records or `autosave_seconds`, whichever comes first, and on close().
+    """
+
+    def __init__(self, path: str, autosave_every: int = 50, autosave_seconds: float = 30.0):
+        self.path = Path(path)
+        self.autosave_every = autosave_every
+        self.autosave_seconds = autosave_seconds
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._index: Dict[tuple, Dict] = {}
+        self._positions: Dict[tuple, int] = {}   # key -> position in the entries list
+        if self.path.exists():
+            self._har = json.loads(self.path.read_text(encoding="utf-8"))
+        else:
+            self._har = {"log": {
+                "version": "1.2",
+                "creator": {"name": "cosmetic-ingredient-risk-analyzer", "version": "1.0"},
+                "entries": [],
+            }}
+        for position, entry in enumerate(self._har["log"]["entries"]):
+            key = (normalize_url(entry["request"]["url"]), entry.get("_stage", "http"))
+            self._index[key] = entry
+            self._positions[key] = position
+
+    def __len__(self):
+        return len(self._har["log"]["entries"])
+
+    def entries(self) -> List[Dict]:
+        return list(self._har["log"]["entries"])
+
+    def record(self, url: str, html: str, stage: str = "http", status: int = 200,
+               headers: Optional[Dict[str, str]] = None, elapsed: float = 0.0):
+        entry = {
+            "startedDateTime": datetime.now(timezone.utc).isoformat(),
+            "time": round(elapsed * 1000, 1),
+            "request": {
+                "method": "GET", "url": url, "httpVersion": "HTTP/1.1",
+                "headers": [], "queryString": [], "cookies": [], "headersSize": -1, "bodySize": 0,
+            },
+            "response": {
+                "status": status, "statusText": "OK" if status == 200 else "", "httpVersion": "HTTP/1.1",
+                "headers": [{"name": k, "value": v} for k, v in (headers or {}).items()],
+                "cookies": [],
+                "content": {"size": len(html), "mimeType": "text/html; charset=utf-8", "text": html},
+                "redirectURL": "", "headersSize": -1, "bodySize": len(html),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": round(elapsed * 1000, 1), "receive": 0},
+            "_stage": stage,
+        }
+        with self._lock:
+            key = (normalize_url(url), stage)
+            entries = self._har["log"]["entries"]
+            position = self._positions.get(key)
+            if position is not None:
+                entries[position] = entry
+            else:
+                self._positions[key] = len(entries)
+                entries.append(entry)
+            self._index[key] = entry
+            self._unsaved += 1
+            if (self._unsaved >= self.autosave_every
+                    or time.monotonic() - self._saved_at >= self.autosave_seconds):
+                self._save_locked()
+
+    def lookup(self, url: str, stage: str) -> Optional[str]:
+        entry = self._index.get((normalize_url(url), stage))
+        return entry["response"]["content"].get("text") if entry else None
+
+    def save(self):
+        with self._lock:
+            self._save_locked()
+
+    def close(self):
+        """Writes any records not yet saved."""
+        with self._lock:
+            if self._unsaved:
+                self._save_locked()
+
+    def _save_locked(self):
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self._har, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+# =========================
+# Replay benchmark
+# =========================
+def token_f1(expected: str, actual: str) -> float:
+    split = lambda s: {t.strip().lower() for t in re.split(r"[,;]", s) if t.strip()}
+    exp, act = split(expected), split(actual)
+    if not exp and not act:
+        return 1.0
+    if not exp or not act:
+        return 0.0
+    overlap = len(exp & act)
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / len(act), overlap / len(exp)
+    return 2 * precision * recall / (precision + recall)
+
+def replay_benchmark(archive_path: str, expected_path: Optional[str] = None,
+                     update_expected: bool = False, repeat: int = 1) -> Dict:
+    """
+    Re-runs the extractor cascade over every page in an archive with no network
+    access. Reports throughput and, against a golden file of expected ingredient
+    texts ({url: text}), per-page token F1 and exact-match accuracy.
+    """
+    from scraper import replay_extract
+
+    archive = HarArchive(archive_path)
+    urls = sorted({e["request"]["url"] for e in archive.entries()}, key=normalize_url)
+    expected = {}
+    if expected_path and Path(expected_path).exists() and not update_expected:
+        expected = json.loads(Path(expected_path).read_text(encoding="utf-8"))
+
+    results = {}
+    total_bytes = sum(len(e["response"]["content"].get("text") or "") for e in archive.entries())
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for url in urls:
+            results[url] = replay_extract(url, archive)
+    elapsed = time.perf_counter() - started
+
+    pages = len(urls) * repeat
+    report = {
+        "pages": pages,
+        "seconds": elapsed,
+        "pages_per_second": pages / elapsed if elapsed else 0.0,
+        "mb_per_second": total_bytes * repeat / 1024 / 1024 / elapsed if elapsed else 0.0,
+        "found": sum(1 for text in results.values() if text),
+    }
+    if expected:
+        scores = {url: token_f1(expected.get(url, ""), results.get(url, "")) for url in expected}
+        report["mean_f1"] = sum(scores.values()) / len(scores)
+        report["scored"] = len(scores)
+        report["exact"] = sum(1 for url in expected if expected[url] == results.get(url, ""))
+        report["regressions"] = sorted(url for url, f1 in scores.items() if f1 < 1.0)
+    if update_expected and expected_path:
+        Path(expected_path).write_text(json.dumps(results, indent=4, ensure_ascii=False), encoding="utf-8")
+        print(f"📝 Wrote {len(results)} expected results to {expected_path}")
+    return report
+
+@click.command()
+@click.argument('archive_path')
+@click.option('--expected', help='Golden JSON file of {url: expected ingredient text}')
+@click.option('--update-expected', is_flag=True, help='Write current extractor output as the new golden file')
+@click.option('--repeat', default=1, help='Replay the corpus N times for steadier timings (default: 1)')
+def main(archive_path, expected, update_expected, repeat):
+    """Benchmark and regression-test the extractors against a recorded HAR archive."""
+    report = replay_benchmark(archive_path, expected, update_expected, repeat)
+    click.echo(f"📊 {report['pages']} pages in {report['seconds']:.2f}s "
+               f"({report['pages_per_second']:.1f} pages/s, {report['mb_per_second']:.1f} MB/s), "
+               f"ingredients found on {report['found']}")
+    if "mean_f1" in report:
+        click.echo(f"   accuracy: mean token F1 {report['mean_f1']:.3f}, exact match {report['exact']}/{report['scored']}")
+        for url in report["regressions"]:
+            click.echo(f"   ❌ {url}")
+
+if __name__ == "__main__":
+    main()
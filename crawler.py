@@ -0,0 +1,355 @@
+import json
+import time
+import random
+import asyncio
+import functools
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+import click
+
+from metrics import Histogram
+from pagecache import PAGE_CACHE, is_fresh, normalize_url
+from scraper import (
+    BOT_BLOCK_STATUSES,
+    USER_AGENTS,
+    browser_extract,
+    domain_of,
+    extract_ingredient_text,
+    known_stage,
+    record_page,
+    record_stage,
+)
+
+# =========================
+# Config
+# =========================
+DEFAULT_CONCURRENCY = 16     # pages in flight across all domains
+DEFAULT_PER_DOMAIN = 2       # pages in flight per domain
+DEFAULT_DOMAIN_DELAY = 0.5   # minimum seconds between request starts on one domain
+DEFAULT_RETRIES = 3
+BROWSER_CONCURRENCY = 2      # headless Chrome instances used for escalations
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+# =========================
+# Crawl stats
+# =========================
+CRAWL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)   # seconds
+
+def format_latency(buckets: Tuple[float, ...], counts: List[int], total: float, n: int) -> str:
+    """One histogram series as "n=.. mean=..ms [<=50ms: 3, ...]"."""
+    labels = [f"<={b * 1000:g}ms" for b in buckets] + [f">{buckets[-1] * 1000:g}ms"]
+    parts = ", ".join(f"{label}: {c}" for label, c in zip(labels, counts) if c)
+    mean = total / n * 1000 if n else 0.0
+    return f"n={n} mean={mean:.0f}ms [{parts}]"
+
+class CrawlStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.pages = 0
+        self.by_status: Dict[str, int] = {}
+        self.by_stage: Dict[str, int] = {}
+        # Per crawl, so not registered with metrics.REGISTRY.
+        self.latency = Histogram("crawl_stage_seconds", "Seconds per crawl stage.", ["stage"], buckets=CRAWL_BUCKETS)
+
+    def observe(self, stage: str, seconds: float):
+        self.latency.observe(seconds, stage)
+
+    def record(self, result: Dict):
+        self.pages += 1
+        self.by_status[result["status"]] = self.by_status.get(result["status"], 0) + 1
+        if result.get("stage"):
+            self.by_stage[result["stage"]] = self.by_stage.get(result["stage"], 0) + 1
+
+    def pages_per_minute(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.pages / elapsed * 60 if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        lines = [
+            f"📊 {self.pages} pages in {time.monotonic() - self.started:.1f}s ({self.pages_per_minute():.1f} pages/min)",
+            f"   status: {self.by_status}",
+            f"   answered by: {self.by_stage}",
+        ]
+        for (stage,), (counts, total, n) in self.latency.series().items():
+            lines.append(f"   {stage}: {format_latency(self.latency.buckets, counts, total, n)}")
+        return "\n".join(lines)
+
+# =========================
+# URL sources
+# =========================
+def read_url_list(path: str) -> List[str]:
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+def read_sitemap(source: str, _depth: int = 0) -> List[str]:
+    """Reads a sitemap (file path or URL), following sitemap indexes."""
+    if source.startswith(("http://", "https://")):
+        import requests
+        xml_text = requests.get(source, timeout=30, headers={"User-Agent": random.choice(USER_AGENTS)}).text
+    else:
+        xml_text = Path(source).read_text(encoding="utf-8")
+    root = ET.fromstring(xml_text)
+    locs = [el.text.strip() for el in root.iter(f"{SITEMAP_NS}loc") if el.text]
+    if root.tag == f"{SITEMAP_NS}sitemapindex" and _depth < 3:
+        urls = []
+        for loc in locs:
+            urls.extend(read_sitemap(loc, _depth + 1))
+        return urls
+    return locs
+
+# =========================
+# Checkpointing
+# =========================
+def load_checkpoint(path: Path) -> Set[str]:
+    """Returns the normalized URLs already finished in a previous run (errors are retried)."""
+    done = set()
+    if not path.exists():
+        return done
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # a partial last line from an interrupted run
+        if record.get("status") in ("ok", "no_ingredients", "not_found"):
+            done.add(normalize_url(record["url"]))
+    return done
+
+# =========================
+# Per-domain limiter
+# =========================
+class DomainLimiter:
+    """Bounds concurrent requests per domain and spaces out their start times."""
+
+    def __init__(self, per_domain: int, min_interval: float):
+        self.per_domain = per_domain
+        self.min_interval = min_interval
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_start: Dict[str, float] = {}
+
+    def semaphore(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self._sems:
+            self._sems[domain] = asyncio.Semaphore(self.per_domain)
+            self._locks[domain] = asyncio.Lock()
+        return self._sems[domain]
+
+    async def wait_turn(self, domain: str):
+        async with self._locks[domain]:
+            delay = self._last_start.get(domain, 0.0) + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_start[domain] = time.monotonic()
+
+# =========================
+# Crawler
+# =========================
+async def _fetch(session: aiohttp.ClientSession, url: str, retries: int) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    GETs a URL, retrying transient failures with exponential backoff and jitter.
+    Returns (html, etag, last_modified).
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with session.get(url, headers={"User-Agent": random.choice(USER_AGENTS)}) as resp:
+                if resp.status in RETRY_STATUSES and attempt < retries:
+                    retry_after = resp.headers.get("Retry-After", "")
+                    delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt + random.random()
+                    await asyncio.sleep(delay)
+                    continue
+                resp.raise_for_status()
+                html = await resp.text(errors="replace")
+                return html, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt >= retries:
+                raise
+            await asyncio.sleep(2 ** attempt + random.random())
+
+async def _crawl_one(url: str, session, limiter: DomainLimiter, browser_sem: asyncio.Semaphore,
+                     retries: int, stats: CrawlStats) -> Dict:
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    result = {"url": url, "status": "error", "stage": None, "ingredient_text": "", "error": None}
+
+    # SQLite and the domain-stage file are touched on executor threads, never on the loop.
+    entry = await loop.run_in_executor(None, PAGE_CACHE.get, url)
+    if entry and entry.get("ingredient_text") and is_fresh(entry):
+        result.update(status="ok", stage="cache", ingredient_text=entry["ingredient_text"])
+        stats.observe("total", time.monotonic() - started)
+        return result
+
+    domain = domain_of(url)
+    try:
+        if known_stage(domain) != "browser":
+            try:
+                async with limiter.semaphore(domain):
+                    await limiter.wait_turn(domain)
+                    t0 = time.monotonic()
+                    html, etag, last_modified = await _fetch(session, url, retries)
+                    stats.observe("fetch", time.monotonic() - t0)
+                await loop.run_in_executor(None, record_page, url, html, "http", None, time.monotonic() - t0)
+                t0 = time.monotonic()
+                static_domain = known_stage(domain) == "http"
+                text = await loop.run_in_executor(None, extract_ingredient_text, html, static_domain, domain)
+                stats.observe("extract", time.monotonic() - t0)
+                if text:
+                    await loop.run_in_executor(None, record_stage, domain, "http")
+                    await loop.run_in_executor(None, functools.partial(
+                        PAGE_CACHE.put, url, html, text, etag=etag, last_modified=last_modified))
+                    result.update(status="ok", stage="http", ingredient_text=text)
+                    return result
+                if static_domain:
+                    result.update(status="no_ingredients", stage="http")
+                    return result
+            except aiohttp.ClientResponseError as e:
+                # Only bot blocks are worth a browser; 404/410 and exhausted 5xx are final.
+                if e.status not in BOT_BLOCK_STATUSES:
+                    status = "not_found" if e.status in (404, 410) else "error"
+                    result.update(status=status, stage="http", error=f"HTTP {e.status}")
+                    return result
+                print(f"HTTP fetch blocked for {url}: {e.status}. Escalating to browser.")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"HTTP fetch failed for {url}: {e}. Escalating to browser.")
+
+        async with browser_sem:
+            t0 = time.monotonic()
+            text, html = await loop.run_in_executor(None, browser_extract, url)
+            stats.observe("browser", time.monotonic() - t0)
+        if text:
+            await loop.run_in_executor(None, PAGE_CACHE.put, url, html, text)
+            result.update(status="ok", stage="browser", ingredient_text=text)
+        else:
+            result.update(status="no_ingredients", stage="browser")
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        stats.observe("total", time.monotonic() - started)
+    return result
+
+async def crawl(urls: Iterable[str],
+                analyze: Optional[Callable[[str], Dict]] = None,
+                checkpoint: Optional[str] = None,
+                concurrency: int = DEFAULT_CONCURRENCY,
+                per_domain: int = DEFAULT_PER_DOMAIN,
+                domain_delay: float = DEFAULT_DOMAIN_DELAY,
+                retries: int = DEFAULT_RETRIES,
+                analyze_workers: int = 1,
+                stats: Optional[CrawlStats] = None) -> AsyncIterator[Dict]:
+    """
+    Crawls product URLs concurrently and yields one result dict per page as soon
+    as it is ready. When `analyze` is given (e.g. a wrapper around
+    app.analyze_product) each extracted ingredient text is streamed into it on a
+    worker thread and its findings are attached to the result. When `checkpoint`
+    is a JSONL path, results are appended to it and URLs already finished there
+    are skipped, so an interrupted crawl resumes where it stopped.
+    """
+    stats = stats or CrawlStats()
+    checkpoint_path = Path(checkpoint) if checkpoint else None
+    done = load_checkpoint(checkpoint_path) if checkpoint_path else set()
+    pending = []
+    seen = set(done)
+    for url in urls:
+        key = normalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            pending.append(url)
+    if done:
+        print(f"⏩ Resuming: {len(done)} URLs already done, {len(pending)} to go")
+
+    limiter = DomainLimiter(per_domain, domain_delay)
+    browser_sem = asyncio.Semaphore(BROWSER_CONCURRENCY)
+    analyze_sem = asyncio.Semaphore(analyze_workers)
+    global_sem = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    timeout = aiohttp.ClientTimeout(total=30, connect=5)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_domain, ttl_dns_cache=300)
+    out = checkpoint_path.open("a", encoding="utf-8") if checkpoint_path else None
+
+    async def worker(url: str) -> Dict:
+        async with global_sem:
+            result = await _crawl_one(url, session, limiter, browser_sem, retries, stats)
+        if analyze and result["status"] == "ok":
+            async with analyze_sem:
+                t0 = time.monotonic()
+                try:
+                    result["findings"] = await loop.run_in_executor(None, analyze, result["ingredient_text"])
+                except Exception as e:
+                    result.update(status="error", error=f"analysis failed: {type(e).__name__}: {e}")
+                stats.observe("analyze", time.monotonic() - t0)
+        return result
+
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            tasks = [asyncio.ensure_future(worker(url)) for url in pending]
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                stats.record(result)
+                if out:
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                yield result
+    finally:
+        if out:
+            out.close()
+
+def run_crawl(urls: Iterable[str], **kwargs) -> CrawlStats:
+    """Blocking wrapper around crawl() that drains all results and returns the stats."""
+    stats = kwargs.pop("stats", None) or CrawlStats()
+
+    async def _drain():
+        async for _ in crawl(urls, stats=stats, **kwargs):
+            pass
+
+    asyncio.run(_drain())
+    return stats
+
+def app_analyzer(ingredient_text: str) -> Dict:
+    """Runs scraped text through the same extraction + analysis as the URL tab."""
+    import app  # imported lazily: loading app builds the vector index
+    from llm_scheduler import BULK, llm_priority
+    with llm_priority(BULK):  # crawls must not starve interactive users of the LLM
+        ingredients_list_text = app.extract_ingredients(ingredient_text)
+        if not ingredients_list_text:
+            raise ValueError("no ingredients extracted")
+        return app.analyze_product(ingredients_list_text, source="crawl")
+
+# =========================
+# CLI
+# =========================
+@click.command()
+@click.argument('source')
+@click.option('--sitemap', is_flag=True, help='Treat SOURCE as a sitemap (file or URL) instead of a URL list')
+@click.option('--output', '-o', default='crawl_results.jsonl', help='JSONL results / checkpoint file (default: crawl_results.jsonl)')
+@click.option('--concurrency', default=DEFAULT_CONCURRENCY, help=f'Pages in flight overall (default: {DEFAULT_CONCURRENCY})')
+@click.option('--per-domain', default=DEFAULT_PER_DOMAIN, help=f'Pages in flight per domain (default: {DEFAULT_PER_DOMAIN})')
+@click.option('--delay', default=DEFAULT_DOMAIN_DELAY, help=f'Seconds between requests to one domain (default: {DEFAULT_DOMAIN_DELAY})')
+@click.option('--retries', default=DEFAULT_RETRIES, help=f'Retries per page with backoff (default: {DEFAULT_RETRIES})')
+@click.option('--analyze', is_flag=True, help='Stream extracted ingredients into the risk analysis pipeline')
+@click.option('--analyze-workers', default=1, help='Concurrent analyses when --analyze is set (default: 1)')
+@click.option('--report-every', default=100, help='Print progress stats every N pages (default: 100)')
+def main(source, sitemap, output, concurrency, per_domain, delay, retries, analyze, analyze_workers, report_every):
+    """Crawl product URLs from SOURCE (a file with one URL per line, or a sitemap)."""
+    urls = read_sitemap(source) if sitemap else read_url_list(source)
+    click.echo(f"Crawling {len(urls)} URLs -> {output}")
+    stats = CrawlStats()
+
+    async def _run():
+        async for result in crawl(urls, analyze=app_analyzer if analyze else None, checkpoint=output,
+                                  concurrency=concurrency, per_domain=per_domain, domain_delay=delay,
+                                  retries=retries, analyze_workers=analyze_workers, stats=stats):
+            if result["status"] == "error":
+                click.echo(f"❌ {result['url']}: {result['error']}", err=True)
+            if report_every and stats.pages % report_every == 0:
+                click.echo(stats.report())
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        click.echo("Interrupted - re-run the same command to resume from the checkpoint.", err=True)
+    click.echo(stats.report())
+
+if __name__ == "__main__":
+    main()
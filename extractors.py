@@ -0,0 +1,652 @@
+import re
+import sys
+import time
+from pathlib import Path
+from html.parser import HTMLParser
+import json
+import html as html_lib
+import threading
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:  # fall back to the stdlib parser when lxml is not installed
+    etree = None
+
+from ingredient_parser import current_dictionary
+
+# =========================
+# Config
+# =========================
+# Tags that start a new text block. Inline tags (span, b, a, ...) are merged into
+# the surrounding block so "<b>Ingredients:</b> Water, ..." stays together.
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "br", "dd", "details", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table",
+    "tbody", "td", "th", "thead", "tr", "ul",
+}
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Implied end tags for the stdlib walker (lxml applies these itself): start tag ->
+# [(open tags it closes, tags that stop the search)], after the HTML parsing rules.
+_SCOPE = {"applet", "button", "caption", "html", "marquee", "object", "table", "td", "template", "th"}
+_CLOSES_P = ({"p"}, _SCOPE)
+IMPLIED_END: Dict[str, List[Tuple[set, set]]] = {
+    tag: [_CLOSES_P] for tag in (
+        "address", "article", "aside", "blockquote", "details", "dialog", "div", "dl", "fieldset",
+        "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+        "hgroup", "hr", "main", "menu", "nav", "ol", "p", "pre", "section", "summary", "table", "ul",
+    )
+}
+IMPLIED_END.update({
+    "li": [({"li"}, _SCOPE | {"ol", "ul", "menu"}), _CLOSES_P],
+    "dt": [({"dt", "dd"}, _SCOPE | {"dl"}), _CLOSES_P],
+    "dd": [({"dt", "dd"}, _SCOPE | {"dl"}), _CLOSES_P],
+    "tr": [({"tr"}, {"table", "thead", "tbody", "tfoot"})],
+    "td": [({"td", "th"}, {"tr", "table"})],
+    "th": [({"td", "th"}, {"tr", "table"})],
+    "thead": [({"thead", "tbody", "tfoot"}, {"table"})],
+    "tbody": [({"thead", "tbody", "tfoot"}, {"table"})],
+    "tfoot": [({"thead", "tbody", "tfoot"}, {"table"})],
+    "option": [({"option"}, {"select", "datalist", "optgroup"})],
+})
+
+ANCHOR_RE = re.compile(r"\b(ingredients?|composition|what'?s in it|full list|inci)\b\s*:?", re.IGNORECASE)
+PART_CLEAN_RE = re.compile(r"\([^)]*\)|[*†‡.]")
+
+# schema.org / microdata fields that hold the ingredient list itself, and the
+# ones worth capturing during the walk (descriptions may embed "Ingredients: ...").
+INGREDIENT_FIELDS = {"ingredients", "ingredient", "activeingredient", "activeingredients",
+                     "inactiveingredients", "inci", "composition", "fulllistofingredients"}
+STRUCTURED_PROPS = INGREDIENT_FIELDS | {"description", "name", "value"}
+JSON_LD_RE = re.compile(r"<script[^>]*application/ld\+json[^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r"<[^>]+>")
+
+FOLLOWING_BLOCKS = 3   # blocks after an anchor that are considered as candidates
+MIN_PARTS = 4          # fewer comma-separated parts than this is not an ingredient list
+MIN_SCORE = 2.5
+
+# =========================
+# Single-pass page walk
+# =========================
+class WalkedPage(NamedTuple):
+    blocks: List[str]       # visible text of each block, in document order
+    nodes: List[Optional[tuple]]  # element each block belongs to, as (tag, id, classes, parent) chains
+    json_ld: List[str]      # raw contents of each application/ld+json script
+    props: List[Tuple[str, str]]  # (property, text) from microdata itemprop / RDFa property attributes
+
+def _make_node(tag: str, attrs: Dict, parent: Optional[tuple]) -> tuple:
+    return (tag, attrs.get("id") or "", tuple((attrs.get("class") or "").split()), parent)
+
+class _PropCollector:
+    """Captures the text of microdata / RDFa properties while the walker streams by."""
+
+    def __init__(self):
+        self.props: List[Tuple[str, str]] = []
+        self._open: List[list] = []  # [stack_depth, property, text_parts, position]
+
+    def start(self, attrs: Dict, depth: int, void: bool):
+        names = (attrs.get("itemprop") or "").split() + (attrs.get("property") or "").split()
+        names = [n.rsplit("/", 1)[-1].rsplit(":", 1)[-1].lower() for n in names]
+        for name in names:
+            if name not in STRUCTURED_PROPS:
+                continue
+            content = attrs.get("content")
+            if content is not None or void:
+                self.props.append((name, content or ""))
+            else:
+                # Reserve the slot now so properties stay in document order.
+                self.props.append((name, ""))
+                self._open.append([depth, name, [], len(self.props) - 1])
+
+    def data(self, text: str):
+        for capture in self._open:
+            capture[2].append(text)
+
+    def close_to(self, depth: int):
+        while self._open and self._open[-1][0] > depth:
+            _, name, parts, position = self._open.pop()
+            self.props[position] = (name, " ".join("".join(parts).split()))
+
+class _PageWalker(HTMLParser):
+    """Stdlib streaming walker: collects block texts and JSON-LD payloads in one pass."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[str] = []
+        self.nodes: List[Optional[tuple]] = []
+        self.json_ld: List[str] = []
+        self._buf: List[str] = []
+        self._stack: List[tuple] = []
+        self._skip = 0
+        self._json_buf = None
+        self._props = _PropCollector()
+
+    def _flush(self):
+        if self._buf:
+            text = " ".join("".join(self._buf).split())
+            if text:
+                self.blocks.append(text)
+                self.nodes.append(self._stack[-1] if self._stack else None)
+            self._buf = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+            if tag == "script" and (dict(attrs).get("type") or "").lower() == "application/ld+json":
+                self._json_buf = []
+            return
+        if self._skip:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        self._close_implied(tag)
+        attrs = dict(attrs)
+        void = tag in VOID_TAGS
+        if not void:
+            self._stack.append(_make_node(tag, attrs, self._stack[-1] if self._stack else None))
+        if "itemprop" in attrs or "property" in attrs:
+            self._props.start(attrs, len(self._stack), void)
+
+    def _pop_to(self, index: int):
+        del self._stack[index:]
+        self._props.close_to(len(self._stack))
+
+    def _close_implied(self, tag: str):
+        """Closes what a new start tag ends implicitly: an open <li> on the next <li>, an open <p> on a block, ..."""
+        for closes, scope in IMPLIED_END.get(tag, ()):
+            for i in range(len(self._stack) - 1, -1, -1):
+                name = self._stack[i][0]
+                if name in closes:
+                    self._pop_to(i)
+                    break
+                if name in scope:
+                    break
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            if tag == "script" and self._json_buf is not None:
+                self.json_ld.append("".join(self._json_buf))
+                self._json_buf = None
+            return
+        if self._skip:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        # Pop up to the matching open tag; stray end tags are ignored.
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                self._pop_to(i)
+                break
+
+    def handle_data(self, data):
+        if self._json_buf is not None:
+            self._json_buf.append(data)
+        elif not self._skip:
+            self._buf.append(data)
+            self._props.data(data)
+
+def _walk_stdlib(html: str) -> WalkedPage:
+    walker = _PageWalker()
+    walker.feed(html)
+    walker.close()
+    walker._flush()
+    walker._props.close_to(0)
+    return WalkedPage(walker.blocks, walker.nodes, walker.json_ld, walker._props.props)
+
+def _walk_lxml(html: str) -> WalkedPage:
+    root = lxml.html.document_fromstring(html)
+    blocks, nodes, json_ld, buf, stack = [], [], [], [], []
+    props = _PropCollector()
+    skip = 0
+
+    def flush():
+        if buf:
+            text = " ".join("".join(buf).split())
+            if text:
+                blocks.append(text)
+                nodes.append(stack[-1] if stack else None)
+            buf.clear()
+
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag if isinstance(el.tag, str) else None  # comments / PIs have no string tag
+        if event == "start":
+            if tag in SKIP_TAGS:
+                skip += 1
+                if tag == "script" and (el.get("type") or "").lower() == "application/ld+json":
+                    json_ld.append(el.text or "")
+                continue
+            if skip or not tag:
+                continue
+            if tag in BLOCK_TAGS:
+                flush()
+            stack.append(_make_node(tag, el.attrib, stack[-1] if stack else None))
+            if "itemprop" in el.attrib or "property" in el.attrib:
+                props.start(el.attrib, len(stack), tag in VOID_TAGS)
+            if el.text:
+                buf.append(el.text)
+                props.data(el.text)
+        else:
+            if tag in SKIP_TAGS:
+                skip -= 1
+            elif tag and not skip:
+                if tag in BLOCK_TAGS:
+                    flush()
+                stack.pop()
+                props.close_to(len(stack))
+            if not skip and el.tail:
+                buf.append(el.tail)
+                props.data(el.tail)
+    flush()
+    props.close_to(0)
+    return WalkedPage(blocks, nodes, json_ld, props.props)
+
+def walk_page(html: str) -> WalkedPage:
+    """
+    Walks the DOM once and returns the visible text of every block element in
+    document order (own text only, never descendants' text re-joined), the
+    element each block belongs to, and the raw contents of each
+    application/ld+json script.
+    """
+    if etree is not None:
+        try:
+            return _walk_lxml(html)
+        except (etree.ParserError, ValueError):
+            pass
+    return _walk_stdlib(html)
+
+# =========================
+# Candidate scoring
+# =========================
+def score_candidate(text: str, dictionary: Optional[Mapping] = None) -> float:
+    """
+    Scores how much a span looks like an ingredient list: comma density,
+    share of parts found in the ingredient dictionary, and short part length.
+    """
+    parts = [PART_CLEAN_RE.sub("", p).strip().lower() for p in re.split(r"[,;]", text)]
+    parts = [p for p in parts if p]
+    if len(parts) < MIN_PARTS:
+        return 0.0
+    dictionary = current_dictionary() if dictionary is None else dictionary
+    words = len(text.split())
+    density = min(len(parts) / max(words, 1), 1.0)       # ~0.3-0.6 for INCI lists, <0.1 for prose
+    hit_ratio = sum(1 for p in parts if p in dictionary) / len(parts)
+    avg_len = sum(len(p) for p in parts) / len(parts)
+    length_penalty = 0.0 if avg_len <= 30 else min((avg_len - 30) / 30, 1.0)
+    return 5 * density + 5 * hit_ratio + min(len(parts), 30) / 10 - 3 * length_penalty
+
+def _candidates(blocks: List[str], i: int, anchor_end: int):
+    """Yields (span, source_block_index) pairs near an anchor in block i."""
+    tail = blocks[i][anchor_end:].lstrip(" :-–")
+    if tail:
+        yield tail, i
+    joined = tail
+    for j in range(i + 1, min(i + 1 + FOLLOWING_BLOCKS, len(blocks))):
+        yield blocks[j], j
+        joined = f"{joined}, {blocks[j]}" if joined else blocks[j]
+        yield joined, j
+
+def best_ingredient_block(blocks: List[str], dictionary: Optional[Mapping] = None) -> Tuple[str, int]:
+    """
+    Finds "ingredients" anchors among the block texts and returns the highest
+    scoring nearby span with the index of the block it came from, or ("", -1)
+    when nothing looks like an ingredient list.
+    """
+    dictionary = current_dictionary() if dictionary is None else dictionary
+    best_text, best_index, best_score = "", -1, MIN_SCORE
+    for i, block in enumerate(blocks):
+        for m in ANCHOR_RE.finditer(block):
+            for candidate, source in _candidates(blocks, i, m.end()):
+                score = score_candidate(candidate, dictionary)
+                if score > best_score:
+                    best_text, best_index, best_score = candidate, source, score
+    return best_text, best_index
+
+def find_ingredient_block(blocks: List[str], dictionary: Optional[Mapping] = None) -> str:
+    return best_ingredient_block(blocks, dictionary)[0]
+
+def extract_ingredient_block(html: str, dictionary: Optional[Mapping] = None) -> str:
+    return find_ingredient_block(walk_page(html).blocks, dictionary)
+
+# =========================
+# Structured data (JSON-LD / microdata / RDFa)
+# =========================
+def _plain_text(value) -> str:
+    if isinstance(value, list):
+        return ", ".join(t for t in (_plain_text(v) for v in value) if t)
+    if isinstance(value, dict):
+        return _plain_text(value.get("name") or value.get("value") or "")
+    if not isinstance(value, str):
+        return ""
+    return " ".join(html_lib.unescape(TAG_RE.sub(" ", value)).split())
+
+def _text_after_anchor(text: str) -> str:
+    m = ANCHOR_RE.search(text)
+    return text[m.end():].lstrip(" :-–") if m else ""
+
+def walk_schema(data):
+    """
+    Recursively yields (kind, text) ingredient candidates from parsed JSON-LD:
+    "field" for explicit ingredient properties anywhere in the tree (@graph
+    arrays, nested Product / offers / isVariantOf objects ...), "property" for
+    additionalProperty-style {"name": "Ingredients", "value": ...} pairs and
+    "description" for descriptions that embed an "Ingredients:" section.
+    """
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+        name = node.get("name")
+        if isinstance(name, str) and name.strip().lower().rstrip(":") in INGREDIENT_FIELDS and "value" in node:
+            yield "property", _plain_text(node["value"])
+        for key, value in node.items():
+            lowered = key.lower().rsplit(":", 1)[-1]
+            if lowered in INGREDIENT_FIELDS:
+                yield "field", _plain_text(value)
+            elif lowered == "description" and isinstance(value, str):
+                embedded = _text_after_anchor(_plain_text(value))
+                if embedded:
+                    yield "description", embedded
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+
+def _best_structured(candidates, dictionary: Optional[Mapping]) -> str:
+    """Explicit fields win; descriptions must also look like an ingredient list."""
+    dictionary = current_dictionary() if dictionary is None else dictionary
+    best_text, best_rank = "", None
+    for kind, text in candidates:
+        if not text:
+            continue
+        trusted = kind in ("field", "property")
+        score = score_candidate(text, dictionary)
+        if not trusted and score <= 0:
+            continue
+        rank = (trusted, score)
+        if best_rank is None or rank > best_rank:
+            best_text, best_rank = text, rank
+    return best_text
+
+def _json_ld_candidates(payloads: List[str]):
+    for payload in payloads:
+        try:
+            data = json.loads(payload, strict=False)
+        except json.JSONDecodeError:
+            continue
+        yield from walk_schema(data)
+
+def extract_json_ld(html: str, dictionary: Optional[Mapping] = None) -> str:
+    """
+    Fast path that needs no DOM walk: pulls every ld+json script out with one
+    regex scan and walks the parsed data for ingredient fields.
+    """
+    if "ld+json" not in html:
+        return ""
+    return _best_structured(_json_ld_candidates(JSON_LD_RE.findall(html)), dictionary)
+
+def _microdata_candidates(props: List[Tuple[str, str]]):
+    pending_name = None
+    for prop, text in props:
+        if prop in INGREDIENT_FIELDS:
+            yield "field", text
+        elif prop == "name":
+            pending_name = text.strip().lower().rstrip(":")
+        elif prop == "value" and pending_name in INGREDIENT_FIELDS:
+            yield "property", text
+            pending_name = None
+        elif prop == "description":
+            embedded = _text_after_anchor(text)
+            if embedded:
+                yield "description", embedded
+
+def extract_structured(page: WalkedPage, dictionary: Optional[Mapping] = None) -> str:
+    """Ingredient text from a walked page's JSON-LD and microdata / RDFa properties."""
+    candidates = list(_json_ld_candidates(page.json_ld)) + list(_microdata_candidates(page.props))
+    return _best_structured(candidates, dictionary)
+
+# =========================
+# CSS-style selectors over walked nodes
+# =========================
+# Supports the subset needed for product pages: tag, #id, .class compounds joined
+# by descendant (space) or child (>) combinators, e.g. "div#ingredients > p".
+_COMPOUND_RE = re.compile(r"^([a-zA-Z][a-zA-Z0-9-]*|\*)?((?:[#.][\w-]+)*)$")
+_DIGITS_RE = re.compile(r"\d{3,}")
+
+def parse_selector(selector: str) -> List[Tuple[str, str, Tuple[str, ...], str]]:
+    """
+    Parses a selector into (tag, id, classes, combinator) compounds ordered right
+    to left; combinator links a compound to the one on its right (" " or ">").
+    """
+    tokens = selector.replace(">", " > ").split()
+    compounds, combinator = [], " "
+    for token in tokens:
+        if token == ">":
+            combinator = ">"
+            continue
+        m = _COMPOUND_RE.match(token)
+        if not m:
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        tag = m.group(1) if m.group(1) and m.group(1) != "*" else ""
+        parts = re.findall(r"[#.][\w-]+", m.group(2))
+        el_id = next((p[1:] for p in parts if p[0] == "#"), "")
+        classes = tuple(p[1:] for p in parts if p[0] == ".")
+        if compounds:
+            compounds[-1] = compounds[-1][:3] + (combinator,)
+        compounds.append((tag.lower(), el_id, classes, ""))
+        combinator = " "
+    return list(reversed(compounds))
+
+def _compound_matches(compound, node) -> bool:
+    tag, el_id, classes, _ = compound
+    return ((not tag or node[0] == tag)
+            and (not el_id or node[1] == el_id)
+            and all(c in node[2] for c in classes))
+
+def selector_matches(compounds, node, ci: int = 0) -> bool:
+    if node is None or not _compound_matches(compounds[ci], node):
+        return False
+    if ci + 1 == len(compounds):
+        return True
+    parent = node[3]
+    if compounds[ci + 1][3] == ">":
+        return selector_matches(compounds, parent, ci + 1)
+    while parent is not None:
+        if selector_matches(compounds, parent, ci + 1):
+            return True
+        parent = parent[3]
+    return False
+
+def node_selector(node, max_steps: int = 5) -> str:
+    """Builds a child-combinator path ("div#product > div.tab > p") ending at a node."""
+    steps = []
+    while node is not None and len(steps) < max_steps:
+        tag, el_id, classes, parent = node
+        step = tag
+        if el_id and not _DIGITS_RE.search(el_id):
+            step += f"#{el_id}"
+        step += "".join(f".{c}" for c in classes[:2] if not _DIGITS_RE.search(c))
+        steps.append(step)
+        if tag in ("body", "html"):
+            break
+        node = parent
+    return " > ".join(reversed(steps))
+
+def _strip_anchor(text: str) -> str:
+    m = ANCHOR_RE.match(text)
+    return text[m.end():].lstrip(" :-–") if m else text
+
+def extract_with_selector(page: WalkedPage, selector: str, trusted: bool = False,
+                          dictionary: Optional[Mapping] = None) -> str:
+    """
+    Returns the text of the first block matching the selector. Learned selectors
+    must also look like an ingredient list; hand-written (trusted) ones need not.
+    """
+    compounds = parse_selector(selector)
+    dictionary = current_dictionary() if dictionary is None else dictionary
+    for text, node in zip(page.blocks, page.nodes):
+        if selector_matches(compounds, node):
+            text = _strip_anchor(text)
+            if text and (trusted or score_candidate(text, dictionary) > 0):
+                return text
+    return ""
+
+# =========================
+# Per-domain extractor registry
+# =========================
+EXTRACTOR_REGISTRY_FILE = Path("extractor_registry.json")
+MAX_LEARNED_MISSES = 3  # consecutive misses before a learned selector is dropped
+
+class ExtractorRegistry:
+    """
+    Domain-keyed selectors, persisted as JSON and reloaded when the file changes:
+
+        {"example.com": {"manual": ["div#ingredients > p"],
+                         "learned": {"div.tab > p": {"hits": 4, "misses": 0}}}}
+
+    "manual" selectors are written by hand and tried first; "learned" ones are
+    recorded automatically from the block that won a generic extraction.
+    """
+
+    def __init__(self, path: Path = EXTRACTOR_REGISTRY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._domains: Dict[str, Dict] = {}
+        self._maybe_reload()
+
+    def _maybe_reload(self):
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            try:
+                self._domains = json.loads(self.path.read_text(encoding="utf-8"))
+                self._mtime = mtime
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Could not reload extractor registry: {e}")
+
+    def _save(self):
+        try:
+            self.path.write_text(json.dumps(self._domains, indent=4), encoding="utf-8")
+            self._mtime = self.path.stat().st_mtime
+        except OSError as e:
+            print(f"⚠️ Could not persist extractor registry: {e}")
+
+    def selectors_for(self, domain: str) -> List[Tuple[str, bool]]:
+        """Returns (selector, trusted) pairs for a domain, hand-written ones first."""
+        with self._lock:
+            self._maybe_reload()
+            entry = self._domains.get(domain) or {}
+            learned = sorted((entry.get("learned") or {}).items(), key=lambda kv: -kv[1].get("hits", 0))
+            return [(s, True) for s in entry.get("manual", [])] + [(s, False) for s, _ in learned]
+
+    def record(self, domain: str, selector: str, hit: bool):
+        with self._lock:
+            entry = self._domains.setdefault(domain, {"manual": [], "learned": {}})
+            learned = entry.setdefault("learned", {})
+            if hit:
+                stats = learned.get(selector)
+                if stats and not stats["misses"]:
+                    stats["hits"] += 1  # plain reuse: counted in memory, no disk write
+                    return
+                stats = learned.setdefault(selector, {"hits": 0, "misses": 0})
+                stats["hits"] += 1
+                stats["misses"] = 0
+            elif selector in learned:
+                learned[selector]["misses"] += 1
+                if learned[selector]["misses"] >= MAX_LEARNED_MISSES:
+                    del learned[selector]
+            else:
+                return
+            self._save()
+
+    def extract(self, page: WalkedPage, domain: str) -> str:
+        """Tries the domain's known selectors; misses on learned ones are recorded."""
+        for selector, trusted in self.selectors_for(domain):
+            try:
+                text = extract_with_selector(page, selector, trusted)
+            except ValueError as e:
+                print(f"⚠️ {e}")
+                continue
+            if text:
+                if not trusted:
+                    self.record(domain, selector, hit=True)
+                return text
+            if not trusted:
+                self.record(domain, selector, hit=False)
+        return ""
+
+    def learn(self, page: WalkedPage, domain: str, block_index: int):
+        """Records the DOM path of the block that won a generic extraction."""
+        if 0 <= block_index < len(page.nodes) and page.nodes[block_index] is not None:
+            self.record(domain, node_selector(page.nodes[block_index]), hit=True)
+
+EXTRACTOR_REGISTRY = ExtractorRegistry()
+
+# =========================
+# Benchmark
+# =========================
+def _legacy_section_extract(html: str) -> str:
+    """The previous soup.find_all lambda, kept here only for benchmark comparison."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    sections = soup.find_all(
+        lambda tag: tag.name in ['div', 'p', 'span', 'li', 'ul'] and
+        any(keyword in tag.get_text(strip=True).lower() for keyword in ['ingredients', 'composition', 'what\'s in it', 'full list'])
+    )
+    for section in sections:
+        text = section.get_text(separator=' ', strip=True)
+        if len(text.split(',')) > 5 and "ingredients" in text.lower():
+            return text
+    return ""
+
+def run_benchmark(corpus_dir: str, legacy: bool = True):
+    """
+    Times the single-pass extractor (and optionally the legacy one) over every
+    saved *.html page in corpus_dir, e.g. pages saved with webscrb.py.
+    """
+    pages = sorted(Path(corpus_dir).glob("*.html"))
+    if not pages:
+        print(f"No .html pages found in {corpus_dir}")
+        return
+    totals = {"single_pass": 0.0, "legacy": 0.0}
+    found = {"single_pass": 0, "legacy": 0}
+    total_bytes = 0
+    for page in pages:
+        html = page.read_text(encoding="utf-8", errors="replace")
+        total_bytes += len(html)
+        runners = [("single_pass", extract_ingredient_block)]
+        if legacy:
+            runners.append(("legacy", _legacy_section_extract))
+        row = []
+        for name, fn in runners:
+            start = time.perf_counter()
+            text = fn(html)
+            elapsed = time.perf_counter() - start
+            totals[name] += elapsed
+            found[name] += bool(text)
+            row.append(f"{name}={elapsed * 1000:.1f}ms{'' if text else ' (none)'}")
+        print(f"{page.name} ({len(html) / 1024:.0f} KB): " + ", ".join(row))
+    print(f"\n{len(pages)} pages, {total_bytes / 1024 / 1024:.1f} MB, parser={'lxml' if etree is not None else 'html.parser'}")
+    for name in totals:
+        if name == "legacy" and not legacy:
+            continue
+        print(f"{name}: total {totals[name]:.2f}s, {totals[name] / len(pages) * 1000:.1f} ms/page, found {found[name]}/{len(pages)}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python extractors.py <corpus_dir> [--no-legacy]")
+        sys.exit(1)
+    run_benchmark(sys.argv[1], legacy="--no-legacy" not in sys.argv)
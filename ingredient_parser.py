@@ -0,0 +1,477 @@
+import re
+import sys
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from riskdata import RISK_DB
+
+# =========================
+# Config
+# =========================
+# "Ingredients:" in the languages we see on packaging and retailer pages.
+ANCHOR_RE = re.compile(
+    r"(?:\b(?:ingredients?|ingr[ée]dients?|inhaltsstoffe|bestandteile|ingredientes|ingredienti|"
+    r"ingrediënten|sk[łl]adniki|composition|inci)\b|成分|全成分|配料)\s*(?:list\s*)?[:：\-–]?",
+    re.IGNORECASE,
+)
+# Section headers that end an ingredient block.
+SECTION_HEADER_RE = re.compile(
+    r"(?:\b(?:directions?|how to use|usage|use|warnings?|cautions?|precautions?|storage|store|"
+    r"made in|manufactured|distributed|net\s*wt|net weight|contents|apply|for external use|"
+    r"key ingredients|benefits|mode d'emploi|pr[ée]cautions?|anwendung|warnhinweise|"
+    r"modo de uso|advertencias)\b\s*[:：]|使用方法|注意事项|注意)",
+    re.IGNORECASE,
+)
+# A full stop followed by an ordinary sentence ("Apply daily to ...") ends the list;
+# INCI items are Title Case, so "Capitalized lowercase" marks prose.
+SENTENCE_END_RE = re.compile(r"\.\s+(?=[A-Z][a-z]+\s+[a-z])|\.\s*\n\s*\n|。")
+SEPARATOR_RE = re.compile(r"[,;，；、•·|]")
+ITEM_SHAPE_RE = re.compile(r"^[\w\s\-/+().'&%*†‡,À-ɏ一-鿿]{2,60}$")
+
+PARSER_CONFIDENCE_THRESHOLD = 0.6  # below this the LLM extractor is used instead
+MIN_ITEMS = 3
+
+# =========================
+# Ingredient dictionary
+# =========================
+# Where parsers and extractors read the ingredient table when no dictionary is passed.
+# app points this at the live risk snapshot; standalone scripts get riskdata.py as loaded.
+_dictionary_provider: Callable[[], Mapping[str, Dict]] = lambda: RISK_DB
+
+def set_dictionary_provider(provider: Callable[[], Mapping[str, Dict]]):
+    global _dictionary_provider
+    _dictionary_provider = provider
+
+def current_dictionary() -> Mapping[str, Dict]:
+    return _dictionary_provider()
+
+# =========================
+# Rule-based "Ingredients:" parser
+# =========================
+def _block_end(text: str) -> int:
+    end = len(text)
+    for regex in (SECTION_HEADER_RE, SENTENCE_END_RE):
+        m = regex.search(text)
+        if m and m.start() < end:
+            end = m.start()
+    return end
+
+def _split_items(block: str) -> List[str]:
+    block = re.sub(r"-\s*\n\s*", "", block)  # OCR hyphenation: "Buty-\nlene" -> "Butylene"
+    if SEPARATOR_RE.search(block):
+        block = re.sub(r"\s*\n\s*", " ", block)
+    else:
+        block = re.sub(r"\s*\n\s*", ",", block)  # one ingredient per line
+    items = [p.strip(" .:*\t") for p in SEPARATOR_RE.split(block)]
+    return [p for p in items if p]
+
+def score_items(items: List[str], dictionary: Optional[Mapping] = None) -> float:
+    """
+    Confidence in [0, 1] that items form a clean ingredient list: dictionary hit
+    ratio, share of items shaped like ingredient names, and list length.
+    """
+    if len(items) < MIN_ITEMS:
+        return 0.0
+    dictionary = current_dictionary() if dictionary is None else dictionary
+    hits = sum(1 for p in items if p.lower() in dictionary)
+    shaped = sum(1 for p in items if ITEM_SHAPE_RE.match(p) and len(p.split()) <= 6)
+    return 0.4 * hits / len(items) + 0.4 * shaped / len(items) + 0.2 * min(len(items) / 8, 1.0)
+
+def parse_ingredient_block(text: str, dictionary: Optional[Mapping] = None) -> Tuple[str, float]:
+    """
+    Finds an ingredient block after an anchor ("Ingredients:", "Ingrédients",
+    "Inhaltsstoffe", "成分", ...). The block ends at the next section header or
+    sentence break. Returns (comma-separated list, confidence). Text without an
+    anchor is parsed whole, e.g. lists the scraper already cut out of a page,
+    with a small confidence penalty.
+    """
+    dictionary = current_dictionary() if dictionary is None else dictionary
+    best, best_conf = "", 0.0
+    spans = [text[m.end():] for m in ANCHOR_RE.finditer(text)]
+    penalty = 1.0
+    if not spans:
+        spans, penalty = [text], 0.9
+    for span in spans:
+        items = _split_items(span[:_block_end(span)])
+        conf = score_items(items, dictionary) * penalty
+        if conf > best_conf:
+            best, best_conf = ", ".join(items), conf
+    return best, best_conf
+
+# =========================
+# Context trimming for LLM extraction
+# =========================
+LLM_CONTEXT_BUDGET = 1500   # estimated tokens of source text sent to the extraction prompt
+WINDOW_AFTER_ANCHOR = 4     # segments kept after an anchor (lists often wrap over lines)
+MAX_SEGMENT_CHARS = 600
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for Latin text)."""
+    return max(1, round(len(text) / 4)) if text else 0
+
+def _segments(text: str) -> List[str]:
+    """Lines of OCR text; long scraped lines are cut into ~400 char chunks at separators."""
+    segments = []
+    for line in text.splitlines():
+        line = line.strip()
+        while len(line) > MAX_SEGMENT_CHARS:
+            cut = max(line.rfind(",", 0, 400), line.rfind(" ", 0, 400))
+            cut = cut if cut > 0 else 400
+            segments.append(line[:cut + 1].strip())
+            line = line[cut + 1:].strip()
+        if line:
+            segments.append(line)
+    return segments
+
+def _segment_score(segment: str, dictionary: Mapping) -> float:
+    items = [p.strip(" .:*").lower() for p in SEPARATOR_RE.split(segment)]
+    hits = sum(1 for p in items if p in dictionary)
+    density = (len(items) - 1) / max(len(segment.split()), 1)  # separators per word
+    return (10 if ANCHOR_RE.search(segment) else 0) + hits + 3 * min(density, 1.0)
+
+def trim_context(text: str, token_budget: int = LLM_CONTEXT_BUDGET,
+                 dictionary: Optional[Mapping] = None) -> Tuple[str, int, int]:
+    """
+    Keeps only the windows of text most likely to hold the ingredient list:
+    around anchors and where dictionary hits are dense. The best windows are
+    chosen until the token budget is used, then kept in document order.
+    Returns (trimmed_text, tokens_before, tokens_after).
+    """
+    before = estimate_tokens(text)
+    if before <= token_budget:
+        return text, before, before
+    dictionary = current_dictionary() if dictionary is None else dictionary
+    segments = _segments(text)
+    scores = [_segment_score(s, dictionary) for s in segments]
+
+    windows = []
+    for i, score in enumerate(scores):
+        if score >= 10:
+            windows.append([i, min(i + WINDOW_AFTER_ANCHOR, len(segments) - 1)])
+        elif score >= 3:
+            windows.append([max(i - 1, 0), min(i + 1, len(segments) - 1)])
+    windows.sort()
+    merged = []
+    for start, end in windows:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    ranked = sorted(merged, key=lambda w: -sum(scores[w[0]:w[1] + 1]))
+    chosen, used = [], 0
+    for start, end in ranked:
+        window_text = "\n".join(segments[start:end + 1])
+        cost = estimate_tokens(window_text)
+        if used + cost > token_budget:
+            if chosen:
+                continue
+            window_text = window_text[:token_budget * 4]  # best window alone is too long
+            cost = estimate_tokens(window_text)
+        chosen.append((start, window_text))
+        used += cost
+    if not chosen:
+        trimmed = text[:token_budget * 4]
+    else:
+        trimmed = "\n...\n".join(t for _, t in sorted(chosen))
+    return trimmed, before, estimate_tokens(trimmed)
+
+# =========================
+# Ingredient list tokenizer
+# =========================
+OPEN_BRACKETS = "([{"
+CLOSE_BRACKETS = ")]}"
+LIST_SEPARATORS = ",;•·|\n、，；"
+FOOTNOTE_CHARS = "*†‡§°¹²³"
+FOOTNOTE_RE = re.compile(f"[{re.escape(FOOTNOTE_CHARS)}]")
+# A footnote legend rather than an ingredient that happens to carry a leading
+# marker: "*Certified organic", "† = naturally derived", "*Organic ingredients".
+LEGEND_RE = re.compile(
+    rf"^[{re.escape(FOOTNOTE_CHARS)}\s]+=?\s*(?:certified\b|organic(?:ally)?\s*(?:$|grown|farm|origin|"
+    r"ingredients?|agricult|certified)|(?:from|of)\s+(?:organic|natural|certified)|"
+    r"natural(?:ly)?\s+(?:derived|origin|occurring)|fair\s*trade|ingredients?\b|bio\s*$)",
+    re.IGNORECASE,
+)
+WHITESPACE_RE = re.compile(r"\s+")
+LETTER_RE = re.compile(r"[^\W\d_]")
+MAX_TOKEN_WORDS = 8   # longer "items" are prose (disclaimers, directions)
+
+MAY_CONTAIN_RE = re.compile(
+    r"\s*(?:\+\s*/\s*-|±|\[\s*\+\s*/\s*-\s*\]|may\s+contain|peut\s+contenir|kann\s+enthalten|puede\s+contener)"
+    r"(?:\s*[(\[]\s*\+\s*/\s*-\s*[)\]])?\s*:?",
+    re.IGNORECASE,
+)
+CONCENTRATION_RE = re.compile(r"\d+(?:[.,]\d+)?\s*%(?:\s*(?:w/w|w/v|v/v))?", re.IGNORECASE)
+SPECIAL_CHAR_RE = re.compile(r"[()\[\]{},;•·|\n、，；.:：]")
+LEADING_BULLET_RE = re.compile(r"^\s*(?:[-–•·]|\d+[.)])\s+")
+
+class Token(NamedTuple):
+    name: str                       # normalized ingredient name, e.g. "titanium dioxide"
+    start: int                      # span of the item in the source text
+    end: int
+    qualifier: Optional[str]        # bracketed text, e.g. "ci 77891", nested brackets kept
+    alternatives: Tuple[str, ...]   # slash alternatives, e.g. ("aqua", "water", "eau")
+    concentration: Optional[str]    # e.g. "2%"
+    footnotes: str                  # footnote markers that followed the name, e.g. "*"
+    may_contain: bool               # listed under "may contain" / "+/-"
+
+    def candidates(self) -> List[str]:
+        """Names to try against the risk database, most specific first."""
+        keys = [self.name]
+        if self.qualifier:
+            keys.append(f"{self.name} ({self.qualifier})")
+        keys.extend(self.alternatives)
+        if self.qualifier and not SEPARATOR_RE.search(self.qualifier):
+            keys.append(self.qualifier)
+        return keys
+
+def _clean(text: str) -> str:
+    return WHITESPACE_RE.sub(" ", text).strip(" .:-–").lower()
+
+def _make_token(main: List[str], qualifiers: List[str], start: int, end: int,
+                may_contain: bool) -> Optional[Token]:
+    raw = "".join(main)
+    if LEGEND_RE.match(raw.strip()):
+        return None   # footnote legend, e.g. "*Certified organic"
+    footnotes = "".join(FOOTNOTE_RE.findall(raw))
+    qualifier = _clean(" ".join(qualifiers)) or None
+
+    concentration = None
+    m = CONCENTRATION_RE.search(raw)
+    if m:
+        concentration, raw = m.group(0).replace(" ", ""), raw[:m.start()] + raw[m.end():]
+    elif qualifier and CONCENTRATION_RE.fullmatch(qualifier):
+        concentration, qualifier = qualifier.replace(" ", ""), None
+
+    name = LEADING_BULLET_RE.sub("", raw)
+    name = _clean(FOOTNOTE_RE.sub("", name))
+    if not LETTER_RE.search(name) or len(name.split()) > MAX_TOKEN_WORDS:
+        return None
+    alternatives = ()
+    if "/" in name:
+        parts = tuple(p.strip() for p in name.split("/"))
+        if all(len(p) >= 2 for p in parts):
+            alternatives = parts
+    return Token(name, start, end, qualifier, alternatives, concentration, footnotes, may_contain)
+
+def _scan(text: str, offset: int, may_contain: bool) -> Iterator[Token]:
+    depth = 0          # bracket nesting depth
+    item_depth = 0     # depth whose contents are list items (1 inside "[+/- May contain: ...]")
+    main: List[str] = []
+    qualifiers: List[str] = []
+    qual: List[str] = []
+    start = end = None
+    qual_open = None   # position of the outermost open qualifier bracket
+    n = len(text)
+    i = 0
+
+    def flush():
+        nonlocal main, qualifiers, qual, start, end
+        token = None
+        if start is not None:
+            token = _make_token(main, qualifiers, offset + start, offset + end, may_contain)
+        main, qualifiers, qual, start, end = [], [], [], None, None
+        return token
+
+    while i < n:
+        if depth == item_depth and start is None:
+            m = MAY_CONTAIN_RE.match(text, i)
+            if m and text[i:m.end()].strip():
+                may_contain = True
+                i = m.end()
+                continue
+        # Runs of ordinary characters are copied in one step.
+        m = SPECIAL_CHAR_RE.search(text, i)
+        j = m.start() if m else n
+        if j > i:
+            chunk = text[i:j]
+            if depth > item_depth:
+                qual.append(chunk)
+            else:
+                if chunk.strip():
+                    if start is None:
+                        start = i + len(chunk) - len(chunk.lstrip())
+                        chunk = chunk.lstrip()
+                    end = i + len(text[i:j].rstrip())
+                if start is not None:
+                    main.append(chunk)
+            i = j
+            continue
+
+        c = text[i]
+        if c in OPEN_BRACKETS:
+            if depth == item_depth and MAY_CONTAIN_RE.match(text, i + 1):
+                token = flush()   # bracketed "[+/- May contain: ...]" list
+                if token:
+                    yield token
+                depth += 1
+                item_depth = depth
+                may_contain = True
+            else:
+                if depth == item_depth:
+                    qual_open = i
+                elif depth > item_depth:
+                    qual.append(c)
+                depth += 1
+                if start is None:
+                    start = i
+        elif c in CLOSE_BRACKETS:
+            if depth == 0:
+                pass   # stray closing bracket
+            elif depth == item_depth:
+                token = flush()
+                if token:
+                    yield token
+                depth -= 1
+                item_depth -= 1
+                may_contain = False
+            else:
+                depth -= 1
+                if depth > item_depth:
+                    qual.append(c)
+                else:
+                    group = "".join(qual).strip()
+                    qual, qual_open = [], None
+                    end = i + 1
+                    if group.lower() == "and":
+                        # INCI blend convention: "Cyclopentasiloxane (and) Dimethicone"
+                        token = flush()
+                        if token:
+                            yield token
+                    elif group:
+                        qualifiers.append(group)
+        elif depth > item_depth:
+            qual.append(c)
+        elif c in LIST_SEPARATORS:
+            if c == "," and 0 < i < n - 1 and text[i - 1].isdigit() and text[i + 1].isdigit():
+                main.append(c)   # "1,2-Hexanediol" keeps its comma
+            else:
+                token = flush()
+                if token:
+                    yield token
+        elif c == ".":
+            if i == n - 1 or text[i + 1].isspace():
+                token = flush()   # "... Mica. *Organic": a full stop ends the item; "0.5%" does not
+                if token:
+                    yield token
+            elif start is not None:
+                main.append(c)
+                end = i + 1
+        else:   # ":" ends a label such as "Active Ingredients:"
+            if MAY_CONTAIN_RE.search("".join(main)):
+                may_contain = True
+            main, qualifiers, start, end = [], [], None, None
+        i += 1
+
+    if depth > item_depth and qual_open is not None:
+        # Unclosed bracket: treat the rest as list items rather than one huge qualifier.
+        if start is not None:
+            token = _make_token(main, qualifiers, offset + start, offset + qual_open, may_contain)
+            if token:
+                yield token
+        yield from _scan(text[qual_open + 1:], offset + qual_open + 1, may_contain)
+        return
+    token = flush()
+    if token:
+        yield token
+
+def iter_tokens(text: str) -> Iterator[Token]:
+    """
+    Single pass over an ingredient list. Handles nested brackets (kept as the
+    qualifier), "May contain (+/-):" sections, concentrations, */† footnote
+    markers and legends, "(and)" blends, and digit commas as in
+    "1,2-Hexanediol". Yields Tokens with their source spans; junk items
+    (no letters, prose) are dropped.
+    """
+    # Items led by a footnote marker ("*Organic Aloe Leaf Juice") are ingredients
+    # unless they trail the list after a full stop or line break and reuse a
+    # marker from an earlier item, as in "Aloe*, Mica. *Organic"; those are legends.
+    pending: List[Token] = []
+    markers = set()
+    for token in _scan(text, 0, False):
+        if text[token.start] in FOOTNOTE_CHARS:
+            pending.append(token)
+            continue
+        yield from pending
+        pending = []
+        markers.update(token.footnotes)
+        yield token
+    for token in pending:
+        after_stop = text[:token.start].rstrip(" \t")[-1:] in (".", "\n", "。")
+        if not (after_stop and text[token.start] in markers):
+            yield token
+
+def tokenize_ingredients(text: str) -> List[Token]:
+    """iter_tokens with repeated names removed (first occurrence kept)."""
+    seen, tokens = set(), []
+    for token in iter_tokens(text):
+        if token.name not in seen:
+            seen.add(token.name)
+            tokens.append(token)
+    return tokens
+
+def fingerprint(tokens: List[Token]) -> str:
+    """
+    Canonical ID of an ingredient list: each item's candidate names (see
+    Token.candidates) in list order, with "may contain" items sorted since their
+    order carries no meaning. Qualifiers count because they can change which
+    database entry an item resolves to ("Colorant (CI 77891)" vs "(CI 77491)").
+    Whitespace, casing and punctuation differences give the same fingerprint.
+    """
+    items = [(t.may_contain, "\x1d".join(t.candidates())) for t in tokens]
+    listed = [item for optional, item in items if not optional]
+    optional = sorted(item for optional, item in items if optional)
+    canonical = "\x1f".join(listed) + "\x1e" + "\x1f".join(optional)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+# =========================
+# Tokenizer benchmark
+# =========================
+TOKENIZER_CORPUS = Path("tokenizer_corpus.json")
+
+def _legacy_tokenize(raw_text: str) -> List[str]:
+    """The regex tokenizer app.py used before iter_tokens, kept for comparison."""
+    raw_text = re.sub(r"\(.*?\)", "", raw_text)
+    parts = re.split(r"[,;\n]", raw_text)
+    return [p.strip() for p in parts if p.strip()]
+
+def run_tokenizer_benchmark(corpus_path: Path = TOKENIZER_CORPUS, repeat: int = 200):
+    """
+    Checks iter_tokens against a corpus of [{"text", "expected", "may_contain"}]
+    cases (expected names in order, lowercase) and compares its speed and
+    exact-match rate with the legacy regex tokenizer.
+    """
+    cases = json.loads(Path(corpus_path).read_text(encoding="utf-8"))
+    failures = 0
+    legacy_ok = 0
+    for case in cases:
+        tokens = tokenize_ingredients(case["text"])
+        names = [t.name for t in tokens]
+        flagged = [t.name for t in tokens if t.may_contain]
+        if names != case["expected"] or flagged != case.get("may_contain", []):
+            failures += 1
+            print(f"❌ {case['text'][:70]!r}\n   expected {case['expected']} (may contain {case.get('may_contain', [])})"
+                  f"\n   got      {names} (may contain {flagged})")
+        legacy_ok += [p.lower() for p in _legacy_tokenize(case["text"])] == case["expected"]
+
+    size = sum(len(case["text"]) for case in cases) * repeat
+    timings = {}
+    for name, fn in (("state_machine", lambda t: list(iter_tokens(t))), ("legacy", _legacy_tokenize)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for case in cases:
+                fn(case["text"])
+        timings[name] = time.perf_counter() - started
+    print(f"\n{len(cases)} cases: state machine {len(cases) - failures}/{len(cases)} correct, "
+          f"legacy regex {legacy_ok}/{len(cases)}")
+    for name, elapsed in timings.items():
+        print(f"{name}: {size / elapsed / 1024 / 1024:.1f} MB/s, "
+              f"{len(cases) * repeat / elapsed:,.0f} lists/s")
+    return failures
+
+if __name__ == "__main__":
+    corpus = Path(sys.argv[1]) if len(sys.argv) > 1 else TOKENIZER_CORPUS
+    sys.exit(1 if run_tokenizer_benchmark(corpus) else 0)
@@ -0,0 +1,276 @@
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+    MessageRole,
+)
+from llama_index.llms.ollama import Ollama
+
+from llm_scheduler import SCHEDULER, priority_for
+from metrics import LLM_SECONDS, LLM_TOKENS
+
+# =========================
+# Config
+# =========================
+LLM_CACHE_PATH = Path("llm_cache.sqlite3")
+LLM_CACHE_TTL = 30 * 24 * 60 * 60   # seconds before a cached completion expires
+LLM_CACHE_MAX_ENTRIES = 50000       # least recently used entries are evicted beyond this
+EVICT_EVERY = 200                   # inserts between eviction sweeps
+# Hit/miss counts and access times are kept in memory and written in batches:
+# after this many lookups or seconds, whichever comes first, with every insert, and at exit.
+STATS_FLUSH_EVERY = 200
+STATS_FLUSH_SECONDS = 30.0
+
+# Which call site an LLM request comes from, and whether it may be served from cache.
+_call_site: ContextVar[str] = ContextVar("llm_call_site", default="other")
+_use_cache: ContextVar[bool] = ContextVar("llm_use_cache", default=True)
+_inside_complete: ContextVar[bool] = ContextVar("llm_inside_complete", default=False)
+
+@contextmanager
+def llm_call_site(name: str, use_cache: bool = True):
+    """
+    Tags LLM calls made inside the block with a call-site name for the cache
+    statistics. use_cache=False skips the lookup (e.g. a retry after a bad
+    answer) but still stores the fresh completion.
+    """
+    site_token = _call_site.set(name)
+    cache_token = _use_cache.set(use_cache)
+    try:
+        yield
+    finally:
+        _call_site.reset(site_token)
+        _use_cache.reset(cache_token)
+
+# =========================
+# SQLite completion cache
+# =========================
+class CompletionCache:
+    def __init__(self, path: Path = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._unflushed_stats: Dict[str, Dict[str, int]] = {}
+        self._unflushed_access: Dict[str, float] = {}   # key -> last hit time
+        self._unflushed_calls = 0
+        self._flushed_at = time.monotonic()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                call_site TEXT,
+                response TEXT,
+                created_at REAL,
+                accessed_at REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions (accessed_at)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS call_site_stats (
+                call_site TEXT PRIMARY KEY,
+                hits INTEGER DEFAULT 0,
+                misses INTEGER DEFAULT 0
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_params: Dict[str, Any], prompt: str) -> str:
+        params = json.dumps(model_params, sort_keys=True, default=str)
+        return hashlib.sha256(f"{params}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Cached response or None. Read-only: expired rows are replaced by the next put() or evicted."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if not row or now - row[1] > self.ttl:
+                return None
+            self._unflushed_access[key] = now
+        return row[0]
+
+    def put(self, key: str, model: str, call_site: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, call_site, response, now, now),
+            )
+            self._inserts += 1
+            self._flush_stats_locked()   # rides on this commit; eviction also needs fresh access times
+            if self._inserts % EVICT_EVERY == 0:
+                self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float):
+        self._conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            """DELETE FROM completions WHERE key IN (
+                SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+
+    def record(self, call_site: str, hit: bool):
+        column = "hits" if hit else "misses"
+        with self._lock:
+            for counts in (self.stats, self._unflushed_stats):
+                counts.setdefault(call_site, {"hits": 0, "misses": 0})[column] += 1
+            self._unflushed_calls += 1
+            if (self._unflushed_calls >= STATS_FLUSH_EVERY
+                    or time.monotonic() - self._flushed_at >= STATS_FLUSH_SECONDS):
+                self._flush_stats_locked()
+                self._conn.commit()
+
+    def flush(self):
+        """Writes buffered hit/miss counts and access times."""
+        with self._lock:
+            self._flush_stats_locked()
+            self._conn.commit()
+
+    def _flush_stats_locked(self):
+        if self._unflushed_access:
+            self._conn.executemany(
+                "UPDATE completions SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(at, key) for key, at in self._unflushed_access.items()],
+            )
+        if self._unflushed_stats:
+            self._conn.executemany(
+                """INSERT INTO call_site_stats (call_site, hits, misses) VALUES (?, ?, ?)
+                   ON CONFLICT(call_site) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses""",
+                [(site, c["hits"], c["misses"]) for site, c in self._unflushed_stats.items()],
+            )
+        self._unflushed_access, self._unflushed_stats = {}, {}
+        self._unflushed_calls = 0
+        self._flushed_at = time.monotonic()
+
+    def site_stats(self) -> Dict[str, Dict[str, int]]:
+        """Copy of this process's hit/miss counts per call site."""
+        with self._lock:
+            return {site: dict(c) for site, c in self.stats.items()}
+
+    def summary(self) -> str:
+        """One-line hit rate per call site for this process, e.g. "explain 3/4 (75%)"."""
+        with self._lock:
+            parts = []
+            for site, c in sorted(self.stats.items()):
+                total = c["hits"] + c["misses"]
+                parts.append(f"{site} {c['hits']}/{total} ({c['hits'] / total:.0%})")
+        return ", ".join(parts) or "no calls yet"
+
+    def persisted_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss totals per call site across all runs."""
+        with self._lock:
+            self._flush_stats_locked()
+            self._conn.commit()
+            rows = self._conn.execute("SELECT call_site, hits, misses FROM call_site_stats").fetchall()
+        return {site: {"hits": hits, "misses": misses} for site, hits, misses in rows}
+
+COMPLETION_CACHE = CompletionCache()
+atexit.register(COMPLETION_CACHE.flush)
+
+# =========================
+# Cached Ollama client
+# =========================
+def _token_counts(raw) -> Dict[str, int]:
+    """Prompt/completion token counts from an Ollama response's raw payload, when present."""
+    if raw is None:
+        return {}
+    get = raw.get if isinstance(raw, dict) else lambda key, default=None: getattr(raw, key, default)
+    usage = get("usage") or {}
+    return {
+        "prompt": usage.get("prompt_tokens", get("prompt_eval_count")) or 0,
+        "completion": usage.get("completion_tokens", get("eval_count")) or 0,
+    }
+
+class CachedOllama(Ollama):
+    """
+    Ollama client whose chat and completion calls go through COMPLETION_CACHE,
+    keyed by model, sampling parameters and a hash of the prompt. Query engines
+    built on Settings.llm are covered too, since they call chat(). Cache misses
+    wait for a SCHEDULER slot before reaching Ollama.
+    """
+
+    def _cache_params(self) -> Dict[str, Any]:
+        sampling = {k: v for k, v in (self.additional_kwargs or {}).items() if k != "keep_alive"}
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "context_window": self.context_window,
+            "json_mode": getattr(self, "json_mode", False),
+            "sampling": sampling,
+        }
+
+    @contextmanager
+    def _request(self):
+        """A scheduler slot for one Ollama request, timed for the per-call-site metrics."""
+        site = _call_site.get()
+        with SCHEDULER.slot(priority_for(site)):
+            started = time.perf_counter()
+            yield
+            LLM_SECONDS.observe(time.perf_counter() - started, site, self.model)
+
+    def _count_tokens(self, response):
+        for kind, n in _token_counts(getattr(response, "raw", None)).items():
+            if n:
+                LLM_TOKENS.inc(_call_site.get(), self.model, kind, amount=n)
+
+    def _lookup(self, prompt: str):
+        key = COMPLETION_CACHE.make_key(self._cache_params(), prompt)
+        cached = COMPLETION_CACHE.get(key) if _use_cache.get() else None
+        COMPLETION_CACHE.record(_call_site.get(), hit=cached is not None)
+        return key, cached
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        if kwargs:
+            with self._request():
+                response = super().complete(prompt, formatted=formatted, **kwargs)
+            self._count_tokens(response)
+            return response
+        key, cached = self._lookup(f"complete:{prompt}")
+        if cached is not None:
+            return CompletionResponse(text=cached)
+        token = _inside_complete.set(True)  # complete() may delegate to chat(); don't count twice
+        try:
+            with self._request():
+                response = super().complete(prompt, formatted=formatted)
+        finally:
+            _inside_complete.reset(token)
+        self._count_tokens(response)
+        COMPLETION_CACHE.put(key, self.model, _call_site.get(), response.text)
+        return response
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        if _inside_complete.get():
+            return super().chat(messages, **kwargs)
+        if kwargs:
+            with self._request():
+                response = super().chat(messages, **kwargs)
+            self._count_tokens(response)
+            return response
+        prompt = json.dumps([[str(m.role), m.content] for m in messages], ensure_ascii=False)
+        key, cached = self._lookup(f"chat:{prompt}")
+        if cached is not None:
+            return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=cached))
+        with self._request():
+            response = super().chat(messages)
+        self._count_tokens(response)
+        COMPLETION_CACHE.put(key, self.model, _call_site.get(), response.message.content or "")
+        return response
@@ -0,0 +1,186 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, ContextManager, Dict, List, Optional
+
+from llama_index.embeddings.ollama import OllamaEmbedding
+
+# =========================
+# Config
+# =========================
+# Priority classes, most urgent first.
+INTERACTIVE_EXPLAIN = 0
+INTERACTIVE_LOOKUP = 1
+BACKGROUND_ENRICH = 2
+BULK = 3
+PRIORITY_NAMES = ["interactive_explain", "interactive_lookup", "background_enrich", "bulk"]
+
+# Call sites that are interactive by default; anything else counts as a lookup.
+SITE_PRIORITY = {"explain": INTERACTIVE_EXPLAIN}
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "2"))  # Ollama requests running at once
+# Longest a request of each class may wait for a slot before it is shed (seconds).
+DEADLINE_BUDGET = {
+    INTERACTIVE_EXPLAIN: 30.0,
+    INTERACTIVE_LOOKUP: 30.0,
+    BACKGROUND_ENRICH: 300.0,
+    BULK: 1800.0,
+}
+INITIAL_SERVICE_TIME = 5.0   # seconds per request assumed until real timings come in
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE_EXPLAIN)
+
+@contextmanager
+def llm_priority(priority: int):
+    """
+    Demotes every LLM/embedding call inside the block to at least this class,
+    e.g. `with llm_priority(BULK):` around crawler analysis.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def priority_for(call_site: str) -> int:
+    return max(_priority.get(), SITE_PRIORITY.get(call_site, INTERACTIVE_LOOKUP))
+
+class LLMOverloaded(RuntimeError):
+    """Raised when a request is shed because it would miss its deadline budget."""
+
+# =========================
+# Scheduler
+# =========================
+class LLMScheduler:
+    """
+    Admits LLM and embedding requests to Ollama in priority order, with at most
+    max_in_flight running at once. A request whose estimated or actual queue
+    wait exceeds its class's deadline budget is shed with LLMOverloaded.
+    Under serve.py workers delegate admission to the coordinator's scheduler.
+    """
+
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT, budgets: Dict[int, float] = None):
+        self.max_in_flight = max(1, max_in_flight)
+        self.budgets = dict(budgets or DEADLINE_BUDGET)
+        self._cond = threading.Condition()
+        self._waiting: List[tuple] = []   # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._service_time = INITIAL_SERVICE_TIME   # moving average of request duration
+        n = len(PRIORITY_NAMES)
+        self._admitted = [0] * n
+        self._shed = [0] * n
+        self._wait_total = [0.0] * n
+        self._wait_max = [0.0] * n
+        self._remote: Optional[Callable[[int], ContextManager]] = None
+
+    def delegate(self, admit: Callable[[int], ContextManager]):
+        """Admits requests through admit(priority) (another process's scheduler) instead of locally."""
+        self._remote = admit
+
+    def _estimated_wait(self, priority: int) -> float:
+        ahead = sum(1 for p, _ in self._waiting if p <= priority)
+        busy = max(0, self._in_flight - self.max_in_flight + 1)
+        return (ahead + busy) / self.max_in_flight * self._service_time
+
+    def _shed_locked(self, priority: int, reason: str):
+        self._shed[priority] += 1
+        print(f"🚦 Shed {PRIORITY_NAMES[priority]} LLM request: {reason}")
+        raise LLMOverloaded(f"LLM busy ({reason})")
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE_LOOKUP):
+        """Blocks until this request may call Ollama, then holds a slot for the block."""
+        if self._remote is not None:
+            with self._remote(priority):
+                with self._cond:
+                    self._in_flight += 1
+                    self._admitted[priority] += 1
+                try:
+                    yield
+                finally:
+                    with self._cond:
+                        self._in_flight -= 1
+            return
+        budget = self.budgets.get(priority, float("inf"))
+        started = time.monotonic()
+        with self._cond:
+            estimate = self._estimated_wait(priority)
+            if estimate > budget:
+                self._shed_locked(priority, f"estimated wait {estimate:.0f}s > {budget:.0f}s budget")
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            while self._in_flight >= self.max_in_flight or self._waiting[0] != ticket:
+                remaining = budget - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    self._shed_locked(priority, f"waited over {budget:.0f}s budget")
+                self._cond.wait(timeout=remaining)
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            waited = time.monotonic() - started
+            self._admitted[priority] += 1
+            self._wait_total[priority] += waited
+            self._wait_max[priority] = max(self._wait_max[priority], waited)
+            self._cond.notify_all()
+
+        service_started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - service_started)
+                self._cond.notify_all()
+
+    def idle(self) -> bool:
+        with self._cond:
+            return self._in_flight == 0 and not self._waiting
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            depth = [0] * len(PRIORITY_NAMES)
+            for p, _ in self._waiting:
+                depth[p] += 1
+            classes = {}
+            for p, name in enumerate(PRIORITY_NAMES):
+                admitted = self._admitted[p]
+                classes[name] = {
+                    "queue_depth": depth[p],
+                    "admitted": admitted,
+                    "shed": self._shed[p],
+                    "mean_wait_s": self._wait_total[p] / admitted if admitted else 0.0,
+                    "max_wait_s": self._wait_max[p],
+                }
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "service_time_s": self._service_time,
+                "classes": classes,
+            }
+
+SCHEDULER = LLMScheduler()
+
+# =========================
+# Scheduled embedding client
+# =========================
+class ScheduledOllamaEmbedding(OllamaEmbedding):
+    """OllamaEmbedding whose requests take a scheduler slot like LLM calls do."""
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        with SCHEDULER.slot(priority_for("embed")):
+            return super()._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        with SCHEDULER.slot(priority_for("embed")):
+            return super()._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        with SCHEDULER.slot(priority_for("embed")):
+            return super()._get_text_embeddings(texts)
@@ -0,0 +1,97 @@
+import time
+import asyncio
+import statistics
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+import aiohttp
+import click
+
+# =========================
+# Config
+# =========================
+DEFAULT_SAMPLES = [
+    "Water, Glycerin, Cetearyl Alcohol, Phenoxyethanol, Fragrance",
+    "Aqua, Talc, Mica, Dimethicone, Methylparaben, Propylparaben",
+    "Water, Cyclopentasiloxane, Titanium Dioxide, Niacinamide, Tocopherol",
+    "Butyrospermum Parkii Butter, Caprylic/Capric Triglyceride, Cera Alba, Parfum",
+]
+
+# =========================
+# Load test
+# =========================
+def request_for(endpoint: str, n: int, samples: List[str], image: Optional[bytes], batch_size: int):
+    """(path, keyword arguments for session.post) for the n-th request."""
+    if endpoint == "text":
+        return "/api/analyze/text", {"json": {"text": samples[n % len(samples)]}}
+    if endpoint == "batch":
+        products = [{"id": f"load-{n}-{i}", "text": samples[(n + i) % len(samples)]} for i in range(batch_size)]
+        return "/api/analyze/batch", {"json": {"products": products}}
+    if endpoint == "image":
+        return "/api/analyze/image", {"data": image, "headers": {"Content-Type": "application/octet-stream"}}
+    return "/api/analyze/url", {"json": {"url": samples[n % len(samples)]}}
+
+async def run_load(base_url: str, endpoint: str, total: int, concurrency: int, samples: List[str],
+                   image: Optional[bytes], batch_size: int, timeout: float):
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(total))
+
+    async def worker(session: aiohttp.ClientSession):
+        for n in counter:
+            path, kwargs = request_for(endpoint, n, samples, image, batch_size)
+            started = time.perf_counter()
+            try:
+                async with session.post(base_url + path, **kwargs) as resp:
+                    await resp.read()
+                    statuses[resp.status] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, statuses
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+@click.command()
+@click.option('--url', 'base_url', default='http://localhost:7860', help='Server base URL (default: http://localhost:7860)')
+@click.option('--endpoint', default='text', type=click.Choice(['text', 'batch', 'image', 'url']), help='Endpoint to hit (default: text)')
+@click.option('--requests', 'total', default=200, help='Total requests (default: 200)')
+@click.option('--concurrency', default=16, help='Requests in flight at once (default: 16)')
+@click.option('--samples', 'samples_file', type=click.Path(exists=True, dir_okay=False), help='File with one ingredient list (or URL) per line')
+@click.option('--image', 'image_file', type=click.Path(exists=True, dir_okay=False), help='Image to post for --endpoint image')
+@click.option('--batch-size', default=50, help='Products per batch request (default: 50)')
+@click.option('--timeout', default=300.0, help='Per-request timeout in seconds (default: 300)')
+def main(base_url, endpoint, total, concurrency, samples_file, image_file, batch_size, timeout):
+    """Load-tests the JSON API and reports requests/sec and latency percentiles."""
+    samples = DEFAULT_SAMPLES
+    if samples_file:
+        samples = [line.strip() for line in Path(samples_file).read_text(encoding="utf-8").splitlines() if line.strip()]
+    if endpoint == "url" and not samples_file:
+        raise click.UsageError("--endpoint url needs --samples with one product URL per line")
+    image = Path(image_file).read_bytes() if image_file else None
+    if endpoint == "image" and image is None:
+        raise click.UsageError("--endpoint image needs --image")
+
+    click.echo(f"🚀 {total} x POST /api/analyze/{endpoint} against {base_url}, {concurrency} concurrent")
+    elapsed, latencies, statuses = asyncio.run(
+        run_load(base_url.rstrip("/"), endpoint, total, concurrency, samples, image, batch_size, timeout)
+    )
+    ok = statuses.get(200, 0)
+    click.echo(f"   {total / elapsed:.1f} requests/s ({ok / elapsed:.1f} successful/s) over {elapsed:.1f}s")
+    if endpoint == "batch":
+        click.echo(f"   {ok * batch_size / elapsed:.1f} products/s")
+    click.echo(f"   latency p50 {percentile(latencies, 50) * 1000:.0f}ms, p95 {percentile(latencies, 95) * 1000:.0f}ms, "
+               f"p99 {percentile(latencies, 99) * 1000:.0f}ms, mean {statistics.mean(latencies) * 1000:.0f}ms")
+    click.echo(f"   status: {', '.join(f'{k}: {v}' for k, v in sorted(statuses.items(), key=str))}")
+
+if __name__ == "__main__":
+    main()
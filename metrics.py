@@ -0,0 +1,219 @@
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import click
+
+# =========================
+# Config
+# =========================
+# Seconds; spans a parser-only extraction (~1ms) up to a cold LLM call (minutes).
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+Sample = Tuple[str, Dict[str, str], float]   # (name suffix, labels, value)
+
+class Family(NamedTuple):
+    """One metric's samples at collection time; plain data, so it can be sent between processes."""
+    name: str
+    help: str
+    kind: str
+    samples: List[Sample]
+    error: Optional[str] = None
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+# =========================
+# Metric types
+# =========================
+class Counter:
+    """Monotonic count per label combination."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield "_total", dict(zip(self.labels, label_values)), value
+
+class Histogram:
+    """Bucketed distribution per label combination, e.g. seconds per pipeline stage."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def series(self) -> Dict[Tuple, Tuple[List[int], float, int]]:
+        """{label values: (per-bucket counts incl. +Inf, sum, count)}, non-cumulative."""
+        with self._lock:
+            return {k: (list(v[:-2]), v[-2], v[-1]) for k, v in self._series.items()}
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        for label_values, counts in series:
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield "_bucket", {**labels, "le": "+Inf" if bound == float("inf") else repr(bound)}, cumulative
+            yield "_sum", labels, counts[-2]
+            yield "_count", labels, counts[-1]
+
+class CallbackMetric:
+    """Values read at scrape time from existing stats, so the hot path pays nothing."""
+
+    def __init__(self, name: str, help: str, kind: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        self.name, self.help, self.kind, self._collect = name, help, kind, collect
+
+    def samples(self) -> Iterable[Sample]:
+        suffix = "_total" if self.kind == "counter" else ""
+        for labels, value in self._collect():
+            yield suffix, labels, value
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), **kwargs) -> Histogram:
+        return self.register(Histogram(name, help, labels, **kwargs))
+
+    def callback(self, name: str, help: str, kind: str,
+                 collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, kind, collect))
+
+    def collect(self) -> List[Family]:
+        families = []
+        for metric in self._metrics:
+            try:
+                families.append(Family(metric.name, metric.help, metric.kind, list(metric.samples())))
+            except Exception as e:   # a broken callback must not take down the endpoint
+                families.append(Family(metric.name, metric.help, metric.kind, [], str(e)))
+        return families
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        return render_families(self.collect())
+
+def render_families(families: Iterable[Family]) -> str:
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for suffix, labels, value in family.samples:
+            lines.append(f"{family.name}{suffix}{_format_labels(labels)} {float(value)!r}")
+        if family.error:
+            lines.append(f"# {family.name} unavailable: {family.error}")
+    return "\n".join(lines) + "\n"
+
+def merge_families(processes: Mapping[str, List[Family]], label: str = "worker") -> List[Family]:
+    """
+    Metrics of several processes as one exposition: each sample gets `label`
+    naming its process, and each metric keeps a single HELP/TYPE header.
+    """
+    merged: Dict[str, Family] = {}
+    for process, families in processes.items():
+        for family in families:
+            target = merged.setdefault(family.name, Family(family.name, family.help, family.kind, []))
+            target.samples.extend((suffix, {**labels, label: process}, value)
+                                  for suffix, labels, value in family.samples)
+            if family.error:
+                merged[family.name] = target._replace(error=f"{process}: {family.error}")
+    return list(merged.values())
+
+REGISTRY = Registry()
+
+# =========================
+# Application metrics
+# =========================
+STAGE_SECONDS = REGISTRY.histogram(
+    "ira_stage_seconds", "Time spent in each pipeline stage.", ["stage"])
+INGREDIENT_LOOKUPS = REGISTRY.counter(
+    "ira_ingredient_lookups",
+    "Distinct ingredients resolved, by tier: store (exact DB hit), fuzzy (near miss), llm (DB miss).", ["tier"])
+LLM_SECONDS = REGISTRY.histogram(
+    "ira_llm_request_seconds", "Duration of LLM requests that reached Ollama (cache misses).", ["call_site", "model"])
+LLM_TOKENS = REGISTRY.counter(
+    "ira_llm_tokens", "Tokens processed by Ollama, by kind (prompt/completion).", ["call_site", "model", "kind"])
+
+def timed(stage: str):
+    """Decorator recording a function's duration in STAGE_SECONDS under `stage`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# =========================
+# Overhead benchmark
+# =========================
+@click.command()
+@click.option('--iterations', default=1_000_000, help='Operations per measurement (default: 1,000,000)')
+def main(iterations):
+    """Nanoseconds per counter increment / histogram observation, to keep the hot path cheap."""
+    counter = Counter("bench", "", ["tier"])
+    histogram = Histogram("bench_seconds", "", ["stage"])
+    def timed_block():
+        with histogram.time("tokenize"):
+            pass
+
+    for label, op in [
+        ("counter.inc", lambda: counter.inc("store")),
+        ("histogram.observe", lambda: histogram.observe(0.003, "tokenize")),
+        ("with histogram.time()", timed_block),
+    ]:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            op()
+        elapsed = time.perf_counter() - started
+        click.echo(f"⏱️ {label:<22} {elapsed / iterations * 1e9:6.0f} ns/op")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import time
+import random
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+from llama_index.llms.ollama import Ollama
+
+from llm_cache import CachedOllama
+
+# =========================
+# Config
+# =========================
+# Which Ollama model serves each task, with its context size (num_ctx), output
+# cap (num_predict) and how long Ollama keeps it loaded (keep_alive). num_ctx is
+# part of the loaded model, so every task on the same model must use the same
+# context_window or Ollama reloads it whenever consecutive calls switch task;
+# output length is capped per task with num_predict instead.
+# Override any field per task in model_routes.json, e.g.
+#   {"extract": {"model": "gemma3:1b"}, "classify": {"model": "gemma3:1b"}}
+MODEL_ROUTES_FILE = Path(os.getenv("MODEL_ROUTES_FILE", "model_routes.json"))
+DEFAULT_ROUTES = {
+    "extract": {"model": "gemma3:4b", "context_window": 8192, "num_predict": 512, "keep_alive": "30m"},
+    "classify": {"model": "gemma3:4b", "context_window": 8192, "num_predict": 160, "keep_alive": "30m"},
+    "explain": {"model": "gemma3:4b", "context_window": 8192, "num_predict": 512, "keep_alive": "30m"},
+    "rag_synthesis": {"model": "gemma3:4b", "context_window": 8192, "num_predict": 256, "keep_alive": "30m"},
+}
+REQUEST_TIMEOUT = 120.0
+
+def load_routes(path: Path = MODEL_ROUTES_FILE) -> Dict[str, Dict]:
+    routes = {task: dict(route) for task, route in DEFAULT_ROUTES.items()}
+    if path.exists():
+        try:
+            overrides = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Ignoring unreadable {path}: {e}")
+            overrides = {}
+        for task, route in overrides.items():
+            if task not in routes:
+                print(f"⚠️ Unknown task '{task}' in {path}; expected one of {sorted(routes)}")
+                continue
+            routes[task].update(route)
+    check_context_windows(routes)
+    return routes
+
+def check_context_windows(routes: Dict[str, Dict]) -> None:
+    """Raises ValueError if tasks sharing a model ask for different context windows."""
+    windows: Dict[str, Dict[int, List[str]]] = {}
+    for task, route in routes.items():
+        windows.setdefault(route["model"], {}).setdefault(route["context_window"], []).append(task)
+    for model, by_window in windows.items():
+        if len(by_window) > 1:
+            detail = ", ".join(f"{w} for {'/'.join(sorted(t))}" for w, t in sorted(by_window.items()))
+            raise ValueError(
+                f"Routes sharing {model} must use one context_window (got {detail}); "
+                f"limit output per task with num_predict instead"
+            )
+
+ROUTES = load_routes()
+
+def build_llm(route: Dict, cached: bool = True) -> Ollama:
+    """An Ollama client configured from a route; cached=False skips the completion cache."""
+    cls = CachedOllama if cached else Ollama
+    return cls(
+        model=route["model"],
+        request_timeout=REQUEST_TIMEOUT,
+        context_window=route["context_window"],
+        keep_alive=route["keep_alive"],
+        additional_kwargs={"num_predict": route["num_predict"]},
+    )
+
+_LLMS: Dict[str, Ollama] = {}
+
+def llm_for(task: str) -> Ollama:
+    """The shared client for a task (extract, classify, explain, rag_synthesis)."""
+    if task not in _LLMS:
+        _LLMS[task] = build_llm(ROUTES[task])
+    return _LLMS[task]
+
+# =========================
+# Benchmark
+# =========================
+# Each task is scored on cases built from the risk database, so no labelled
+# corpus is needed; extraction can also use a JSONL corpus of
+# {"text": ..., "expected": "a, b, c"} records.
+FILLER = [
+    "Our best-selling daily moisturizer leaves skin soft and hydrated.",
+    "Directions: Apply a small amount to clean skin morning and night.",
+    "Warnings: For external use only. Avoid contact with eyes.",
+    "Free shipping on orders over $35. Rated 4.7 out of 5 stars.",
+]
+
+def _extract_cases(rng: random.Random, samples: int, corpus: Optional[str]) -> List[Dict]:
+    if corpus:
+        with open(corpus, encoding="utf-8") as f:
+            cases = [json.loads(line) for line in f if line.strip()]
+        return cases[:samples]
+    from riskdata import RISK_DB
+    names = sorted(RISK_DB)
+    cases = []
+    for _ in range(samples):
+        picked = rng.sample(names, min(len(names), rng.randint(5, 12)))
+        listing = ", ".join(n.title() for n in picked)
+        text = f"{FILLER[0]}\nIngredients: {listing}.\n{FILLER[1]}\n{FILLER[2]}\n{FILLER[3]}"
+        cases.append({"text": text, "expected": listing})
+    return cases
+
+def _db_sample(rng: random.Random, samples: int) -> List[tuple]:
+    from riskdata import RISK_DB
+    items = sorted(RISK_DB.items())
+    return rng.sample(items, min(len(items), samples))
+
+def _run_extract(llm: Ollama, case: Dict) -> float:
+    from archive import token_f1
+    from prompts import EXTRACTION_PROMPT
+    out = str(llm.complete(EXTRACTION_PROMPT.format(text=case["text"]))).strip().strip("\"'")
+    return token_f1(case["expected"], out)
+
+def _run_classify(llm: Ollama, case: tuple) -> float:
+    from prompts import RISK_LOOKUP_PROMPT
+    name, info = case
+    out = str(llm.complete(RISK_LOOKUP_PROMPT.format(ingredient=name))).strip()
+    out = re.sub(r"^```(?:json)?|```$", "", out).strip()
+    try:
+        risk = json.loads(out).get("risk", "").strip().capitalize()
+    except (json.JSONDecodeError, AttributeError):
+        return 0.0
+    return 1.0 if risk == info["risk"] else 0.0
+
+def _run_rag_synthesis(llm: Ollama, case: tuple) -> float:
+    from prompts import RAG_LOOKUP_QUERY
+    name, info = case
+    # Same shape as the query engine's QA prompt, with the matching document as context.
+    context = f"Ingredient: {name}\nRisk: {info['risk']}\nImpact: {info['impact']}"
+    prompt = (
+        "Context information is below.\n---------------------\n"
+        f"{context}\n---------------------\n"
+        "Given the context information and not prior knowledge, answer the query.\n"
+        f"Query: {RAG_LOOKUP_QUERY.format(ingredient=name)}\nAnswer: "
+    )
+    out = str(llm.complete(prompt))
+    m = re.search(r"Risk:\s*(High|Medium|Low)", out, re.IGNORECASE)
+    return 1.0 if m and m.group(1).capitalize() == info["risk"] else 0.0
+
+def _explain_cases(rng: random.Random, samples: int) -> List[Dict]:
+    from riskdata import RISK_DB
+    names = sorted(RISK_DB)
+    cases = []
+    for _ in range(samples):
+        picked = rng.sample(names, min(len(names), rng.randint(4, 10)))
+        buckets = {"High": [], "Medium": [], "Low": [], "Unknown": []}
+        for n in picked:
+            level = RISK_DB[n]["risk"] if RISK_DB[n]["risk"] in buckets else "Unknown"
+            buckets[level].append({"ingredient": n, "impact": RISK_DB[n]["impact"]})
+        score = "Bad" if buckets["High"] else "Poor" if buckets["Medium"] else "Excellent"
+        cases.append({
+            "overall_score": score,
+            "high_risk": buckets["High"],
+            "medium_risk": buckets["Medium"],
+            "low_risk": buckets["Low"],
+            "unknown": buckets["Unknown"],
+        })
+    return cases
+
+def _run_explain(llm: Ollama, case: Dict) -> float:
+    """Share of high/medium ingredients the explanation mentions (1.0 when there are none)."""
+    from prompts import EXPLANATION_PROMPT
+    payload = json.dumps(case, ensure_ascii=False, indent=2)
+    out = str(llm.complete(EXPLANATION_PROMPT.format(json_payload=payload))).lower()
+    flagged = [f["ingredient"] for f in case["high_risk"] + case["medium_risk"]]
+    if not flagged:
+        return 1.0
+    return sum(1 for name in flagged if name.lower() in out) / len(flagged)
+
+TASK_RUNNERS = {
+    "extract": _run_extract,
+    "classify": _run_classify,
+    "rag_synthesis": _run_rag_synthesis,
+    "explain": _run_explain,
+}
+QUALITY_LABELS = {
+    "extract": "token F1",
+    "classify": "risk accuracy",
+    "rag_synthesis": "risk accuracy",
+    "explain": "flagged coverage",
+}
+
+def benchmark_task(task: str, models: List[str], samples: int = 20, seed: int = 0,
+                   corpus: Optional[str] = None) -> List[Dict]:
+    """
+    Runs one task's cases on each candidate model with the task's route settings
+    (uncached) and reports latency and quality per model.
+    """
+    rng = random.Random(seed)
+    if task == "extract":
+        cases = _extract_cases(rng, samples, corpus)
+    elif task == "explain":
+        cases = _explain_cases(rng, samples)
+    else:
+        cases = _db_sample(rng, samples)
+
+    results = []
+    for model in models:
+        llm = build_llm(dict(ROUTES[task], model=model), cached=False)
+        latencies, scores, errors = [], [], 0
+        for case in cases:
+            started = time.perf_counter()
+            try:
+                scores.append(TASK_RUNNERS[task](llm, case))
+            except Exception as e:
+                errors += 1
+                scores.append(0.0)
+                print(f"❌ {model} failed on a {task} case: {e}")
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        results.append({
+            "task": task,
+            "model": model,
+            "cases": len(cases),
+            "errors": errors,
+            "mean_s": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95_s": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+            "quality": sum(scores) / len(scores) if scores else 0.0,
+        })
+    return results
+
+@click.command()
+@click.option('--task', 'tasks', multiple=True, type=click.Choice(sorted(TASK_RUNNERS)),
+              help='Task to benchmark; repeat for several (default: all)')
+@click.option('--models', required=True, help='Comma-separated candidate models, e.g. gemma3:1b,gemma3:4b')
+@click.option('--samples', default=20, help='Cases per task (default: 20)')
+@click.option('--seed', default=0, help='Random seed for case selection (default: 0)')
+@click.option('--corpus', help='JSONL extraction corpus of {"text", "expected"} records')
+def main(tasks, models, samples, seed, corpus):
+    """Compare latency and quality of candidate Ollama models for each task."""
+    candidates = [m.strip() for m in models.split(",") if m.strip()]
+    for task in tasks or sorted(TASK_RUNNERS):
+        click.echo(f"📊 {task} (current: {ROUTES[task]['model']}, quality = {QUALITY_LABELS[task]})")
+        for r in benchmark_task(task, candidates, samples, seed, corpus):
+            click.echo(f"   {r['model']:<20} mean {r['mean_s']:.2f}s  p95 {r['p95_s']:.2f}s  "
+                       f"quality {r['quality']:.3f}  errors {r['errors']}/{r['cases']}")
+
+if __name__ == "__main__":
+    main()
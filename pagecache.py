@@ -0,0 +1,114 @@
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# =========================
+# Config
+# =========================
+PAGE_CACHE_PATH = Path("page_cache.sqlite3")
+PAGE_CACHE_TTL = 24 * 60 * 60         # seconds a cached page is served without revalidation
+PAGE_CACHE_STALE_TTL = 7 * 24 * 60 * 60  # extra seconds a stale page may be served while revalidating
+
+TRACKING_PREFIXES = ("utm_",)   # utm_source, utm_medium, ...
+TRACKING_PARAMS = {"gclid", "fbclid", "mc_cid", "mc_eid", "_ga", "ref", "srsltid"}   # matched exactly
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+# =========================
+# URL normalization
+# =========================
+def normalize_url(url: str) -> str:
+    """
+    Canonical cache key for a product URL: lowercase scheme and host, no default
+    port, no fragment, no tracking parameters, sorted query, no trailing slash.
+    """
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(k)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunparse((scheme, host, path, "", urlencode(query), ""))
+
+# =========================
+# Disk-backed page cache
+# =========================
+class PageCache:
+    """
+    SQLite store of fetched product pages: raw HTML, extracted ingredient text,
+    HTTP validators (ETag / Last-Modified) and the time the page was last confirmed.
+    """
+
+    def __init__(self, path: Path = PAGE_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                html TEXT,
+                ingredient_text TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT html, ingredient_text, etag, last_modified, fetched_at FROM pages WHERE url = ?",
+                (normalize_url(url),),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "html": row[0],
+            "ingredient_text": row[1],
+            "etag": row[2],
+            "last_modified": row[3],
+            "fetched_at": row[4],
+        }
+
+    def put(self, url: str, html: str, ingredient_text: str,
+            etag: Optional[str] = None, last_modified: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), html, ingredient_text, etag, last_modified, time.time()),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """Marks a cached page as freshly confirmed (e.g. after a 304)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), normalize_url(url))
+            )
+            self._conn.commit()
+
+    def delete(self, url: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (normalize_url(url),))
+            self._conn.commit()
+
+def entry_age(entry: Dict) -> float:
+    return time.time() - (entry.get("fetched_at") or 0)
+
+def is_fresh(entry: Dict, ttl: float = PAGE_CACHE_TTL) -> bool:
+    return entry_age(entry) < ttl
+
+def is_servable_stale(entry: Dict, ttl: float = PAGE_CACHE_TTL, stale_ttl: float = PAGE_CACHE_STALE_TTL) -> bool:
+    return entry_age(entry) < ttl + stale_ttl
+
+PAGE_CACHE = PageCache()
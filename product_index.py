@@ -0,0 +1,219 @@
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from scoring import RISK_CODES, UNKNOWN, ProductMatrix, Weighting, position_decay, score_matrix
+
+# =========================
+# Config
+# =========================
+PRODUCT_INDEX_PATH = Path("product_index.sqlite3")
+SCORE_WEIGHTING = position_decay()   # weighting for the stored numeric score
+
+# =========================
+# Ingredient -> product inverted index
+# =========================
+class ProductIndex:
+    """
+    Every analyzed product's resolved ingredient list, stored in SQLite with an
+    index from ingredient ID to the products containing it. When risk entries
+    change, only the affected products are re-scored (vectorized), and those
+    whose overall score flipped are appended to a change feed.
+    """
+
+    def __init__(self, path: Path = PRODUCT_INDEX_PATH, weighting: Weighting = SCORE_WEIGHTING):
+        self.weighting = weighting
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS ingredients (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL,
+                risk INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS products (
+                product_id TEXT PRIMARY KEY,
+                overall TEXT,
+                score REAL,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS product_ingredients (
+                product_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                ingredient_id INTEGER NOT NULL,
+                PRIMARY KEY (product_id, position)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_product_ingredients_ingredient
+                ON product_ingredients (ingredient_id, product_id);
+            CREATE TABLE IF NOT EXISTS score_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_id TEXT NOT NULL,
+                old_overall TEXT,
+                new_overall TEXT,
+                old_score REAL,
+                new_score REAL,
+                causes TEXT,
+                changed_at REAL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _ingredient_ids(self, risks: Dict[str, str]) -> Dict[str, int]:
+        """IDs for names, inserting new ingredients with their risk codes."""
+        rows = [(name, RISK_CODES.get(str(risk).capitalize(), UNKNOWN)) for name, risk in risks.items()]
+        self._conn.executemany(
+            "INSERT INTO ingredients (name, risk) VALUES (?, ?) ON CONFLICT(name) DO NOTHING", rows
+        )
+        ids = {}
+        for name, _ in rows:
+            ids[name] = self._conn.execute("SELECT id FROM ingredients WHERE name = ?", (name,)).fetchone()[0]
+        return ids
+
+    def _score(self, ingredient_lists: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Overall labels and scores for lists of ingredient IDs, using stored risk codes."""
+        distinct = sorted({i for ids in ingredient_lists for i in ids})
+        local = {ingredient_id: n for n, ingredient_id in enumerate(distinct)}
+        risks = np.zeros(len(distinct), dtype=np.uint8)
+        for start in range(0, len(distinct), 500):
+            batch = distinct[start:start + 500]
+            marks = ",".join("?" * len(batch))
+            for ingredient_id, risk in self._conn.execute(
+                f"SELECT id, risk FROM ingredients WHERE id IN ({marks})", batch
+            ):
+                risks[local[ingredient_id]] = risk
+        indptr = np.zeros(len(ingredient_lists) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids in ingredient_lists], out=indptr[1:])
+        indices = np.fromiter((local[i] for ids in ingredient_lists for i in ids), dtype=np.int32, count=int(indptr[-1]))
+        scores = score_matrix(ProductMatrix(indptr, indices), risks, self.weighting)
+        return scores.overall, scores.score
+
+    def record_many(self, products: Iterable[Tuple[str, List[str], Dict[str, str]]]):
+        """
+        Stores products given as (product_id, ingredient names in list order,
+        {name: risk level}). Re-recording a product replaces its ingredients.
+        """
+        products = list(products)
+        if not products:
+            return
+        with self._lock:
+            all_risks = {}
+            for _, _, risks in products:
+                all_risks.update(risks)
+            self._apply_locked(all_risks)   # levels that moved since they were stored re-score older products
+            ids = self._ingredient_ids(all_risks)
+            lists = [[ids[name] for name in names] for _, names, _ in products]
+            overall, score = self._score(lists)
+            now = time.time()
+            for (product_id, _, _), id_list, label, value in zip(products, lists, overall, score):
+                self._conn.execute("DELETE FROM product_ingredients WHERE product_id = ?", (product_id,))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO product_ingredients VALUES (?, ?, ?)",
+                    [(product_id, pos, ingredient_id) for pos, ingredient_id in enumerate(id_list)],
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)",
+                    (product_id, label, float(value), now),
+                )
+            self._conn.commit()
+
+    def record(self, product_id: str, names: List[str], risks: Dict[str, str]):
+        self.record_many([(product_id, names, risks)])
+
+    def apply_risk_changes(self, risks: Dict[str, str]) -> List[Dict]:
+        """
+        Applies new risk levels ({name: "High"|"Medium"|"Low"}), re-scores only
+        the products containing an ingredient whose level actually changed, and
+        returns (and appends to the change feed) those whose overall score flipped.
+        """
+        with self._lock:
+            flips = self._apply_locked(risks)
+            self._conn.commit()
+        return flips
+
+    def _apply_locked(self, risks: Dict[str, str]) -> List[Dict]:
+        changed: Dict[int, str] = {}
+        for name, risk in risks.items():
+            code = RISK_CODES.get(str(risk).capitalize(), UNKNOWN)
+            row = self._conn.execute("SELECT id, risk FROM ingredients WHERE name = ?", (name,)).fetchone()
+            if row and row[1] != code:
+                self._conn.execute("UPDATE ingredients SET risk = ? WHERE id = ?", (code, row[0]))
+                changed[row[0]] = name
+        if not changed:
+            return []
+        marks = ",".join("?" * len(changed))
+        affected = [r[0] for r in self._conn.execute(
+            f"SELECT DISTINCT product_id FROM product_ingredients WHERE ingredient_id IN ({marks})",
+            list(changed),
+        )]
+        flips = []
+        now = time.time()
+        for start in range(0, len(affected), 500):
+            flips.extend(self._rescore_locked(affected[start:start + 500], changed, now))
+        if affected:
+            print(f"♻️ Re-scored {len(affected)} products after {len(changed)} risk changes; "
+                  f"{len(flips)} changed overall score")
+        return flips
+
+    def _rescore_locked(self, product_ids: List[str], changed: Dict[int, str], now: float) -> List[Dict]:
+        marks = ",".join("?" * len(product_ids))
+        lists: Dict[str, List[int]] = {pid: [] for pid in product_ids}
+        for pid, ingredient_id in self._conn.execute(
+            f"SELECT product_id, ingredient_id FROM product_ingredients WHERE product_id IN ({marks}) "
+            f"ORDER BY product_id, position",
+            product_ids,
+        ):
+            lists[pid].append(ingredient_id)
+        old = {pid: (overall, score) for pid, overall, score in self._conn.execute(
+            f"SELECT product_id, overall, score FROM products WHERE product_id IN ({marks})", product_ids
+        )}
+        overall, score = self._score([lists[pid] for pid in product_ids])
+        flips = []
+        for pid, label, value in zip(product_ids, overall, score):
+            self._conn.execute(
+                "UPDATE products SET overall = ?, score = ?, updated_at = ? WHERE product_id = ?",
+                (label, float(value), now, pid),
+            )
+            old_label, old_score = old.get(pid, (None, None))
+            if label != old_label:
+                causes = sorted(changed[i] for i in set(lists[pid]) if i in changed)
+                flip = {"product_id": pid, "old_overall": old_label, "new_overall": label,
+                        "old_score": old_score, "new_score": float(value), "causes": causes}
+                self._conn.execute(
+                    "INSERT INTO score_changes (product_id, old_overall, new_overall, old_score, new_score, causes, changed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (pid, old_label, label, old_score, float(value), ",".join(causes), now),
+                )
+                flips.append(flip)
+        return flips
+
+    def changes_since(self, seq: int = 0, limit: int = 1000) -> List[Dict]:
+        """Change feed: score flips after sequence number `seq`, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, product_id, old_overall, new_overall, old_score, new_score, causes, changed_at "
+                "FROM score_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (seq, limit),
+            ).fetchall()
+        return [
+            {"seq": r[0], "product_id": r[1], "old_overall": r[2], "new_overall": r[3],
+             "old_score": r[4], "new_score": r[5], "causes": r[6].split(",") if r[6] else [], "changed_at": r[7]}
+            for r in rows
+        ]
+
+    def product(self, product_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT overall, score, updated_at FROM products WHERE product_id = ?", (product_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"product_id": product_id, "overall": row[0], "score": row[1], "updated_at": row[2]}
+
+PRODUCT_INDEX = ProductIndex()
@@ -0,0 +1,59 @@
+# =========================
+# Prompt templates
+# =========================
+# Shared by app.py and the model benchmark in model_routing.py, so a benchmark
+# run measures exactly the prompts the app sends.
+
+EXTRACTION_PROMPT = """
+    You are a highly specialized information extraction bot. Your task is to extract a list of only the cosmetic or skincare ingredients from the provided text.
+    The ingredients are typically listed after keywords like 'INGREDIENTS:', 'Ingredients:', 'Composition:', or similar.
+    
+    Rules:
+    - Return a single, comma-separated string of the ingredients.
+    - Do NOT include any other text, numbers, or non-ingredient words.
+    - The output must be a clean list of ingredients, e.g., "Water, Glycerin, Butylene Glycol, Niacinamide, Sodium Hyaluronate"
+    - If no ingredients are found, return an empty string.
+
+    Text to analyze:
+    ---
+    {text}
+    ---
+    
+    Extracted ingredients list:
+    """
+
+RISK_LOOKUP_PROMPT = """You are a cosmetic safety expert with extensive knowledge of cosmetic ingredients.
+Ingredient: {ingredient}
+Please provide:
+1. Risk level: Classify as exactly one of: High, Medium, Low
+2. Impact: A detailed, factual description of this specific ingredient's properties, benefits, and potential concerns in less than 20 words. 
+Requirements:
+- Be specific to THIS ingredient - research its actual chemical properties and cosmetic uses
+- Include what the ingredient does in cosmetics (moisturizer, preservative, emulsifier, etc.)
+- Mention any known benefits or concerns specific to this ingredient
+- Use real cosmetic science knowledge, not generic statements
+- Minimum 10 words for impact description
+- Never use "Unknown", "Not available", or generic fallback phrases
+Examples of good responses:
+- "phenoxyethanol:Preservative; can cause skin irritation, allergic reactions, toxic at high doses"
+- "Silicone-based emollient that creates smooth application and water resistance; may cause buildup on hair but considered safe for skin use."
+Format as JSON with keys 'risk' and 'impact' only."""
+
+FALLBACK_LOOKUP_PROMPT = """Research the cosmetic ingredient '{ingredient}' and provide its primary function and safety profile in less than 20 words. Focus on what this ingredient specifically does in cosmetics."""
+
+RAG_LOOKUP_QUERY = "Find safety info for cosmetic ingredient: {ingredient}. Return name, risk, impact."
+
+EXPLANATION_PROMPT = """You are a cosmetic safety expert.
+Given:
+- Analyzed ingredient findings (JSON)
+Task:
+- Only write cautionary notes for high or medium risk ingredients.
+- Write a concise, user-friendly explanation.
+- For High risk: include likely long-term impacts in 1 short sentence each.
+- If it shows Medium risk please include brief caution,otherwise no need to mention.
+
+- End with two or three sentences overall rationale that matches the score.
+Keep it to ~5 bulleted lines total.
+JSON:
+{json_payload}
+"""
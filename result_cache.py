@@ -0,0 +1,138 @@
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# =========================
+# Config
+# =========================
+RESULT_CACHE_PATH = Path("result_cache.sqlite3")
+RESULT_CACHE_MAX_ENTRIES = 20000
+EVICT_EVERY = 200   # inserts between eviction sweeps
+
+# =========================
+# Analysis-result cache
+# =========================
+class ResultCache:
+    """
+    Full analyze_product findings keyed by the ingredient-list fingerprint.
+    Each result records the version of every RISK_DB entry it used; bumping an
+    entry's version drops just the results that depend on it.
+    """
+
+    def __init__(self, path: Path = RESULT_CACHE_PATH, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")   # no fsync per hit; a lost write is only a cache miss
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entry_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                fingerprint TEXT PRIMARY KEY,
+                findings TEXT NOT NULL,
+                created_at REAL,
+                accessed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS result_deps (
+                fingerprint TEXT NOT NULL,
+                name TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (fingerprint, name)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_result_deps_name ON result_deps (name);
+            CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at);
+            """
+        )
+        self._conn.commit()
+        self.versions: Dict[str, int] = dict(self._conn.execute("SELECT name, version FROM entry_versions"))
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+
+    def reload_versions(self):
+        """Re-reads entry versions, after another process (the write coordinator) bumped them."""
+        with self._lock:
+            self.versions = dict(self._conn.execute("SELECT name, version FROM entry_versions"))
+
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT findings FROM results WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row is not None:
+                deps = self._conn.execute(
+                    "SELECT name, version FROM result_deps WHERE fingerprint = ?", (fingerprint,)
+                ).fetchall()
+                if any(self.versions.get(name, 0) != version for name, version in deps):
+                    self._delete_locked([fingerprint])   # an entry changed since it was stored
+                    row = None
+            if row is None:
+                self.misses += 1
+                self._conn.commit()
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE fingerprint = ?", (time.time(), fingerprint))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, fingerprint: str, findings: Dict, entry_names: Iterable[str]):
+        now = time.time()
+        with self._lock:
+            names = set(entry_names)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (fingerprint, json.dumps(findings, ensure_ascii=False), now, now),
+            )
+            self._conn.execute("DELETE FROM result_deps WHERE fingerprint = ?", (fingerprint,))
+            self._conn.executemany(
+                "INSERT INTO result_deps VALUES (?, ?, ?)",
+                [(fingerprint, name, self.versions.get(name, 0)) for name in names],
+            )
+            self._inserts += 1
+            if self._inserts % EVICT_EVERY == 0:
+                # Least recently used results beyond the cap.
+                oldest = [r[0] for r in self._conn.execute(
+                    "SELECT fingerprint FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?",
+                    (self.max_entries,),
+                )]
+                self._delete_locked(oldest)
+            self._conn.commit()
+
+    def bump(self, names: Iterable[str]) -> int:
+        """
+        Marks RISK_DB entries as changed and drops the cached results that used
+        them (found through the dependency index). Returns how many were dropped.
+        """
+        names = list(names)
+        if not names:
+            return 0
+        with self._lock:
+            for name in names:
+                self.versions[name] = self.versions.get(name, 0) + 1
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entry_versions VALUES (?, ?)",
+                [(name, self.versions[name]) for name in names],
+            )
+            stale = set()
+            for start in range(0, len(names), 500):
+                batch = names[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                stale.update(r[0] for r in self._conn.execute(
+                    f"SELECT fingerprint FROM result_deps WHERE name IN ({marks})", batch
+                ))
+            self._delete_locked(list(stale))
+            self._conn.commit()
+        return len(stale)
+
+    def _delete_locked(self, fingerprints):
+        self._conn.executemany("DELETE FROM results WHERE fingerprint = ?", [(f,) for f in fingerprints])
+        self._conn.executemany("DELETE FROM result_deps WHERE fingerprint = ?", [(f,) for f in fingerprints])
+
+RESULT_CACHE = ResultCache()
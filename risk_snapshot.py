@@ -0,0 +1,177 @@
+import time
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple
+
+import click
+
+# =========================
+# Versioned risk database snapshots
+# =========================
+class RiskSnapshot(NamedTuple):
+    """One published version of the ingredient database and the engines built over it."""
+    version: int
+    db: Mapping[str, Dict]   # read-only view; never mutated after publishing
+    query_engine: Any
+    explain_engine: Any
+    retriever: Any
+
+# Builds the next version from the current one and a batch of {name: {"risk", "impact"}}.
+SnapshotBuilder = Callable[[RiskSnapshot, Dict[str, Dict]], RiskSnapshot]
+
+def frozen_db(db: Mapping[str, Dict], new: Dict[str, Dict] = None) -> Mapping[str, Dict]:
+    """
+    Read-only copy of a risk table plus `new` entries, safe to share between
+    threads. Entries already frozen in `db` are reused rather than copied.
+    """
+    table = {name: info if isinstance(info, MappingProxyType) else MappingProxyType(dict(info))
+             for name, info in db.items()}
+    table.update((name, MappingProxyType(dict(info))) for name, info in (new or {}).items())
+    return MappingProxyType(table)
+
+class SnapshotHolder:
+    """
+    Copy-on-write holder for RiskSnapshot. Readers call current() - a single
+    attribute read, no lock - and use that version for the whole request, so a
+    concurrent update never changes the table under them. Writers queue entries
+    with update(); one writer at a time drains everything queued so far into a
+    single new version and publishes it by swapping the reference.
+    """
+
+    def __init__(self, initial: RiskSnapshot, build: SnapshotBuilder):
+        self._current = initial
+        self._build = build
+        self._pending: Dict[str, Dict] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._subscribers: List[Callable[[RiskSnapshot], None]] = []
+        self.published = 0
+        self.entries_published = 0
+
+    def current(self) -> RiskSnapshot:
+        return self._current
+
+    def update(self, entries: Dict[str, Dict]) -> RiskSnapshot:
+        """
+        Publishes `entries` and returns a snapshot that includes them. Writers
+        that queue while another build is running are folded into the next one.
+        If the build fails the batch is queued again for the next writer, and
+        the error is raised to this one.
+        """
+        with self._pending_lock:
+            self._pending.update(entries)
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+            if batch:   # empty when an earlier writer already published our entries
+                try:
+                    snapshot = self._build(self._current, batch)
+                except Exception:
+                    with self._pending_lock:
+                        # Entries queued during the build are newer and win.
+                        self._pending = {**batch, **self._pending}
+                    raise
+                self._install_locked(snapshot)
+                self.published += 1
+                self.entries_published += len(batch)
+            return self._current
+
+    def adopt(self, snapshot: RiskSnapshot) -> bool:
+        """Installs a version built elsewhere (another process) if it is newer than the current one."""
+        with self._write_lock:
+            if snapshot.version <= self._current.version:
+                return False
+            self._install_locked(snapshot)
+            return True
+
+    def subscribe(self, callback: Callable[[RiskSnapshot], None]):
+        """Calls callback(snapshot) after each new version is published, in version order."""
+        self._subscribers.append(callback)
+
+    def _install_locked(self, snapshot: RiskSnapshot):
+        previous, self._current = self._current, snapshot
+        if snapshot.version != previous.version:
+            for callback in self._subscribers:
+                callback(snapshot)
+
+# =========================
+# Benchmark
+# =========================
+class LockedDB:
+    """The previous pattern: one shared dict mutated in place, guarded by a lock."""
+
+    def __init__(self, db: Dict[str, Dict]):
+        self.db = dict(db)
+        self.lock = threading.Lock()
+
+    def get(self, name: str):
+        with self.lock:
+            return self.db.get(name)
+
+    def update(self, entries: Dict[str, Dict]):
+        with self.lock:
+            self.db.update(entries)
+
+def _read_rate(read: Callable[[str], Any], names, readers: int, seconds: float,
+               write: Callable[[int], None] = None, write_interval: float = 0.0) -> float:
+    stop = threading.Event()
+    counts = [0] * readers
+
+    def reader(slot: int):
+        n = 0
+        while not stop.is_set():
+            for name in names:
+                read(name)
+            n += len(names)
+        counts[slot] = n
+
+    def writer():
+        batch = 0
+        while not stop.is_set():
+            write(batch)
+            batch += 1
+            stop.wait(write_interval)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    if write:
+        threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+@click.command()
+@click.option('--entries', default=5000, help='Ingredients in the table (default: 5000)')
+@click.option('--readers', default=4, help='Reader threads (default: 4)')
+@click.option('--seconds', default=2.0, help='Duration of each run (default: 2)')
+@click.option('--batch', default=20, help='Entries per write (default: 20)')
+@click.option('--writes-per-second', default=50.0, help='Write rate; 0 = back to back (default: 50)')
+def main(entries, readers, seconds, batch, writes_per_second):
+    """Read throughput with and without concurrent writes, snapshot holder vs locked dict."""
+    db = {f"ingredient {i}": {"risk": "Low", "impact": "x" * 40} for i in range(entries)}
+    names = list(db)[::max(1, entries // 500)]
+
+    def build(snapshot: RiskSnapshot, new: Dict[str, Dict]) -> RiskSnapshot:
+        return snapshot._replace(version=snapshot.version + 1, db=frozen_db(snapshot.db, new))
+
+    holder = SnapshotHolder(RiskSnapshot(0, frozen_db(db), None, None, None), build)
+    locked = LockedDB(db)
+    new_entries = lambda n: {f"new {n} {i}": {"risk": "Medium", "impact": "y" * 40} for i in range(batch)}
+
+    interval = 1.0 / writes_per_second if writes_per_second else 0.0
+    click.echo(f"📊 {entries:,} entries, {readers} readers, {batch} entries per write, "
+               f"{writes_per_second or 'unlimited'} writes/s")
+    for label, read, write in [
+        ("snapshot", lambda name: holder.current().db.get(name), lambda n: holder.update(new_entries(n))),
+        ("locked dict", locked.get, lambda n: locked.update(new_entries(n))),
+    ]:
+        idle = _read_rate(read, names, readers, seconds)
+        busy = _read_rate(read, names, readers, seconds, write, interval)
+        click.echo(f"   {label:<12} reads/s idle {idle:>12,.0f}  under writes {busy:>12,.0f}  ({busy / idle:.0%})")
+    click.echo(f"   snapshot versions published: {holder.published}")
+
+if __name__ == "__main__":
+    main()
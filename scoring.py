@@ -0,0 +1,202 @@
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import click
+import numpy as np
+
+# =========================
+# Config
+# =========================
+# uint8 risk codes; higher is worse, so a product's worst risk is a max().
+RISK_LEVELS = ["Unknown", "Low", "Medium", "High"]
+RISK_CODES = {level: code for code, level in enumerate(RISK_LEVELS)}
+UNKNOWN, LOW, MEDIUM, HIGH = range(4)
+# Points per risk code used for the weighted numeric score.
+RISK_POINTS = np.array([0.0, 0.0, 1.0, 3.0], dtype=np.float32)
+# Same rule as app.overall_score: any High is Bad, any Medium is Poor.
+OVERALL_LABELS = np.array(["Excellent", "Excellent", "Poor", "Bad"], dtype=object)
+
+# =========================
+# Ingredient vocabulary
+# =========================
+class IngredientVocab:
+    """Maps ingredient names to integer IDs, with each ID's risk code in a uint8 array."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._risks = np.zeros(1024, dtype=np.uint8)
+
+    @classmethod
+    def from_risk_db(cls, risk_db: Dict[str, Dict]) -> "IngredientVocab":
+        vocab = cls()
+        for name, info in risk_db.items():
+            vocab.set_risk(name, info.get("risk", "Unknown"))
+        return vocab
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def risks(self) -> np.ndarray:
+        return self._risks[:len(self.names)]
+
+    def id_for(self, name: str) -> int:
+        """ID of a name, adding it as Unknown risk if new."""
+        ingredient_id = self.ids.get(name)
+        if ingredient_id is None:
+            ingredient_id = len(self.names)
+            self.ids[name] = ingredient_id
+            self.names.append(name)
+            if ingredient_id >= len(self._risks):
+                self._risks = np.concatenate([self._risks, np.zeros(len(self._risks), dtype=np.uint8)])
+        return ingredient_id
+
+    def set_risk(self, name: str, risk: str):
+        self._risks[self.id_for(name)] = RISK_CODES.get(risk.strip().capitalize(), UNKNOWN)
+
+# =========================
+# Product x ingredient CSR matrix
+# =========================
+class ProductMatrix(NamedTuple):
+    """
+    Products as a CSR matrix: the ingredient IDs of product i, in list order,
+    are indices[indptr[i]:indptr[i + 1]].
+    """
+    indptr: np.ndarray    # int64, len = products + 1
+    indices: np.ndarray   # int32 ingredient IDs
+
+    @property
+    def n_products(self) -> int:
+        return len(self.indptr) - 1
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+def build_matrix(products: Iterable[Iterable[str]], vocab: IngredientVocab) -> ProductMatrix:
+    """Builds the CSR matrix for lists of ingredient names, adding unseen names to vocab."""
+    indptr = [0]
+    indices: List[int] = []
+    for names in products:
+        indices.extend(vocab.id_for(name) for name in names)
+        indptr.append(len(indices))
+    return ProductMatrix(np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int32))
+
+# =========================
+# Weighting schemes
+# =========================
+# A weighting takes the matrix and returns one float32 weight per stored entry.
+Weighting = Callable[[ProductMatrix], np.ndarray]
+
+def positions(matrix: ProductMatrix) -> np.ndarray:
+    """0-based position of every entry within its product's list."""
+    lengths = matrix.lengths()
+    starts = np.repeat(matrix.indptr[:-1], lengths)
+    return (np.arange(len(matrix.indices), dtype=np.int64) - starts).astype(np.int32)
+
+def uniform_weights(matrix: ProductMatrix) -> np.ndarray:
+    return np.ones(len(matrix.indices), dtype=np.float32)
+
+def position_decay(half_life: float = 5.0) -> Weighting:
+    """
+    Ingredients are listed by descending concentration, so the weight halves
+    every `half_life` positions down the list.
+    """
+    def weights(matrix: ProductMatrix) -> np.ndarray:
+        return np.exp2(-positions(matrix) / np.float32(half_life)).astype(np.float32)
+    return weights
+
+WEIGHTINGS = {"uniform": uniform_weights, "decay": position_decay()}
+
+# =========================
+# Vectorized scoring
+# =========================
+class BatchScores(NamedTuple):
+    worst: np.ndarray    # uint8 worst risk code per product
+    counts: np.ndarray   # int32 (products, 4) count of ingredients per risk code
+    score: np.ndarray    # float32 weighted mean risk points per product (0 = no risk, 3 = all High)
+    overall: np.ndarray  # "Excellent" / "Poor" / "Bad" per product
+
+def _segment_sum(values: np.ndarray, matrix: ProductMatrix, nonempty: np.ndarray) -> np.ndarray:
+    out = np.zeros(matrix.n_products, dtype=values.dtype)
+    if len(values):
+        out[nonempty] = np.add.reduceat(values, matrix.indptr[:-1][nonempty])
+    return out
+
+def score_matrix(matrix: ProductMatrix, risks: np.ndarray,
+                 weighting: Optional[Weighting] = None) -> BatchScores:
+    """Scores every product in the matrix at once from the per-ingredient risk codes."""
+    codes = risks[matrix.indices]
+    nonempty = matrix.lengths() > 0
+
+    worst = np.zeros(matrix.n_products, dtype=np.uint8)
+    if len(codes):
+        worst[nonempty] = np.maximum.reduceat(codes, matrix.indptr[:-1][nonempty])
+
+    counts = np.zeros((matrix.n_products, len(RISK_LEVELS)), dtype=np.int32)
+    for code in range(len(RISK_LEVELS)):
+        counts[:, code] = _segment_sum((codes == code).astype(np.int32), matrix, nonempty)
+
+    weights = (weighting or uniform_weights)(matrix)
+    weighted = _segment_sum(weights * RISK_POINTS[codes], matrix, nonempty)
+    total = _segment_sum(weights, matrix, nonempty)
+    score = np.divide(weighted, total, out=np.zeros_like(weighted), where=total > 0)
+    return BatchScores(worst, counts, score, OVERALL_LABELS[worst])
+
+def score_products(products: Iterable[Iterable[str]], vocab: IngredientVocab,
+                   weighting: Optional[Weighting] = None) -> BatchScores:
+    return score_matrix(build_matrix(products, vocab), vocab.risks, weighting)
+
+# =========================
+# Benchmark
+# =========================
+def _loop_scores(matrix: ProductMatrix, risks: np.ndarray) -> List[str]:
+    """Per-item Python scoring, as bucketize/overall_score do it, for comparison."""
+    out = []
+    indptr, indices = matrix.indptr.tolist(), matrix.indices.tolist()
+    levels = [RISK_LEVELS[c] for c in risks.tolist()]
+    for i in range(matrix.n_products):
+        buckets = {"High": 0, "Medium": 0, "Low": 0, "Unknown": 0}
+        for ingredient_id in indices[indptr[i]:indptr[i + 1]]:
+            buckets[levels[ingredient_id]] += 1
+        out.append("Bad" if buckets["High"] else "Poor" if buckets["Medium"] else "Excellent")
+    return out
+
+def random_matrix(n_products: int, n_ingredients: int, mean_length: int = 25,
+                  seed: int = 0) -> ProductMatrix:
+    rng = np.random.default_rng(seed)
+    lengths = rng.poisson(mean_length, n_products)
+    indptr = np.zeros(n_products + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    # Zipf-like popularity: a few ingredients (water, glycerin) appear everywhere.
+    popularity = 1.0 / np.arange(1, n_ingredients + 1)
+    indices = rng.choice(n_ingredients, size=int(indptr[-1]), p=popularity / popularity.sum()).astype(np.int32)
+    return ProductMatrix(indptr, indices)
+
+@click.command()
+@click.option('--products', default=1_000_000, help='Synthetic products to score (default: 1,000,000)')
+@click.option('--ingredients', default=5000, help='Distinct ingredients (default: 5000)')
+@click.option('--mean-length', default=25, help='Average ingredients per product (default: 25)')
+@click.option('--weighting', default='decay', type=click.Choice(sorted(WEIGHTINGS)), help='Weighting scheme (default: decay)')
+@click.option('--loop-sample', default=100_000, help='Products scored by the Python loop for comparison (default: 100,000)')
+def main(products, ingredients, mean_length, weighting, loop_sample):
+    """Benchmark vectorized re-scoring against the per-item Python loop."""
+    matrix = random_matrix(products, ingredients, mean_length)
+    risks = np.random.default_rng(1).choice(4, size=ingredients, p=[0.1, 0.6, 0.25, 0.05]).astype(np.uint8)
+    click.echo(f"📊 {products:,} products, {len(matrix.indices):,} ingredient entries, {ingredients:,} distinct")
+
+    started = time.perf_counter()
+    scores = score_matrix(matrix, risks, WEIGHTINGS[weighting])
+    vectorized = time.perf_counter() - started
+    click.echo(f"   vectorized ({weighting}): {vectorized:.2f}s ({products / vectorized:,.0f} products/s)")
+
+    sample = ProductMatrix(matrix.indptr[:loop_sample + 1], matrix.indices)
+    started = time.perf_counter()
+    expected = _loop_scores(sample, risks)
+    loop = time.perf_counter() - started
+    click.echo(f"   python loop: {loop:.2f}s for {sample.n_products:,} ({sample.n_products / loop:,.0f} products/s)")
+    mismatches = sum(1 for a, b in zip(expected, scores.overall[:sample.n_products]) if a != b)
+    click.echo(f"   overall labels agree on {sample.n_products - mismatches:,}/{sample.n_products:,}")
+
+if __name__ == "__main__":
+    main()
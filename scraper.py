@@ -0,0 +1,585 @@
+import os
+import re
+import atexit
+import json
+import time
+import random
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from extractors import (
+    EXTRACTOR_REGISTRY,
+    best_ingredient_block,
+    extract_json_ld,
+    extract_structured,
+    walk_page,
+)
+from archive import HarArchive
+from pagecache import PAGE_CACHE, is_fresh, is_servable_stale, normalize_url
+from metrics import timed
+
+# Selenium imports
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.by import By
+
+# =========================
+# Config
+# =========================
+# List of common user agents to rotate through
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.82 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:89.0) Gecko/20100101 Firefox/89.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
+]
+
+HTTP_TIMEOUT = (5, 15)  # (connect, read) seconds for the static fetch
+BROWSER_WAIT_TIME = 20
+DOMAIN_STAGES_FILE = Path("domain_stages.json")
+STALE_WHILE_REVALIDATE = True  # serve expired cache entries instantly and refresh them in the background
+# HTTP errors that usually mean "blocked as a bot" rather than "no such page"; only these
+# escalate to the browser. Other 4xx/5xx (404, 410, ...) are reported as they are.
+BOT_BLOCK_STATUSES = {403, 429, 503}
+
+# Offline archive: "record" saves every fetched page to a HAR file, "replay" serves
+# pages only from it (no network). Also settable with SCRAPE_ARCHIVE_MODE / SCRAPE_ARCHIVE_PATH.
+ARCHIVE_MODE = os.getenv("SCRAPE_ARCHIVE_MODE") or None
+ARCHIVE_PATH = os.getenv("SCRAPE_ARCHIVE_PATH", "scrape_archive.har")
+
+NO_INGREDIENTS_MESSAGE = "No ingredient list found on this page using common patterns. Please provide the text manually."
+
+# =========================
+# Pooled HTTP client
+# =========================
+def build_http_session(pool_size: int = 10) -> requests.Session:
+    """
+    Creates a requests session with keep-alive connection pooling, transparent
+    gzip/brotli decompression and retries on transient server errors.
+    """
+    session = requests.Session()
+    # raise_on_status=False: once retries run out the last response is returned, so
+    # raise_for_status and BOT_BLOCK_STATUSES decide whether it escalates.
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "HEAD"], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Language": "en-US,en;q=0.9",
+        "Connection": "keep-alive",
+    })
+    return session
+
+HTTP_SESSION = build_http_session()
+
+@timed("scrape_http")
+def fetch_static_page(url: str, etag: Optional[str] = None,
+                      last_modified: Optional[str] = None) -> requests.Response:
+    """
+    Fetches a page without running any JavaScript. When validators from a cached
+    copy are given the request is conditional and may come back as a 304.
+    """
+    headers = {"User-Agent": random.choice(USER_AGENTS)}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    resp = HTTP_SESSION.get(url, timeout=HTTP_TIMEOUT, headers=headers)
+    if resp.status_code != 304:
+        resp.raise_for_status()
+    return resp
+
+# =========================
+# Per-domain stage tracking
+# =========================
+# domain -> {"http": <hits>, "browser": <hits>}
+_stages_lock = threading.Lock()
+
+def _load_domain_stages() -> Dict[str, Dict[str, int]]:
+    try:
+        return json.loads(DOMAIN_STAGES_FILE.read_text())
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+DOMAIN_STAGES = _load_domain_stages()
+_stages_dirty = False   # counts changed since the file was last written
+
+def domain_of(url: str) -> str:
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+def _save_domain_stages_locked():
+    global _stages_dirty
+    try:
+        DOMAIN_STAGES_FILE.write_text(json.dumps(DOMAIN_STAGES, indent=4))
+        _stages_dirty = False
+    except OSError as e:
+        print(f"⚠️ Could not persist domain stages: {e}")
+
+def record_stage(domain: str, stage: str):
+    """
+    Remembers which stage ("http" or "browser") answered for a domain. The file
+    is rewritten only when a domain's known_stage changes; hit counts alone are
+    flushed at exit.
+    """
+    global _stages_dirty
+    with _stages_lock:
+        before = known_stage(domain)
+        counts = DOMAIN_STAGES.setdefault(domain, {"http": 0, "browser": 0})
+        counts[stage] = counts.get(stage, 0) + 1
+        _stages_dirty = True
+        if known_stage(domain) != before:
+            _save_domain_stages_locked()
+
+def flush_domain_stages():
+    with _stages_lock:
+        if _stages_dirty:
+            _save_domain_stages_locked()
+
+atexit.register(flush_domain_stages)
+
+def known_stage(domain: str) -> Optional[str]:
+    """
+    Returns "http" for domains whose static HTML has always been enough,
+    "browser" for domains that always needed rendering, or None if unsure.
+    """
+    counts = DOMAIN_STAGES.get(domain)
+    if not counts:
+        return None
+    if counts.get("http") and not counts.get("browser"):
+        return "http"
+    if counts.get("browser") and not counts.get("http"):
+        return "browser"
+    return None
+
+# =========================
+# Ingredient extractors
+# =========================
+def _extract_from_body(blocks: List[str]) -> str:
+    body_text = " ".join(blocks)
+    match = re.search(r'(ingredients|composition|what\'s in it):?\s*([A-Z][a-zA-Z\s,.-]+(?:\s*(?:,\s*[A-Z][a-zA-Z\s,.-]+)+)?)', body_text, re.IGNORECASE)
+    return match.group(2) if match else ""
+
+def extract_ingredient_text(html: str, allow_body_fallback: bool = True, domain: Optional[str] = None) -> str:
+    """
+    Runs the extractor cascade over a page. Structured data comes first: JSON-LD
+    is pulled out with a regex scan before any DOM work, so retailers that
+    publish it answer without a walk. Otherwise the page is walked once and
+    tried against the domain's registered selectors (when a domain is given),
+    microdata / RDFa, scored ingredient blocks, then the body regex. A block
+    found by the generic scoring is learned as the domain's selector for next
+    time. The body regex is loose, so callers that can still escalate turn it off.
+    """
+    ingredient_text = extract_json_ld(html)
+    if ingredient_text:
+        return ingredient_text
+    page = walk_page(html)
+    if domain:
+        ingredient_text = EXTRACTOR_REGISTRY.extract(page, domain)
+        if ingredient_text:
+            return ingredient_text
+    ingredient_text = extract_structured(page)
+    if ingredient_text:
+        return ingredient_text
+    ingredient_text, block_index = best_ingredient_block(page.blocks)
+    if ingredient_text:
+        if domain:
+            EXTRACTOR_REGISTRY.learn(page, domain, block_index)
+        return ingredient_text
+    if allow_body_fallback:
+        ingredient_text = _extract_from_body(page.blocks)
+    return ingredient_text
+
+# =========================
+# Headless browser stage
+# =========================
+# Resources that never carry ingredient text. Selenium's CDP bridge cannot answer
+# Fetch.requestPaused events, so blocking is done with Network.setBlockedURLs patterns.
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mov", "*.m3u8", "*.mp3", "*.ogg", "*.wav",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*segment.io*", "*segment.com*",
+    "*criteo.*", "*tiktok.com*", "*pinterest.com/ct*", "*snapchat.com*", "*bing.com/bat*",
+    "*newrelic.com*", "*nr-data.net*", "*optimizely.com*", "*quantummetric.com*", "*clarity.ms*",
+    "*youtube.com*", "*vimeo.com*",
+]
+LEAN_BROWSER = True          # block heavy resources, eager load, return as soon as ingredients appear
+SETTLE_AFTER_LOAD = 3.0      # seconds to keep waiting for JS-rendered ingredients after the load event
+
+# Cheap DOM probe: walks text nodes (no layout / innerText) looking for an
+# "ingredients" anchor whose nearby ancestor contains a comma-separated list.
+INGREDIENT_PROBE_JS = """
+const re = /ingredients|composition|inci/i;
+if (!document.body) return false;
+const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+let node;
+while ((node = walker.nextNode())) {
+    if (!re.test(node.nodeValue)) continue;
+    let el = node.parentElement;
+    for (let depth = 0; depth < 3 && el; depth++, el = el.parentElement) {
+        const text = el.textContent;
+        if (text.length < 20000 && (text.match(/,/g) || []).length >= 5) return true;
+    }
+}
+return false;
+"""
+
+def build_chrome_options(lean: bool = LEAN_BROWSER, measure: bool = False) -> Options:
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920,1080")
+
+    random_user_agent = random.choice(USER_AGENTS)
+    options.add_argument(f"user-agent={random_user_agent}")
+
+    if lean:
+        options.page_load_strategy = "eager"
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+        })
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--mute-audio")
+    if measure:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+class ingredients_or_settled:
+    """
+    Wait condition that is met as soon as an ingredient-like block is in the DOM,
+    or SETTLE_AFTER_LOAD seconds after the document finished loading without one.
+    """
+
+    def __init__(self, settle: float = SETTLE_AFTER_LOAD):
+        self.settle = settle
+        self.loaded_at = None
+
+    def __call__(self, driver):
+        if driver.execute_script(INGREDIENT_PROBE_JS):
+            return True
+        if driver.execute_script("return document.readyState") == "complete":
+            self.loaded_at = self.loaded_at or time.monotonic()
+            return time.monotonic() - self.loaded_at >= self.settle
+        return False
+
+def _bytes_transferred(driver) -> int:
+    """Sums encoded response sizes from Chrome's performance log."""
+    total = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message.get("method") == "Network.loadingFinished":
+            total += int(message["params"].get("encodedDataLength", 0))
+    return total
+
+def _render(url: str, lean: bool = LEAN_BROWSER, measure: bool = False) -> Tuple[str, Dict]:
+    driver = None
+    try:
+        service = Service(ChromeDriverManager().install())
+        driver = webdriver.Chrome(service=service, options=build_chrome_options(lean, measure))
+        driver.set_page_load_timeout(BROWSER_WAIT_TIME)
+        if lean:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+        print(f"Loading {url} with Selenium{' (lean profile)' if lean else ''}...")
+        started = time.monotonic()
+        driver.get(url)
+        if lean:
+            try:
+                WebDriverWait(driver, BROWSER_WAIT_TIME, poll_frequency=0.25).until(ingredients_or_settled())
+            except TimeoutException:
+                # Pages that keep mutating (carousels, chat widgets) never settle; the DOM
+                # loaded so far is still worth extracting from.
+                print(f"⏳ {url} did not settle within {BROWSER_WAIT_TIME}s; using the DOM as rendered.")
+        else:
+            WebDriverWait(driver, BROWSER_WAIT_TIME).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
+        html_content = driver.page_source
+        metrics = {"load_seconds": time.monotonic() - started}
+        if measure:
+            metrics["bytes"] = _bytes_transferred(driver)
+        return html_content, metrics
+    finally:
+        if driver:
+            driver.quit()
+
+@timed("selenium")
+def render_with_browser(url: str, lean: bool = LEAN_BROWSER) -> str:
+    """Loads a URL in headless Chrome and returns the rendered HTML."""
+    return _render(url, lean)[0]
+
+def measure_browser_profiles(urls: List[str]) -> List[Dict]:
+    """
+    Loads each URL with the default and the lean browser profile and reports
+    bytes transferred and time-to-extract (page load + extraction) for both.
+    """
+    rows = []
+    for url in urls:
+        row = {"url": url}
+        for profile, lean in (("default", False), ("lean", True)):
+            try:
+                started = time.monotonic()
+                html_content, metrics = _render(url, lean=lean, measure=True)
+                found = bool(extract_ingredient_text(html_content))
+                row[profile] = {"bytes": metrics["bytes"], "seconds": time.monotonic() - started, "found": found}
+            except Exception as e:
+                row[profile] = {"error": f"{type(e).__name__}: {e}"}
+        rows.append(row)
+        print(url)
+        for profile in ("default", "lean"):
+            r = row[profile]
+            if "error" in r:
+                print(f"{profile:>8}: {r['error']}")
+            else:
+                print(f"{profile:>8}: {r['bytes'] / 1024:8.0f} KB  {r['seconds']:6.2f}s  ingredients={'yes' if r['found'] else 'no'}")
+    return rows
+
+# =========================
+# Offline record / replay
+# =========================
+_archive = None
+_archive_lock = threading.Lock()
+
+def set_archive_mode(mode: Optional[str], path: Optional[str] = None):
+    """Switches scraping to "record", "replay" or back to live-only (None)."""
+    global ARCHIVE_MODE, ARCHIVE_PATH, _archive
+    if mode not in (None, "record", "replay"):
+        raise ValueError(f"Unknown archive mode: {mode}")
+    with _archive_lock:
+        if _archive is not None:
+            _archive.close()
+        ARCHIVE_MODE = mode
+        ARCHIVE_PATH = path or ARCHIVE_PATH
+        _archive = None
+
+def get_archive() -> Optional[HarArchive]:
+    global _archive
+    if not ARCHIVE_MODE:
+        return None
+    with _archive_lock:
+        if _archive is None:
+            _archive = HarArchive(ARCHIVE_PATH)
+            atexit.register(_archive.close)   # batched saves: flush the tail on exit
+        return _archive
+
+def record_page(url: str, html: str, stage: str, headers: Optional[Dict[str, str]] = None, elapsed: float = 0.0):
+    """Saves a fetched page to the archive when recording is on."""
+    if ARCHIVE_MODE == "record":
+        get_archive().record(url, html, stage=stage, headers=headers, elapsed=elapsed)
+
+def replay_extract(url: str, archive: HarArchive) -> str:
+    """
+    Runs the extractor cascade on archived copies of a page, following the live
+    path: the rendered DOM if the page needed the browser, the static HTML
+    otherwise. The domain registry is bypassed so replays are reproducible.
+    """
+    html_content = archive.lookup(url, "browser")
+    if html_content is None:
+        html_content = archive.lookup(url, "http")
+    if html_content is None:
+        return ""
+    return extract_ingredient_text(html_content, allow_body_fallback=True)
+
+# =========================
+# Two-stage scraper
+# =========================
+def _fetch_and_extract(url: str) -> Tuple[str, str, Dict[str, str]]:
+    """
+    Runs the HTTP stage and, if needed, the browser stage for a URL.
+    Returns (ingredient_text, html, validators); ingredient_text is empty when
+    nothing was found. Browser errors, and HTTP errors other than bot blocks
+    (BOT_BLOCK_STATUSES), propagate to the caller.
+    """
+    domain = domain_of(url)
+    stage = known_stage(domain)
+    validators = {}
+
+    if stage != "browser":
+        try:
+            print(f"Fetching {url} over HTTP...")
+            resp = fetch_static_page(url)
+            html_content = resp.text
+            record_page(url, html_content, "http", dict(resp.headers), resp.elapsed.total_seconds())
+            validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+            # Known-static domains never escalate, so the loose body regex is allowed.
+            ingredient_text = extract_ingredient_text(html_content, allow_body_fallback=(stage == "http"), domain=domain)
+            if ingredient_text:
+                record_stage(domain, "http")
+                return ingredient_text, html_content, validators
+            if stage == "http":
+                return "", html_content, validators
+            print(f"No ingredient block in static HTML for {url}. Escalating to browser.")
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code not in BOT_BLOCK_STATUSES:
+                raise
+            print(f"HTTP fetch blocked for {url}: {e}. Escalating to browser.")
+        except requests.RequestException as e:
+            print(f"HTTP fetch failed for {url}: {e}. Escalating to browser.")
+
+    ingredient_text, html_content = browser_extract(url)
+    return ingredient_text, html_content, validators
+
+def browser_extract(url: str) -> Tuple[str, str]:
+    """
+    Renders a URL in headless Chrome and runs the full extractor cascade on it.
+    Returns (ingredient_text, html). Browser errors propagate to the caller.
+    """
+    started = time.monotonic()
+    html_content = render_with_browser(url)
+    record_page(url, html_content, "browser", elapsed=time.monotonic() - started)
+    # The browser is the last stage, so the loose body regex is allowed here.
+    ingredient_text = extract_ingredient_text(html_content, allow_body_fallback=True, domain=domain_of(url))
+    if ingredient_text:
+        record_stage(domain_of(url), "browser")
+    return ingredient_text, html_content
+
+def _revalidate(url: str, entry: Dict) -> Optional[str]:
+    """
+    Checks a cached page with a conditional GET. Returns the ingredient text if
+    the page is unchanged (304) or could be re-extracted from the static body,
+    or None when a full scrape is needed.
+    """
+    if not (entry.get("etag") or entry.get("last_modified")):
+        return None
+    try:
+        resp = fetch_static_page(url, etag=entry.get("etag"), last_modified=entry.get("last_modified"))
+    except requests.RequestException as e:
+        print(f"Revalidation failed for {url}: {e}")
+        return None
+    if resp.status_code == 304:
+        print(f"♻️ Page unchanged (304): {url}")
+        PAGE_CACHE.touch(url)
+        return entry["ingredient_text"]
+    if known_stage(domain_of(url)) == "http":
+        ingredient_text = extract_ingredient_text(resp.text, domain=domain_of(url))
+        if ingredient_text:
+            PAGE_CACHE.put(url, resp.text, ingredient_text,
+                           etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+            return ingredient_text
+    return None
+
+# Background refreshes for stale hits: a few threads, at most one refresh per URL at a time.
+REFRESH_WORKERS = 4
+_refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="page-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def schedule_refresh(url: str) -> bool:
+    """Queues a background refresh of a cached page unless one is already queued or running."""
+    key = normalize_url(url)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    def run():
+        try:
+            refresh_cached_page(url)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_executor.submit(run)
+    return True
+
+def refresh_cached_page(url: str) -> Optional[str]:
+    """Revalidates a cached page and falls back to a full scrape if it changed."""
+    entry = PAGE_CACHE.get(url)
+    if entry and entry.get("ingredient_text"):
+        refreshed = _revalidate(url, entry)
+        if refreshed:
+            return refreshed
+    try:
+        ingredient_text, html_content, validators = _fetch_and_extract(url)
+    except Exception as e:
+        print(f"Background refresh failed for {url}: {e}")
+        return None
+    if ingredient_text:
+        PAGE_CACHE.put(url, html_content, ingredient_text, **validators)
+    return ingredient_text or None
+
+@timed("scrape")
+def scrape_ingredients_from_url(url: str, use_cache: bool = True) -> str:
+    """
+    Attempts to extract cosmetic ingredients from a product page.
+    In replay mode pages come only from the HAR archive; in record mode the page
+    cache is bypassed and every fetched page is saved to the archive. Otherwise
+    pages are served from the on-disk page cache while fresh; stale pages are
+    revalidated with a conditional GET (or served immediately and refreshed in the
+    background when STALE_WHILE_REVALIDATE is on). On a miss the static HTML is
+    fetched over a pooled HTTP client first; only pages where no ingredient block
+    is found are escalated to a headless Selenium browser.
+    """
+    if ARCHIVE_MODE == "replay":
+        ingredient_text = replay_extract(url, get_archive())
+        if not ingredient_text:
+            return f"Error: {url} is not in the replay archive {ARCHIVE_PATH} (or has no ingredient list)."
+        return ingredient_text
+
+    if use_cache and ARCHIVE_MODE != "record":
+        entry = PAGE_CACHE.get(url)
+        if entry and entry.get("ingredient_text"):
+            if is_fresh(entry):
+                print(f"⚡ Page cache hit: {url}")
+                return entry["ingredient_text"]
+            if STALE_WHILE_REVALIDATE and is_servable_stale(entry):
+                print(f"⚡ Serving stale page while revalidating: {url}")
+                schedule_refresh(url)
+                return entry["ingredient_text"]
+            refreshed = _revalidate(url, entry)
+            if refreshed:
+                return refreshed
+
+    try:
+        ingredient_text, html_content, validators = _fetch_and_extract(url)
+        if not ingredient_text:
+            return NO_INGREDIENTS_MESSAGE
+        if use_cache:
+            PAGE_CACHE.put(url, html_content, ingredient_text, **validators)
+        return ingredient_text
+
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else "error"
+        print(f"HTTP {status} for {url}: {e}")
+        return f"Error: The page returned HTTP {status} ({'not found' if status in (404, 410) else 'request failed'}). Check the URL or provide text manually."
+    except TimeoutException:
+        print(f"Timeout: Page took longer than {BROWSER_WAIT_TIME} seconds to load.")
+        return f"Error: Timeout. Page took longer than {BROWSER_WAIT_TIME} seconds to load. Try again or provide text manually."
+    except WebDriverException as e:
+        print(f"WebDriver error: {e}")
+        return f"Error: WebDriver failed to run. Ensure Chrome is installed and updated. ({e})"
+    except Exception as e:
+        print(f"An unexpected error occurred during scraping: {e}")
+        return f"An unexpected error occurred during scraping: {e}"
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 3 or sys.argv[1] != "--measure":
+        print("Usage: python scraper.py --measure <url> [<url> ...]")
+        sys.exit(1)
+    measure_browser_profiles(sys.argv[2:])
@@ -0,0 +1,85 @@
+import os
+import re
+import threading
+from typing import Dict, List, Tuple
+
+import click
+
+# =========================
+# Embeddings for the shared snapshot
+# =========================
+def chroma_embeddings(path: str, collection_name: str) -> Dict[str, List[float]]:
+    """{ingredient name: embedding} from the Chroma collection the coordinator's index writes to."""
+    import chromadb
+    collection = chromadb.PersistentClient(path=path).get_collection(collection_name)
+    data = collection.get(include=["embeddings", "metadatas", "documents"])
+    embeddings = {}
+    for vector, metadata, document in zip(data["embeddings"], data["metadatas"], data["documents"]):
+        name = (metadata or {}).get("ingredient")
+        if not name:   # documents indexed before they carried metadata
+            match = re.search(r"Ingredient:\s*(.+)", document or "")
+            name = match.group(1) if match else None
+        if name:
+            embeddings[name.strip().lower()] = list(vector)
+    return embeddings
+
+# =========================
+# Multi-process serving
+# =========================
+@click.command()
+@click.option('--workers', default=os.cpu_count() or 2, help='API worker processes (default: CPU count)')
+@click.option('--host', default='0.0.0.0', help='Bind address (default: 0.0.0.0)')
+@click.option('--port', default=7861, help='Port for the workers\' JSON API (default: 7861)')
+@click.option('--ui-port', default=7860, help='Port for the Gradio UI, served by the coordinator (default: 7860)')
+def main(workers, host, port, ui_port):
+    """
+    Runs one coordinator process that owns riskdata.py, chroma_db and the
+    snapshot files, plus N uvicorn workers serving /api that map its snapshot.
+    """
+    os.environ["APP_ROLE"] = "coordinator"
+    import uvicorn
+    import app
+    from metrics import REGISTRY, merge_families, render_families
+    from shared_snapshot import Coordinator, write_snapshot
+
+    exported: Dict = {"version": None, "path": None}
+    export_lock = threading.Lock()
+
+    def export(snapshot) -> Tuple[int, str]:
+        with export_lock:
+            if snapshot.version != exported["version"]:
+                embeddings = chroma_embeddings(app.CHROMA_PATH, app.CHROMA_COLLECTION)
+                path = write_snapshot(snapshot.version, snapshot.db, embeddings)
+                exported.update(version=snapshot.version, path=str(path))
+                print(f"💾 Wrote risk snapshot v{snapshot.version} ({len(snapshot.db)} ingredients, "
+                      f"{len(embeddings)} embeddings)")
+            return exported["version"], exported["path"]
+
+    def publish(entries: Dict[str, Dict]) -> Tuple[int, str]:
+        return export(app.SNAPSHOTS.update(entries))
+
+    # Workers hold a slot of the coordinator's LLM scheduler per Ollama request.
+    coordinator = Coordinator(publish, lambda: export(app.SNAPSHOTS.current()), admit=app.SCHEDULER.slot)
+    # The UI port's /metrics reports every process, each sample labelled with its worker.
+    app.METRICS_RENDER = lambda: render_families(merge_families({
+        "coordinator": REGISTRY.collect(),
+        **{pid: families for pid, families in coordinator.gather_reports().items() if families},
+    }))
+    # New versions from workers or from the coordinator's own UI reach every worker.
+    app.SNAPSHOTS.subscribe(lambda snapshot: coordinator.broadcast(*export(snapshot)))
+    export(app.SNAPSHOTS.current())
+    coordinator.start()
+
+    ui = uvicorn.Server(uvicorn.Config(app.server, host=host, port=ui_port))
+    threading.Thread(target=ui.run, name="gradio-ui", daemon=True).start()
+
+    # Spawned workers inherit these and import app in worker mode.
+    coord_host, coord_port = coordinator.address
+    os.environ["APP_ROLE"] = "worker"
+    os.environ["RISK_COORDINATOR"] = f"{coord_host}:{coord_port}"
+    os.environ["RISK_COORDINATOR_KEY"] = coordinator.authkey.hex()
+    print(f"🚀 UI on :{ui_port}, JSON API on :{port} with {workers} workers")
+    uvicorn.run("app:api", host=host, port=port, workers=workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+import os
+import json
+import mmap
+import time
+import itertools
+import threading
+import weakref
+from contextlib import contextmanager, nullcontext
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import click
+import numpy as np
+
+# =========================
+# Config
+# =========================
+SNAPSHOT_DIR = Path(os.getenv("RISK_SNAPSHOT_DIR", "risk_snapshots"))
+SNAPSHOT_KEEP = 3            # older snapshot files are deleted unless a live process still maps them
+MAGIC = b"RISKSNP1"
+ALIGN = 64
+
+# =========================
+# Snapshot file format
+# =========================
+# MAGIC | uint64 header length | JSON header | sections, each 64-byte aligned:
+#   name/risk/impact string tables (uint64 offsets + UTF-8 blob, names sorted)
+#   float32 embeddings (count x dim, unit length; dim 0 when there are none)
+
+def _string_table(values: List[str]) -> Tuple[np.ndarray, bytes]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+def write_snapshot(version: int, db: Mapping[str, Mapping], embeddings: Dict[str, List[float]],
+                   directory: Path = SNAPSHOT_DIR) -> Path:
+    """
+    Writes one version of the ingredient table (and each name's embedding, if
+    known) to a file workers can mmap, then prunes old versions.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    names = sorted(db)
+    dim = len(next(iter(embeddings.values()))) if embeddings else 0
+    matrix = np.zeros((len(names), dim), dtype=np.float32)
+    for row, name in enumerate(names):
+        vector = embeddings.get(name)
+        if vector is not None and dim:
+            matrix[row] = vector
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True) if dim else None
+    if dim:
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+    sections = []
+    for column in ("name", "risk", "impact"):
+        values = names if column == "name" else [str(db[n].get(column, "")) for n in names]
+        offsets, blob = _string_table(values)
+        sections += [(f"{column}_offsets", offsets.tobytes()), (f"{column}_blob", blob)]
+    sections.append(("embeddings", matrix.tobytes()))
+
+    header = {"version": version, "count": len(names), "dim": dim, "sections": {}}
+    # Two passes: section offsets depend on the header length.
+    for _ in range(2):
+        encoded = json.dumps(header).encode("utf-8")
+        position = -(-(len(MAGIC) + 8 + len(encoded)) // ALIGN) * ALIGN
+        for key, data in sections:
+            header["sections"][key] = [position, len(data)]
+            position += -(-len(data) // ALIGN) * ALIGN
+    encoded = json.dumps(header).encode("utf-8")
+
+    path = directory / f"risk-{version:08d}.snap"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(encoded).to_bytes(8, "little") + encoded)
+        for key, data in sections:
+            f.seek(header["sections"][key][0])
+            f.write(data)
+        f.truncate(max(position, f.tell()))
+    os.replace(tmp, path)
+    for old in sorted(directory.glob("risk-*.snap"))[:-SNAPSHOT_KEEP]:
+        if not _in_use(old):
+            old.unlink(missing_ok=True)
+    return path
+
+# =========================
+# Leases
+# =========================
+# A process mapping a snapshot keeps "<file>.<pid>.lease" next to it for as long as
+# the mapping lives, so pruning skips files a worker may still open or read.
+def _take_lease(path: Path) -> Optional[Path]:
+    lease = path.with_name(f"{path.name}.{os.getpid()}.lease")
+    try:
+        lease.touch()
+    except OSError:   # read-only directory: no pruning protection, mapping still works
+        return None
+    return lease
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _in_use(path: Path) -> bool:
+    """True while a live process holds a lease on the snapshot; leases of dead processes are removed."""
+    in_use = False
+    for lease in path.parent.glob(f"{path.name}.*.lease"):
+        pid = lease.name[len(path.name) + 1:-len(".lease")]
+        if pid.isdigit() and _pid_alive(int(pid)):
+            in_use = True
+        else:
+            lease.unlink(missing_ok=True)
+    return in_use
+
+class MappedRiskTable(Mapping):
+    """
+    Read-only {name: {"risk", "impact"}} over an mmap'd snapshot file. Every
+    process mapping the same file shares its pages, so the table and the
+    embeddings cost the same memory for one worker or sixteen.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        lease = _take_lease(self.path)
+        if lease is not None:   # released when the table (and its mapping) is garbage collected
+            weakref.finalize(self, lease.unlink, missing_ok=True)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a risk snapshot")
+        length = int.from_bytes(self._mm[len(MAGIC):len(MAGIC) + 8], "little")
+        header = json.loads(self._mm[len(MAGIC) + 8:len(MAGIC) + 8 + length])
+        self.version, self.count, self.dim = header["version"], header["count"], header["dim"]
+        self._sections = header["sections"]
+        self._offsets = {c: self._array(f"{c}_offsets", np.uint64) for c in ("name", "risk", "impact")}
+        self.embeddings = self._array("embeddings", np.float32).reshape(self.count, self.dim)
+        self._names: Optional[List[str]] = None
+
+    def _array(self, key: str, dtype) -> np.ndarray:
+        start, size = self._sections[key]
+        return np.frombuffer(self._mm, dtype=dtype, count=size // np.dtype(dtype).itemsize, offset=start)
+
+    def _string(self, column: str, row: int) -> str:
+        offsets = self._offsets[column]
+        base = self._sections[f"{column}_blob"][0]
+        return self._mm[base + int(offsets[row]):base + int(offsets[row + 1])].decode("utf-8")
+
+    def _row(self, name: str) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:   # binary search over the sorted name table
+            mid = (lo + hi) // 2
+            if self._string("name", mid) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._string("name", lo) == name:
+            return lo
+        raise KeyError(name)
+
+    def _entry(self, row: int) -> Mapping:
+        return MappingProxyType({"risk": self._string("risk", row), "impact": self._string("impact", row)})
+
+    def __getitem__(self, name: str) -> Mapping:
+        return self._entry(self._row(name))
+
+    def __contains__(self, name) -> bool:
+        try:
+            self._row(name)
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        # Names only are decoded once per process, for fuzzy matching's full scans.
+        if self._names is None:
+            self._names = [self._string("name", row) for row in range(self.count)]
+        return iter(self._names)
+
+    def search(self, query: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
+        """Nearest names by cosine similarity to a query embedding."""
+        if not self.dim or not self.count:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        scores = self.embeddings @ q
+        top = np.argpartition(-scores, min(top_k, self.count) - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._string("name", int(row)), float(scores[row])) for row in top]
+
+# =========================
+# Coordinator
+# =========================
+class Coordinator:
+    """
+    Owns every write in multi-process mode. Workers connect over a
+    multiprocessing.connection socket and either subscribe to remap
+    notifications or send ("publish", entries) and get back the
+    (version, path) of a snapshot that includes them. Subscribers also
+    answer report requests (e.g. their metrics) on the same connection.
+    Workers send ("slot", priority) to hold one of admit(priority)'s slots (the
+    coordinator's LLM scheduler) until they send ("release",), so one cap
+    covers every process's Ollama requests.
+    """
+
+    def __init__(self, publish: Callable[[Dict[str, Dict]], Tuple[int, str]],
+                 current: Callable[[], Tuple[int, str]], address=("127.0.0.1", 0), authkey: bytes = None,
+                 admit: Optional[Callable[[int], ContextManager]] = None):
+        self._publish = publish
+        self._current = current
+        self._admit = admit or (lambda priority: nullcontext())
+        self.authkey = authkey or os.urandom(16)
+        self._listener = Listener(address, authkey=self.authkey)
+        self._subscribers: List[Connection] = []
+        self._lock = threading.Lock()
+        self._report_ids = itertools.count()
+
+    @property
+    def address(self):
+        return self._listener.address
+
+    def start(self):
+        threading.Thread(target=self._accept, name="snapshot-coordinator", daemon=True).start()
+        print(f"🧭 Snapshot coordinator listening on {self.address}")
+
+    def _accept(self):
+        while True:
+            conn = self._listener.accept()
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: Connection):
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == "subscribe":
+                    with self._lock:
+                        self._subscribers.append(conn)
+                    conn.send(("remap",) + self._current())
+                    return   # notifications are pushed by broadcast()
+                if message[0] == "publish":
+                    try:
+                        conn.send(("ok",) + self._publish(message[1]))
+                    except Exception as e:
+                        conn.send(("error", str(e)))
+                elif message[0] == "current":
+                    conn.send(("ok",) + self._current())
+                elif message[0] == "slot":
+                    self._hold_slot(conn, message[1])
+        except (EOFError, OSError):
+            conn.close()
+
+    def _hold_slot(self, conn: Connection, priority: int):
+        """Grants a worker a slot and keeps it until the worker releases it or disconnects."""
+        granted = False
+        try:
+            with self._admit(priority):
+                granted = True
+                conn.send(("ok",))
+                conn.recv()   # ("release",)
+        except Exception as e:
+            if granted:
+                raise   # the worker went away; leaving the block freed its slot
+            conn.send(("shed", str(e)))
+
+    def broadcast(self, version: int, path: str):
+        with self._lock:
+            alive = []
+            for conn in self._subscribers:
+                try:
+                    conn.send(("remap", version, path))
+                    alive.append(conn)
+                except OSError:
+                    conn.close()
+            self._subscribers = alive
+        print(f"📣 Snapshot v{version} sent to {len(alive)} workers")
+
+    def gather_reports(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """{worker pid: report} from every subscribed worker that answers within `timeout`."""
+        request_id = next(self._report_ids)
+        reports = {}
+        with self._lock:
+            asked = []
+            for conn in self._subscribers:
+                try:
+                    conn.send(("report", request_id))
+                    asked.append(conn)
+                except OSError:
+                    pass
+            deadline = time.monotonic() + timeout
+            for conn in asked:
+                try:
+                    while conn.poll(max(0.0, deadline - time.monotonic())):
+                        _, reply_id, pid, report = conn.recv()
+                        if reply_id == request_id:   # late answers to earlier requests are dropped
+                            reports[str(pid)] = report
+                            break
+                except (EOFError, OSError):
+                    pass
+        return reports
+
+class SlotRefused(RuntimeError):
+    """The coordinator shed a worker's LLM admission request."""
+
+class CoordinatorLink:
+    """
+    A worker's connections to the coordinator: one for requests, one for
+    notifications, and a pool of connections for holding LLM slots.
+    """
+
+    def __init__(self, address, authkey: bytes):
+        self.address, self.authkey = address, authkey
+        self._requests = Client(address, authkey=authkey)
+        self._lock = threading.Lock()
+        self._slot_conns: List[Connection] = []
+        self._slot_lock = threading.Lock()
+
+    def _call(self, *message) -> Tuple[int, str]:
+        with self._lock:
+            self._requests.send(message)
+            reply = self._requests.recv()
+        if reply[0] != "ok":
+            raise RuntimeError(f"coordinator: {reply[1]}")
+        return reply[1], reply[2]
+
+    def current(self) -> Tuple[int, str]:
+        return self._call("current")
+
+    def publish(self, entries: Dict[str, Dict]) -> Tuple[int, str]:
+        return self._call("publish", {name: dict(info) for name, info in entries.items()})
+
+    @contextmanager
+    def slot(self, priority: int):
+        """Holds one of the coordinator's LLM slots for the block; raises SlotRefused if shed."""
+        with self._slot_lock:
+            conn = self._slot_conns.pop() if self._slot_conns else None
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+        try:
+            conn.send(("slot", priority))
+            reply = conn.recv()
+        except (EOFError, OSError):
+            conn.close()
+            raise
+        if reply[0] != "ok":
+            with self._slot_lock:
+                self._slot_conns.append(conn)
+            raise SlotRefused(reply[1])
+        try:
+            yield
+        finally:
+            try:
+                conn.send(("release",))
+            except OSError:
+                conn.close()
+            else:
+                with self._slot_lock:
+                    self._slot_conns.append(conn)
+
+    def follow(self, on_remap: Callable[[int, str], None], report: Optional[Callable[[], Any]] = None):
+        """
+        Calls on_remap(version, path) for the current and every later snapshot,
+        from a thread, and answers the coordinator's report requests with report().
+        """
+        conn = Client(self.address, authkey=self.authkey)
+        conn.send(("subscribe",))
+
+        def answer(request_id: int):
+            try:
+                payload = report() if report else None
+            except Exception as e:
+                print(f"⚠️ Could not build report for the coordinator: {e}")
+                payload = None
+            conn.send(("report", request_id, os.getpid(), payload))
+
+        def listen():
+            while True:
+                try:
+                    message = conn.recv()
+                    if message[0] == "report":
+                        answer(message[1])
+                        continue
+                except (EOFError, OSError):
+                    print("⚠️ Lost connection to snapshot coordinator; serving the last mapped snapshot")
+                    return
+                _, version, path = message
+                try:
+                    on_remap(version, path)
+                except Exception as e:
+                    # e.g. the file was pruned before we mapped it: catch up to whatever is current.
+                    print(f"⚠️ Could not map snapshot v{version} ({e}); re-syncing with the coordinator")
+                    try:
+                        on_remap(*self.current())
+                    except Exception as e:
+                        print(f"⚠️ Re-sync failed ({e}); serving the last mapped snapshot until the next version")
+
+        threading.Thread(target=listen, name="snapshot-follower", daemon=True).start()
+
+# =========================
+# Memory check
+# =========================
+def _pss_kb(pid: int) -> int:
+    """Proportional set size: shared pages are split between the processes mapping them."""
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        if line.startswith("Pss:"):
+            return int(line.split()[1])
+    return 0
+
+def _touch(path: str, ready, done):
+    table = MappedRiskTable(Path(path))
+    table.embeddings.sum()   # fault in every page
+    sum(len(table[name]["impact"]) for name in table)
+    ready.set()
+    done.wait()
+
+@click.command()
+@click.option('--entries', default=50_000, help='Ingredients in the synthetic snapshot (default: 50,000)')
+@click.option('--dim', default=768, help='Embedding size (default: 768, nomic-embed-text)')
+@click.option('--workers', default='1,2,4,8', help='Worker counts to measure (default: 1,2,4,8)')
+def main(entries, dim, workers):
+    """Total memory of N processes mapping one snapshot, to check it stays flat as N grows."""
+    import multiprocessing
+    rng = np.random.default_rng(0)
+    db = {f"ingredient {i:06d}": {"risk": "Low", "impact": "x" * 120} for i in range(entries)}
+    vectors = rng.standard_normal((entries, dim), dtype=np.float32)
+    directory = Path("/tmp/risk_snapshot_check")
+    path = write_snapshot(1, db, {name: vectors[i] for i, name in enumerate(db)}, directory)
+    click.echo(f"📊 {entries:,} entries x {dim} dims: {path.stat().st_size / 2**20:.0f} MB snapshot")
+    ctx = multiprocessing.get_context("spawn")
+    for n in [int(w) for w in workers.split(",")]:
+        done = ctx.Event()
+        procs, readies = [], []
+        for _ in range(n):
+            ready = ctx.Event()
+            p = ctx.Process(target=_touch, args=(str(path), ready, done))
+            p.start()
+            procs.append(p)
+            readies.append(ready)
+        for ready in readies:
+            ready.wait()
+        time.sleep(0.2)
+        total = sum(_pss_kb(p.pid) for p in procs) / 1024
+        done.set()
+        for p in procs:
+            p.join()
+        click.echo(f"   {n:>2} workers: {total:7.0f} MB total PSS ({total / n:6.0f} MB/worker)")
+    for old in directory.glob("risk-*.snap"):
+        old.unlink()
+
+if __name__ == "__main__":
+    main()
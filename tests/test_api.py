@@ -0,0 +1,126 @@
+"""
+Smoke tests for the JSON API's error paths. Importing app builds the vector
+index with Ollama embeddings, so these run only where the full stack is
+installed and an Ollama server is reachable; pipeline stages are replaced
+per test so no request reaches a model.
+"""
+import os
+import socket
+from urllib.parse import urlparse
+
+import pytest
+
+pytest.importorskip("gradio")
+pytest.importorskip("chromadb")
+pytest.importorskip("llama_index.core")
+pytest.importorskip("llama_index.embeddings.ollama")
+from fastapi.testclient import TestClient
+
+
+def _ollama_reachable() -> bool:
+    host = urlparse(os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+    try:
+        with socket.create_connection((host.hostname or "localhost", host.port or 11434), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+if not _ollama_reachable():
+    pytest.skip("needs a running Ollama server", allow_module_level=True)
+
+import app
+from llm_scheduler import LLMOverloaded
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app.api) as c:
+        yield c
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("pipeline stage should not run")
+
+
+def test_text_empty_is_400(client, monkeypatch):
+    monkeypatch.setattr(app, "analyze_product", _fail)
+    assert client.post("/api/analyze/text", json={"text": "   "}).status_code == 400
+
+
+def test_text_missing_field_is_422(client):
+    assert client.post("/api/analyze/text", json={}).status_code == 422
+
+
+def test_text_overloaded_is_503_with_retry_after(client, monkeypatch):
+    def overloaded(*args, **kwargs):
+        raise LLMOverloaded("LLM busy (test)")
+    monkeypatch.setattr(app, "analyze_product", overloaded)
+    resp = client.post("/api/analyze/text", json={"text": "Water, Glycerin"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "30"
+
+
+def test_image_empty_body_is_400(client, monkeypatch):
+    monkeypatch.setattr(app, "ocr_from_image", _fail)
+    assert client.post("/api/analyze/image", content=b"").status_code == 400
+
+
+def test_image_without_text_is_422(client, monkeypatch):
+    monkeypatch.setattr(app, "ocr_from_image", lambda data: "")
+    assert client.post("/api/analyze/image", content=b"\x89PNG").status_code == 422
+
+
+def test_image_without_ingredients_is_422(client, monkeypatch):
+    monkeypatch.setattr(app, "ocr_from_image", lambda data: "Net wt 50 ml")
+    monkeypatch.setattr(app, "extract_ingredients", lambda text: "")
+    assert client.post("/api/analyze/image", content=b"\x89PNG").status_code == 422
+
+
+def test_url_invalid_is_400(client, monkeypatch):
+    monkeypatch.setattr(app, "scrape_ingredients_from_url", _fail)
+    assert client.post("/api/analyze/url", json={"url": "not a url"}).status_code == 400
+
+
+def test_url_missing_field_is_422(client):
+    assert client.post("/api/analyze/url", json={"link": "https://example.com"}).status_code == 422
+
+
+def test_url_scrape_error_is_502(client, monkeypatch):
+    monkeypatch.setattr(app, "scrape_ingredients_from_url", lambda url: "Error: The page returned HTTP 404 (not found).")
+    assert client.post("/api/analyze/url", json={"url": "https://example.com/p"}).status_code == 502
+
+
+def test_url_without_ingredients_is_422(client, monkeypatch):
+    monkeypatch.setattr(app, "scrape_ingredients_from_url", lambda url: "Water, Glycerin, Talc")
+    monkeypatch.setattr(app, "extract_ingredients", lambda text: "")
+    assert client.post("/api/analyze/url", json={"url": "https://example.com/p"}).status_code == 422
+
+
+def test_batch_too_large_is_413(client, monkeypatch):
+    monkeypatch.setattr(app, "API_MAX_BATCH", 2)
+    monkeypatch.setattr(app, "analyze_products", _fail)
+    resp = client.post("/api/analyze/batch", json={"products": ["Water", "Talc", "Mica"]})
+    assert resp.status_code == 413
+
+
+def test_batch_malformed_item_is_422(client):
+    assert client.post("/api/analyze/batch", json={"products": [{"id": "sku-1"}]}).status_code == 422
+
+
+def test_batch_passes_ids_through(client, monkeypatch):
+    def analyze_products(items, explain=False):
+        for item in items:
+            yield {"product_id": item[0] if isinstance(item, tuple) else "fp", "overall_score": "Excellent"}
+    monkeypatch.setattr(app, "analyze_products", analyze_products)
+    resp = client.post("/api/analyze/batch", json={"products": [{"id": "sku-1", "text": "Water"}, "Talc"]})
+    assert resp.status_code == 200
+    assert resp.json() == {"count": 2, "results": [{"product_id": "sku-1", "overall_score": "Excellent"},
+                                                   {"product_id": "fp", "overall_score": "Excellent"}]}
+
+
+def test_metrics_is_prometheus_text(client):
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "# TYPE ira_stage_seconds histogram" in resp.text
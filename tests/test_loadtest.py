@@ -0,0 +1,74 @@
+import asyncio
+import socket
+
+import pytest
+from aiohttp import web
+
+import loadtest
+
+
+def test_request_for_shapes():
+    samples = ["Water, Glycerin", "Aqua, Talc"]
+    path, kwargs = loadtest.request_for("text", 3, samples, None, 2)
+    assert path == "/api/analyze/text" and kwargs == {"json": {"text": "Aqua, Talc"}}
+
+    path, kwargs = loadtest.request_for("batch", 1, samples, None, 3)
+    assert path == "/api/analyze/batch"
+    assert [p["id"] for p in kwargs["json"]["products"]] == ["load-1-0", "load-1-1", "load-1-2"]
+    assert [p["text"] for p in kwargs["json"]["products"]] == ["Aqua, Talc", "Water, Glycerin", "Aqua, Talc"]
+
+    path, kwargs = loadtest.request_for("image", 0, samples, b"\x89PNG", 1)
+    assert path == "/api/analyze/image" and kwargs["data"] == b"\x89PNG"
+
+    path, kwargs = loadtest.request_for("url", 0, ["https://example.com/p"], None, 1)
+    assert path == "/api/analyze/url" and kwargs == {"json": {"url": "https://example.com/p"}}
+
+
+def test_percentile():
+    values = [i / 100 for i in range(100)]
+    assert loadtest.percentile(values, 50) == 0.5
+    assert loadtest.percentile(values, 99) == 0.99
+    assert loadtest.percentile([0.2], 99) == 0.2
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_run_load_counts_every_request():
+    seen = []
+
+    async def analyze(request):
+        body = await request.json()
+        seen.append(body["text"])
+        if len(seen) % 4 == 0:
+            return web.json_response({"detail": "LLM busy"}, status=503)
+        return web.json_response({"overall_score": "Excellent"})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/api/analyze/text", analyze)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        port = _free_port()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        try:
+            return await loadtest.run_load(f"http://127.0.0.1:{port}", "text", 20, 4,
+                                           loadtest.DEFAULT_SAMPLES, None, 1, 10.0)
+        finally:
+            await runner.cleanup()
+
+    elapsed, latencies, statuses = asyncio.run(run())
+    assert elapsed > 0
+    assert len(latencies) == 20 and len(seen) == 20
+    assert statuses == {200: 15, 503: 5}
+
+
+def test_run_load_records_connection_errors():
+    port = _free_port()   # nothing listening
+    _, latencies, statuses = asyncio.run(
+        loadtest.run_load(f"http://127.0.0.1:{port}", "text", 3, 1, loadtest.DEFAULT_SAMPLES, None, 1, 5.0))
+    assert len(latencies) == 3
+    assert sum(statuses.values()) == 3 and 200 not in statuses
@@ -0,0 +1,16 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ingredient_parser import TOKENIZER_CORPUS, tokenize_ingredients
+
+CORPUS = Path(__file__).resolve().parent.parent / TOKENIZER_CORPUS
+CASES = json.loads(CORPUS.read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case["text"][:40] for case in CASES])
+def test_tokenizer_corpus(case):
+    tokens = tokenize_ingredients(case["text"])
+    assert [t.name for t in tokens] == case["expected"]
+    assert [t.name for t in tokens if t.may_contain] == case.get("may_contain", [])
@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+import ollama
+
+from llm_scheduler import BACKGROUND_ENRICH, SCHEDULER
+from model_routing import ROUTES
+
+# =========================
+# Config
+# =========================
+EMBED_MODEL = "nomic-embed-text"
+EMBED_KEEP_ALIVE = os.getenv("EMBED_KEEP_ALIVE", "30m")
+REWARM_INTERVAL = float(os.getenv("MODEL_REWARM_INTERVAL", "120"))  # seconds between idle checks
+REWARM_MARGIN = 2 * REWARM_INTERVAL   # re-warm models due to unload within this many seconds
+
+def _full_name(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+# =========================
+# Warm-up and keep-alive
+# =========================
+class ModelWarmer:
+    """
+    Loads the chat and embedding models into Ollama in the background with a
+    no-op request, pins them with keep_alive, and re-warms them while the
+    scheduler is idle so a user request never pays model load time.
+    """
+
+    def __init__(self, llm_models: Dict[str, Dict], embed_models: Dict[str, str],
+                 rewarm_interval: float = REWARM_INTERVAL, client: Optional[ollama.Client] = None):
+        self.llm_models = llm_models        # model -> {"keep_alive", "num_ctx"}
+        self.embed_models = embed_models    # model -> keep_alive
+        self.rewarm_interval = rewarm_interval
+        self.client = client or ollama.Client()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.state: Dict[str, Dict] = {
+            m: {"kind": kind, "state": "cold", "last_warmed": None, "load_seconds": None,
+                "expires_at": None, "error": None}
+            for kind, models in (("llm", llm_models), ("embedding", embed_models)) for m in models
+        }
+
+    def _set(self, model: str, **fields):
+        with self._lock:
+            self.state[model].update(fields)
+
+    def warm(self, model: str):
+        kind = self.state[model]["kind"]
+        self._set(model, state="warming")
+        started = time.monotonic()
+        try:
+            with SCHEDULER.slot(BACKGROUND_ENRICH):
+                if kind == "llm":
+                    # An empty prompt loads the model without generating anything; num_ctx
+                    # must match what CachedOllama sends or the first real call reloads it.
+                    spec = self.llm_models[model]
+                    self.client.generate(model=model, prompt="", keep_alive=spec["keep_alive"],
+                                         options={"num_ctx": spec["num_ctx"]})
+                else:
+                    self.client.embed(model=model, input="warm-up", keep_alive=self.embed_models[model])
+        except Exception as e:
+            self._set(model, state="cold", error=str(e))
+            print(f"⚠️ Warm-up of {model} failed: {e}")
+            return
+        elapsed = time.monotonic() - started
+        self._set(model, state="warm", last_warmed=time.time(), load_seconds=round(elapsed, 2), error=None)
+        print(f"🔥 {model} warm ({elapsed:.1f}s)")
+
+    def refresh(self) -> Dict[str, Optional[float]]:
+        """Updates warm/cold state from Ollama's loaded models; returns seconds until each unloads."""
+        try:
+            loaded = {m.model: m.expires_at for m in self.client.ps().models}
+        except Exception as e:
+            print(f"⚠️ Could not list loaded Ollama models: {e}")
+            return {}
+        remaining = {}
+        now = time.time()
+        for model in self.state:
+            expires = loaded.get(_full_name(model))
+            if expires is None:
+                if self.state[model]["state"] == "warm":
+                    self._set(model, state="cold", expires_at=None)
+                remaining[model] = None
+            else:
+                self._set(model, state="warm", expires_at=expires.isoformat())
+                remaining[model] = expires.timestamp() - now
+        return remaining
+
+    def _run(self):
+        for model in self.state:
+            self.warm(model)
+        while not self._stop.wait(self.rewarm_interval):
+            remaining = self.refresh()
+            if not SCHEDULER.idle():
+                continue  # requests in flight keep their models loaded anyway
+            for model, left in remaining.items():
+                if left is None or left < REWARM_MARGIN:
+                    self.warm(model)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def health(self) -> Dict:
+        with self._lock:
+            models = {m: dict(s) for m, s in self.state.items()}
+        return {"status": "ok" if all(s["state"] == "warm" for s in models.values()) else "warming",
+                "models": models}
+
+def _route_models() -> Dict[str, Dict]:
+    """Each routed model with its keep_alive and num_ctx (one per model, see load_routes)."""
+    models = {}
+    for route in ROUTES.values():
+        models.setdefault(route["model"], {"keep_alive": route["keep_alive"],
+                                           "num_ctx": route["context_window"]})
+    return models
+
+WARMER = ModelWarmer(_route_models(), {EMBED_MODEL: EMBED_KEEP_ALIVE})
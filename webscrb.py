@@ -1,4 +1,15 @@
 import os
+import re
+import sys
+import json
+import time
+import queue
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
 import click
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -7,15 +18,9 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
-@click.command()
-@click.argument('url')
-@click.option('--type', 'render_type', default='html', help='Render type: html or pdf (default: html)')
-@click.option('--output', '-o', help='Output file path (optional, prints to terminal if not specified)')
-@click.option('--wait', default=10, help='Wait time in seconds for page to load (default: 10)')
-@click.option('--headless', is_flag=True, help='Run browser in headless mode')
-def main(url, render_type, output, wait, headless):
-    """Convert a URL to HTML or PDF using Selenium with local browser."""
-    
+from archive import HarArchive
+
+def build_options(headless):
     # Setup Chrome options
     chrome_options = Options()
     if headless:
@@ -24,42 +29,197 @@ def main(url, render_type, output, wait, headless):
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--window-size=1920,1080")
-    
+
     # Add realistic user agent
     chrome_options.add_argument("--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
+    return chrome_options
+
+class BrowserPool:
+    """
+    A fixed set of Chrome instances shared by worker threads. A slot whose
+    browser could not be (re)launched stays in the pool empty and is launched
+    again by the next acquire(), so a failed relaunch never shrinks the pool.
+    """
+
+    def __init__(self, size, headless, wait):
+        self.headless = headless
+        self.wait = wait
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        try:
+            for _ in range(size):
+                self._idle.put(self._launch())
+        except Exception:
+            self.close()   # don't leave the browsers that did start running
+            raise
+
+    def _launch(self):
+        driver = webdriver.Chrome(options=build_options(self.headless))
+        driver.set_page_load_timeout(self.wait)
+        with self._lock:
+            self._all.append(driver)
+        return driver
+
+    def acquire(self):
+        driver = self._idle.get()
+        if driver is None:   # empty slot left by a failed relaunch
+            try:
+                driver = self._launch()
+            except Exception:
+                self._idle.put(None)
+                raise
+        return driver
+
+    def release(self, driver, broken=False):
+        if broken:
+            # A crashed or hung browser is replaced rather than reused.
+            with self._lock:
+                if driver in self._all:
+                    self._all.remove(driver)
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            try:
+                driver = self._launch()
+            except Exception as e:
+                click.echo(f"Could not relaunch a browser ({e}); retrying on next use.", err=True)
+                driver = None
+        self._idle.put(driver)
+
+    def close(self):
+        with self._lock:
+            drivers, self._all = self._all, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+def output_stem(url):
+    """File name for a URL: readable slug of host + path plus a short hash."""
+    parsed = urlparse(url)
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", f"{parsed.netloc}{parsed.path}").strip("-")[:80]
+    return f"{slug}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}"
+
+def print_to_pdf(driver):
+    """Renders the current page to PDF bytes with the DevTools Page.printToPDF command."""
+    result = driver.execute_cdp_cmd("Page.printToPDF", {"printBackground": True, "preferCSSPageSize": True})
+    return base64.b64decode(result["data"])
+
+def render(driver, url, render_type, wait):
+    """Loads a URL and returns {"html": str, "pdf": bytes} for the requested types."""
+    driver.get(url)
+
+    # Wait for page to be ready
+    WebDriverWait(driver, wait).until(
+        EC.presence_of_element_located((By.TAG_NAME, "body"))
+    )
+
+    rendered = {}
+    if render_type in ("html", "both"):
+        rendered["html"] = driver.page_source
+    if render_type in ("pdf", "both"):
+        rendered["pdf"] = print_to_pdf(driver)
+    return rendered
+
+def replay(archive, url, render_type):
+    """Serves a page from a HAR archive without touching the network."""
+    if render_type != "html":
+        raise ValueError("only --type html can be replayed from an archive")
+    html = archive.lookup(url, "browser") or archive.lookup(url, "http")
+    if html is None:
+        raise KeyError(f"{url} is not in the archive")
+    return {"html": html}
+
+def render_to_files(pool, url, render_type, output_dir, wait, archive=None, replaying=False):
+    """Renders one URL on a pooled browser (or from the archive) and returns its manifest record."""
+    record = {"url": url, "status": "ok", "type": render_type, "files": [], "bytes": 0, "error": None}
+    started = time.monotonic()
     driver = None
+    broken = False
     try:
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.set_page_load_timeout(wait)
-        
-        click.echo(f"Loading {url}...")
-        driver.get(url)
-        
-        # Wait for page to be ready
-        WebDriverWait(driver, wait).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        
+        if replaying:
+            rendered = replay(archive, url, render_type)
+        else:
+            driver = pool.acquire()
+            rendered = render(driver, url, render_type, wait)
+            if archive is not None and "html" in rendered:
+                archive.record(url, rendered["html"], stage="browser", elapsed=time.monotonic() - started)
+        stem = os.path.join(output_dir, output_stem(url))
+        if "html" in rendered:
+            with open(f"{stem}.html", 'w', encoding='utf-8') as f:
+                f.write(rendered["html"])
+            record["files"].append(f"{stem}.html")
+            record["bytes"] += len(rendered["html"].encode("utf-8"))
+        if "pdf" in rendered:
+            with open(f"{stem}.pdf", 'wb') as f:
+                f.write(rendered["pdf"])
+            record["files"].append(f"{stem}.pdf")
+            record["bytes"] += len(rendered["pdf"])
+    except TimeoutException:
+        record.update(status="timeout", error=f"Page took longer than {wait} seconds to load")
+        # A slow page is not a broken browser: stop the load and reuse it.
+        if driver is not None:
+            try:
+                driver.execute_script("window.stop();")
+            except WebDriverException:
+                broken = True
+    except WebDriverException as e:
+        record.update(status="error", error=f"WebDriver error: {e.msg or e}")
+        broken = True
+    except Exception as e:
+        record.update(status="error", error=f"Unexpected error: {e}")
+    finally:
+        if driver is not None:
+            pool.release(driver, broken=broken)
+    record["seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+def read_urls(urls, input_file):
+    collected = list(urls)
+    if input_file:
+        stream = sys.stdin if input_file == '-' else open(input_file, encoding='utf-8')
+        with stream:
+            collected.extend(line.strip() for line in stream)
+    elif not collected and not sys.stdin.isatty():
+        collected.extend(line.strip() for line in sys.stdin)
+    return [u for u in collected if u and not u.startswith('#')]
+
+def render_single(url, render_type, output, wait, headless, archive=None, replaying=False):
+    """Original single-URL behaviour: write to --output or print HTML to the terminal."""
+    driver = None
+    try:
+        if replaying:
+            rendered = replay(archive, url, render_type)
+        else:
+            driver = webdriver.Chrome(options=build_options(headless))
+            driver.set_page_load_timeout(wait)
+
+            click.echo(f"Loading {url}...", err=not output)
+            started = time.monotonic()
+            rendered = render(driver, url, render_type, wait)
+            if archive is not None and "html" in rendered:
+                archive.record(url, rendered["html"], stage="browser", elapsed=time.monotonic() - started)
+
         if render_type == 'html':
-            # Get page source
-            html_content = driver.page_source
-            
             if output:
                 with open(output, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
+                    f.write(rendered["html"])
                 click.echo(f"HTML saved to {output}")
             else:
-                click.echo(html_content)
-                
-        elif render_type == 'pdf':
-            # Print to PDF (Chrome's built-in PDF printing)
-            if output:
-                driver.execute_script("window.print();")
-                click.echo(f"PDF print dialog opened - save to {output}")
-            else:
-                click.echo("PDF print dialog opened")
-                
+                click.echo(rendered["html"])
+        else:
+            stem = os.path.splitext(output)[0] if output else output_stem(url)
+            if "html" in rendered:
+                with open(f"{stem}.html", 'w', encoding='utf-8') as f:
+                    f.write(rendered["html"])
+                click.echo(f"HTML saved to {stem}.html")
+            with open(f"{stem}.pdf", 'wb') as f:
+                f.write(rendered["pdf"])
+            click.echo(f"PDF saved to {stem}.pdf")
+
     except TimeoutException:
         click.echo(f"Timeout: Page took longer than {wait} seconds to load", err=True)
     except WebDriverException as e:
@@ -69,3 +229,78 @@ def main(url, render_type, output, wait, headless):
     finally:
         if driver:
             driver.quit()
+
+def render_batch(urls, render_type, output_dir, manifest, wait, headless, workers, archive=None, replaying=False):
+    """Renders many URLs concurrently over a pool of browsers, writing a JSONL manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = manifest or os.path.join(output_dir, "manifest.jsonl")
+    workers = max(1, min(workers, len(urls)))
+    source = "the archive" if replaying else f"{workers} browsers"
+    click.echo(f"Rendering {len(urls)} URLs with {source} -> {output_dir}", err=True)
+
+    started = time.monotonic()
+    counts = {}
+    pool = None if replaying else BrowserPool(workers, headless, wait)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor, open(manifest, 'a', encoding='utf-8') as out:
+            futures = [executor.submit(render_to_files, pool, url, render_type, output_dir, wait, archive, replaying)
+                       for url in urls]
+            for future in as_completed(futures):
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+                mark = "✅" if record["status"] == "ok" else "❌"
+                click.echo(f"{mark} {record['url']} ({record['seconds']}s){'' if not record['error'] else ' - ' + record['error']}", err=True)
+    finally:
+        if pool is not None:
+            pool.close()
+        if archive is not None and not replaying:
+            archive.save()
+    elapsed = time.monotonic() - started
+    click.echo(f"Done: {counts} in {elapsed:.1f}s ({len(urls) / elapsed * 60:.1f} pages/min). Manifest: {manifest}", err=True)
+
+@click.command()
+@click.argument('urls', nargs=-1)
+@click.option('--input', '-i', 'input_file', help="File with one URL per line ('-' for stdin)")
+@click.option('--type', 'render_type', default='html', type=click.Choice(['html', 'pdf', 'both']), help='Render type: html, pdf or both (default: html)')
+@click.option('--output', '-o', help='Output file path for a single URL (optional, prints HTML to terminal if not specified)')
+@click.option('--output-dir', '-d', default='rendered', help='Output directory for batch mode (default: rendered)')
+@click.option('--manifest', help='JSONL manifest path for batch mode (default: <output-dir>/manifest.jsonl)')
+@click.option('--workers', '-w', default=3, help='Number of pooled browsers for batch mode (default: 3)')
+@click.option('--wait', default=10, help='Wait time in seconds for page to load (default: 10)')
+@click.option('--headless', is_flag=True, help='Run browser in headless mode')
+@click.option('--record-har', help='Also save every rendered page into this HAR archive')
+@click.option('--replay-har', help='Serve pages from this HAR archive with no network access (html only)')
+def main(urls, input_file, render_type, output, output_dir, manifest, workers, wait, headless, record_har, replay_har):
+    """Convert URLs to HTML or PDF using Selenium with local browser.
+
+    Pass a single URL, several URLs, a file of URLs (--input) or pipe them on stdin.
+    More than one URL switches to batch mode with a pool of concurrent browsers.
+    """
+    if record_har and replay_har:
+        raise click.UsageError("Use either --record-har or --replay-har, not both.")
+    archive = None
+    if record_har:
+        archive = HarArchive(record_har, autosave_every=20)
+    elif replay_har:
+        archive = HarArchive(replay_har)
+
+    if render_type != 'html' and not headless and not replay_har:
+        # Page.printToPDF is only available in headless Chrome.
+        click.echo("PDF rendering requires headless mode; enabling --headless.", err=True)
+        headless = True
+
+    url_list = read_urls(urls, input_file)
+    if not url_list:
+        raise click.UsageError("No URLs given. Pass URLs as arguments, with --input, or on stdin.")
+
+    if len(url_list) == 1 and not input_file:
+        render_single(url_list[0], render_type, output, wait, headless, archive, bool(replay_har))
+        if record_har:
+            archive.save()
+    else:
+        render_batch(url_list, render_type, output_dir, manifest, wait, headless, workers, archive, bool(replay_har))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from llama_index.core import Settings
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from llm_scheduler import LLMOverloaded, SCHEDULER
+from metrics import REGISTRY
+from model_routing import llm_for
+from risk_snapshot import RiskSnapshot, SnapshotHolder
+from shared_snapshot import CoordinatorLink, MappedRiskTable, SlotRefused
+
+# =========================
+# Config
+# =========================
+COORDINATOR_ENV = "RISK_COORDINATOR"           # "host:port", set by serve.py
+COORDINATOR_KEY_ENV = "RISK_COORDINATOR_KEY"   # hex authkey, set by serve.py
+
+# =========================
+# Retrieval over the mapped snapshot
+# =========================
+class MappedRetriever(BaseRetriever):
+    """Top-k ingredient documents from the mmap'd embeddings, in place of a per-process Chroma index."""
+
+    def __init__(self, table: MappedRiskTable, similarity_top_k: int = 5):
+        self.table = table
+        self.similarity_top_k = similarity_top_k
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        embedding = query_bundle.embedding or Settings.embed_model.get_query_embedding(query_bundle.query_str)
+        nodes = []
+        for name, score in self.table.search(embedding, self.similarity_top_k):
+            info = self.table[name]
+            text = f"Ingredient: {name}\nRisk: {info['risk']}\nImpact: {info['impact']}"
+            metadata = {"ingredient": name, "risk": info["risk"], "impact": info["impact"]}
+            nodes.append(NodeWithScore(node=TextNode(text=text, metadata=metadata), score=score))
+        return nodes
+
+def mapped_snapshot(path: str) -> RiskSnapshot:
+    table = MappedRiskTable(Path(path))
+    retriever = MappedRetriever(table)
+    return RiskSnapshot(
+        version=table.version,
+        db=table,
+        query_engine=RetrieverQueryEngine.from_args(retriever, llm=llm_for("rag_synthesis")),
+        explain_engine=RetrieverQueryEngine.from_args(retriever, llm=llm_for("explain")),
+        retriever=retriever,
+    )
+
+# =========================
+# Worker side of the coordinator protocol
+# =========================
+def connect_worker(on_remap: Optional[Callable[[int], None]] = None) -> SnapshotHolder:
+    """
+    SnapshotHolder for a worker process: maps the coordinator's current
+    snapshot, forwards new entries to the coordinator instead of writing them,
+    and remaps whenever the coordinator publishes a new version. LLM requests
+    wait for a slot from the coordinator's scheduler, so LLM_MAX_IN_FLIGHT caps
+    all processes together. Answers the coordinator's report requests with
+    this process's metrics.
+    """
+    host, port = os.environ[COORDINATOR_ENV].rsplit(":", 1)
+    link = CoordinatorLink((host, int(port)), bytes.fromhex(os.environ[COORDINATOR_KEY_ENV]))
+    _, path = link.current()
+
+    @contextmanager
+    def coordinator_slot(priority: int):
+        try:
+            with link.slot(priority):
+                yield
+        except SlotRefused as e:
+            raise LLMOverloaded(str(e)) from e
+
+    SCHEDULER.delegate(coordinator_slot)
+
+    def build(snapshot: RiskSnapshot, entries: Dict[str, Dict]) -> RiskSnapshot:
+        version, path = link.publish(entries)
+        return mapped_snapshot(path) if version > snapshot.version else snapshot
+
+    def remap(version: int, path: str):
+        if version > holder.current().version and holder.adopt(mapped_snapshot(path)):
+            print(f"🔄 Worker {os.getpid()} mapped risk snapshot v{version}")
+
+    holder = SnapshotHolder(mapped_snapshot(path), build)
+    if on_remap:
+        holder.subscribe(lambda snapshot: on_remap(snapshot.version))
+    link.follow(remap, report=REGISTRY.collect)
+    print(f"🧩 Worker {os.getpid()} serving risk snapshot v{holder.current().version} from {path}")
+    return holder